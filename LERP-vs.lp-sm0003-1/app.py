@@ -14,15 +14,26 @@ from modulos.relatorios import relatorios_bp
 from modulos.admin import admin_bp
 from modulos.notificacoes import notificacoes_bp
 from modulos.cotacoes import cotacoes_bp
+from modulos.resumo import resumo_bp
+from modulos.tarefas import tarefas_bp
+from modulos.resumo.models import ResumoDiario
+from modulos.resumo.utils import reconstruir_resumo
+from modulos.esquema import esquema_cli, garantir_colunas, garantir_indices, garantir_wal
+from modulos.produtos.pesquisa import garantir_fts
+from modulos.produtos.custos import garantir_camadas
+from modulos.produtos.movimentos import garantir_movimentos
+from modulos.caixa.movimentos import garantir_razao_caixa
+from modulos.vendas.recebimentos import garantir_saldos_vendas
 
 from datetime import datetime
 
 # =============================
 # FACTORY PATTERN
 # =============================
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config.from_object("config.Config")
+    app.config.update(config or {})  # ex.: banco temporário dos comandos de verificação
 
     # =====================================
     # BABEL (Internacionalização)
@@ -86,11 +97,26 @@ def create_app():
     app.register_blueprint(admin_bp)
     app.register_blueprint(notificacoes_bp)
     app.register_blueprint(cotacoes_bp)
+    app.register_blueprint(resumo_bp)
+    app.register_blueprint(tarefas_bp)
+    app.cli.add_command(esquema_cli)
     # =====================================
     # Criação automática do banco + admin
     # =====================================
     with app.app_context():
         db.create_all()
+        garantir_colunas()
+        garantir_indices()
+        garantir_fts()
+        garantir_wal()
+        if garantir_camadas():
+            print("✔ Camadas de custo acertadas com o stock.")
+        if garantir_movimentos():
+            print("✔ Razão de stock aberto com o stock actual.")
+        if garantir_razao_caixa():
+            print("✔ Razão de caixa aberto com os pagamentos e saídas existentes.")
+        if garantir_saldos_vendas():
+            print("✔ Vendas anteriores aos recebimentos dadas como pagas.")
 
         # Criar admin padrão se não existir
         if Usuario.query.first() is None:
@@ -104,6 +130,10 @@ def create_app():
             db.session.commit()
             print("✔ Administrador padrão criado com sucesso!")
 
+        # Preencher o resumo diário a partir do histórico na primeira execução
+        if ResumoDiario.query.first() is None:
+            reconstruir_resumo()
+
     # =====================================
     # Rota inicial
     # =====================================
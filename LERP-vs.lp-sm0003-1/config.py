@@ -5,3 +5,46 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "lerp_super_chave_segura")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///lerp_gestao.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Carrinhos de venda: "sqlite" (partilhado entre workers) ou "memoria"
+    CARRINHO_BACKEND = os.getenv("CARRINHO_BACKEND", "sqlite")
+    CARRINHO_SQLITE_PATH = os.getenv("CARRINHO_SQLITE_PATH")  # padrão: instance/carrinhos.db
+    CARRINHO_TTL = int(os.getenv("CARRINHO_TTL", 8 * 3600))  # segundos
+    CARRINHO_MAX = int(os.getenv("CARRINHO_MAX", 500))  # só no backend "memoria"
+
+    # Índice em memória do autocomplete: reconstrução periódica (segundos)
+    INDICE_PRODUTOS_TTL = int(os.getenv("INDICE_PRODUTOS_TTL", 300))
+
+    # Numeração de documentos: números reservados de cada vez por processo
+    SEQUENCIAS_BLOCO = int(os.getenv("SEQUENCIAS_BLOCO", 20))
+
+    # Listagens paginadas: linhas por página e validade dos totais em cache
+    LISTAS_POR_PAGINA = int(os.getenv("LISTAS_POR_PAGINA", 50))
+    TOTAIS_LISTAS_TTL = int(os.getenv("TOTAIS_LISTAS_TTL", 60))
+
+    # Exportações (Excel/PDF) em segundo plano
+    EXPORTACAO_TRABALHADORES = int(os.getenv("EXPORTACAO_TRABALHADORES", 2))  # threads por processo
+    EXPORTACAO_PASTA = os.getenv("EXPORTACAO_PASTA")  # padrão: instance/exportacoes
+    EXPORTACAO_TTL = int(os.getenv("EXPORTACAO_TTL", 3600))  # segundos até o ficheiro ser apagado
+    EXPORTACAO_PRAZO = int(os.getenv("EXPORTACAO_PRAZO", 600))  # segundos sem progresso até dar a tarefa como perdida
+    EXPORTACAO_MAX_MEMORIA = int(os.getenv("EXPORTACAO_MAX_MEMORIA", 8 * 1024 * 1024))  # bytes em memória de um download directo (cotações) antes de ir para disco
+
+    # Pool de processos para PDFs e códigos de barras
+    RENDERIZACAO_PROCESSOS = (
+        int(os.getenv("RENDERIZACAO_PROCESSOS")) if os.getenv("RENDERIZACAO_PROCESSOS") else None
+    )  # padrão: um por núcleo; 0 desenha no próprio processo
+    RENDERIZACAO_NICE = int(os.getenv("RENDERIZACAO_NICE", 10))  # prioridade baixa dos processos de renderização
+    RENDERIZACAO_TEMPO_MAXIMO = int(os.getenv("RENDERIZACAO_TEMPO_MAXIMO", 120))  # segundos à espera de um documento
+    RENDERIZACAO_CACHE_PASTA = os.getenv("RENDERIZACAO_CACHE_PASTA")  # padrão: instance/renderizacao
+    RENDERIZACAO_CACHE_MB = int(os.getenv("RENDERIZACAO_CACHE_MB", 100))  # tamanho máximo da cache; 0 desliga
+
+    # Custeio das vendas: "media" (custo médio ponderado) ou "fifo" (camadas)
+    CUSTEIO_METODO = os.getenv("CUSTEIO_METODO", "media")
+
+    # Importação do catálogo: linhas por lote (uma transação por lote)
+    IMPORTACAO_LOTE = int(os.getenv("IMPORTACAO_LOTE", 5000))
+
+    # Folhas de etiquetas (modelos em modulos/produtos/etiquetas.py)
+    ETIQUETAS_MODELO = os.getenv("ETIQUETAS_MODELO", "a4_24")
+    ETIQUETAS_MODELOS = {}  # modelos extra ou corrigidos, com as mesmas chaves
+    ETIQUETAS_MAXIMO = int(os.getenv("ETIQUETAS_MAXIMO", 5000))  # etiquetas por pedido
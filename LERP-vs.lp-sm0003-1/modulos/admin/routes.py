@@ -8,8 +8,10 @@ from modulos.compras.models import Compra
 from modulos.vendas.models import Venda
 from modulos.caixa.models import Caixa
 from modulos.notificacoes.models import Notificacao
-from datetime import datetime
-from modulos.extensions import db, login_manager
+from modulos.resumo.utils import serie_diaria
+from modulos.periodos import hoje_local
+from datetime import date
+from modulos.extensions import login_manager
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -75,15 +77,12 @@ def dashboard():
     total_caixa = Caixa.query.count()
     notificacoes = Notificacao.query.order_by(Notificacao.data.desc()).limit(5).all()
 
-    # --- Gráfico de Vendas por mês ---
-    ano_atual = datetime.now().year
+    # --- Gráfico de Vendas por mês (resumo diário do ano) ---
+    ano_atual = hoje_local().year
     meses = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-    vendas_mes = []
-    for m in range(1, 13):
-        total_mes = db.session.query(db.func.sum(Venda.total_valor))\
-            .filter(db.extract('month', Venda.data_venda) == m)\
-            .filter(db.extract('year', Venda.data_venda) == ano_atual).scalar() or 0
-        vendas_mes.append(float(total_mes))
+    vendas_mes = [0.0] * 12
+    for dia, resumo in serie_diaria("vendas", date(ano_atual, 1, 1), date(ano_atual, 12, 31)).items():
+        vendas_mes[dia.month - 1] += float(resumo.vendas or 0)
 
     # --- Produtos com menor estoque (top 5) ---
     produtos = Produto.query.order_by(Produto.stock.asc()).limit(5).all()
@@ -9,4 +9,4 @@ class Auditoria(db.Model):
     acao = db.Column(db.String(255), nullable=False)
     modulo = db.Column(db.String(100), nullable=False)
     detalhes = db.Column(db.Text)
-    data = db.Column(db.DateTime, default=datetime.utcnow)
+    data = db.Column(db.DateTime, default=datetime.utcnow, index=True)
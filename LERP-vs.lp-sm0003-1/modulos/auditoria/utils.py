@@ -3,18 +3,22 @@ from modulos.extensions import db
 from .models import Auditoria
 from datetime import datetime
 
+def novo_registo(acao, modulo, detalhes=""):
+    """Auditoria do utilizador actual, ainda sem commit (para entrar na
+    transação de quem a chama)."""
+    usuario = current_user.username if hasattr(current_user, "username") else "Sistema/Desconhecido"
+    return Auditoria(
+        usuario=usuario,
+        acao=acao,
+        modulo=modulo,
+        detalhes=detalhes,
+        data=datetime.utcnow()
+    )
+
+
 def registrar_acao(acao, modulo, detalhes=""):
     try:
-        usuario = current_user.username if hasattr(current_user, "username") else "Sistema/Desconhecido"
-
-        reg = Auditoria(
-            usuario=usuario,
-            acao=acao,
-            modulo=modulo,
-            detalhes=detalhes,
-            data=datetime.utcnow()
-        )
-        db.session.add(reg)
+        db.session.add(novo_registo(acao, modulo, detalhes))
         db.session.commit()
     except Exception as e:
         print("Erro ao registrar auditoria:", str(e))
@@ -1,8 +1,19 @@
 from flask_wtf import FlaskForm
 from wtforms import FloatField, StringField, SubmitField
-from wtforms.validators import DataRequired, Length
+from wtforms.validators import DataRequired, InputRequired, Length, NumberRange, Optional
 
 class SaidaForm(FlaskForm):
     valor = FloatField("Valor", validators=[DataRequired()])
     justificativa = StringField("Justificativa", validators=[DataRequired(), Length(min=5)])
     submit = SubmitField("Registrar Saída")
+
+
+class AbrirSessaoForm(FlaskForm):
+    fundo_inicial = FloatField("Fundo inicial", validators=[InputRequired(), NumberRange(min=0)])
+    submit = SubmitField("Abrir Caixa")
+
+
+class FecharSessaoForm(FlaskForm):
+    contado = FloatField("Dinheiro contado", validators=[InputRequired(), NumberRange(min=0)])
+    observacoes = StringField("Observações", validators=[Optional(), Length(max=200)])
+    submit = SubmitField("Fechar Caixa")
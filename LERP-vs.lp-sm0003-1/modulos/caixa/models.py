@@ -8,4 +8,85 @@ class Caixa(db.Model):
     tipo = db.Column(db.String(10), nullable=False)  # entrada ou saida
     valor = db.Column(db.Float, nullable=False)
     justificativa = db.Column(db.String(200), nullable=True)  # obrigatório se saida
-    data = db.Column(db.DateTime, default=datetime.utcnow)
+    data = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    sessao_id = db.Column(db.Integer, db.ForeignKey("sessoes_caixa.id"), nullable=True, index=True)
+
+
+# Razão de caixa: uma linha por entrada (pagamento, entrada manual) ou saída,
+# com os totais acumulados desde o primeiro movimento (ver caixa/movimentos.py)
+class MovimentoCaixa(db.Model):
+    __tablename__ = "movimentos_caixa"
+
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)  # UTC
+    origem = db.Column(db.String(20), nullable=False)  # pagamento ou caixa
+    referencia_id = db.Column(db.Integer)  # id do Pagamento ou do Caixa
+    tipo_pagamento = db.Column(db.String(50))
+    entrada = db.Column(db.Float, nullable=False, default=0.0)
+    saida = db.Column(db.Float, nullable=False, default=0.0)
+    entradas_acumuladas = db.Column(db.Float, nullable=False, default=0.0)
+    saidas_acumuladas = db.Column(db.Float, nullable=False, default=0.0)
+
+    @property
+    def saldo(self):
+        """Saldo do caixa depois deste movimento."""
+        return self.entradas_acumuladas - self.saidas_acumuladas
+
+
+# Totais acumulados do razão à meia-noite (Maputo) de cada dia
+class SaldoCaixa(db.Model):
+    __tablename__ = "saldos_caixa"
+
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.DateTime, nullable=False, unique=True)  # UTC
+    entradas = db.Column(db.Float, nullable=False, default=0.0)
+    saidas = db.Column(db.Float, nullable=False, default=0.0)
+
+
+# Sessão de gaveta: o operador abre o caixa com um fundo e fecha-o contado
+# (ver caixa/sessoes.py)
+class SessaoCaixa(db.Model):
+    __tablename__ = "sessoes_caixa"
+
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.id"), nullable=False, index=True)
+    aberta_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)  # UTC
+    fechada_em = db.Column(db.DateTime, nullable=True)
+    fundo_inicial = db.Column(db.Float, nullable=False, default=0.0)
+    esperado = db.Column(db.Float, nullable=True)  # dinheiro na gaveta segundo os contadores
+    contado = db.Column(db.Float, nullable=True)
+    observacoes = db.Column(db.String(200), nullable=True)
+
+    usuario = db.relationship("Usuario")
+
+    @property
+    def diferenca(self):
+        """Contado − esperado (negativo: falta dinheiro na gaveta)."""
+        if self.contado is None or self.esperado is None:
+            return None
+        return round(self.contado - self.esperado, 2)
+
+
+# Uma só sessão aberta por operador
+db.Index(
+    "uq_sessoes_caixa_aberta",
+    SessaoCaixa.usuario_id,
+    unique=True,
+    sqlite_where=SessaoCaixa.fechada_em.is_(None),
+    postgresql_where=SessaoCaixa.fechada_em.is_(None),
+)
+
+
+# Contadores de cada sessão por tipo de pagamento, somados a cada movimento
+class TotalSessaoCaixa(db.Model):
+    __tablename__ = "totais_sessao_caixa"
+    __table_args__ = (
+        db.UniqueConstraint("sessao_id", "tipo_pagamento", name="uq_totais_sessao_caixa"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    sessao_id = db.Column(db.Integer, db.ForeignKey("sessoes_caixa.id"), nullable=False)
+    tipo_pagamento = db.Column(db.String(50), nullable=False)
+    entradas = db.Column(db.Float, nullable=False, default=0.0)
+    saidas = db.Column(db.Float, nullable=False, default=0.0)
+    movimentos = db.Column(db.Integer, nullable=False, default=0)
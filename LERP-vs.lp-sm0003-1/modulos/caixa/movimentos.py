@@ -0,0 +1,218 @@
+# modulos/caixa/movimentos.py
+"""Razão de caixa com saldo corrido e fechos diários.
+
+Cada pagamento, entrada manual e saída acrescenta uma linha a
+``movimentos_caixa`` com as entradas e saídas acumuladas desde o
+primeiro movimento, por isso o saldo actual é só a última linha.
+
+Para os períodos há ``saldos_caixa``: os acumulados à meia-noite de
+Maputo de cada dia. Os totais antes de um instante t são os do último
+fecho até t mais a soma dos movimentos de [fecho, t), lida pelo índice
+da data (no máximo um dia de movimentos); um período [a, b) é a
+diferença entre os totais em b e em a.
+
+Um movimento com data anterior a fechos já gravados (correcção com data
+atrasada) apaga esses fechos, e ``gerar_saldos`` volta a criá-los; o
+mesmo acontece ao fecho do dia em ``folha_caixa`` (pagamentos/fecho.py).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import Integer, String, case, delete, func, insert, literal, select, union_all
+from sqlalchemy.exc import IntegrityError
+
+from modulos.extensions import db
+from modulos.periodos import dia_local, hoje_local, intervalo_dias
+from .models import Caixa, MovimentoCaixa, SaldoCaixa
+
+MARGEM = timedelta(minutes=5)  # espera após a meia-noite antes do fecho
+
+COLUNAS = [
+    "data", "origem", "referencia_id", "tipo_pagamento", "entrada", "saida",
+    "entradas_acumuladas", "saidas_acumuladas",
+]
+
+
+def meia_noite(dia):
+    """Meia-noite de Maputo que abre ``dia``, em UTC (como ficam gravadas as datas)."""
+    return intervalo_dias(dia, None, utc=True)[0]
+
+
+# -------------------------------
+# 🔹 Registo
+# -------------------------------
+def registrar_movimento_caixa(origem, referencia_id, entrada=0.0, saida=0.0,
+                              tipo_pagamento=None, data=None):
+    """Acrescenta um movimento ao razão. Não faz commit.
+
+    Chamar depois do flush do pagamento ou da saída, na mesma transação:
+    no SQLite esta já tem o banco bloqueado para escrita, e o INSERT lê
+    os acumulados da última linha sem que outro posto escreva pelo meio.
+    """
+    data = data or datetime.utcnow()
+    tabela = MovimentoCaixa.__table__
+
+    if db.session.get_bind().dialect.name != "sqlite":
+        # Outros bancos: os registos concorrentes esperam pela última linha
+        db.session.execute(select(tabela.c.id).order_by(tabela.c.id.desc()).limit(1).with_for_update())
+
+    def anterior(coluna):
+        return func.coalesce(select(coluna).order_by(tabela.c.id.desc()).limit(1).scalar_subquery(), 0.0)
+
+    entrada, saida = float(entrada or 0), float(saida or 0)
+    db.session.execute(insert(tabela).from_select(COLUNAS, select(
+        literal(data),
+        literal(origem, String),
+        literal(referencia_id, Integer),
+        literal(tipo_pagamento, String),
+        literal(entrada),
+        literal(saida),
+        anterior(tabela.c.entradas_acumuladas) + entrada,
+        anterior(tabela.c.saidas_acumuladas) + saida,
+    )))
+    # Os fechos depois desta data deixaram de estar certos
+    db.session.execute(delete(SaldoCaixa).where(SaldoCaixa.data > data))
+
+    # Import local: pagamentos importa este módulo nas rotas
+    from modulos.pagamentos.fecho import reabrir_dia
+    reabrir_dia(data)  # dia já fechado na folha de caixa volta a abrir
+
+
+def garantir_razao_caixa():
+    """Na primeira execução, abre o razão com os pagamentos e o caixa já gravados.
+
+    Devolve o número de movimentos criados.
+    """
+    # Import local: as rotas de pagamentos importam este módulo
+    from modulos.pagamentos.models import Pagamento
+
+    with db.engine.begin() as con:
+        if con.execute(select(MovimentoCaixa.id).limit(1)).first() is not None:
+            return 0
+
+        pagamentos = select(
+            Pagamento.data_pagamento.label("data"),
+            literal("pagamento").label("origem"),
+            Pagamento.id.label("referencia_id"),
+            Pagamento.tipo_pagamento.label("tipo_pagamento"),
+            Pagamento.valor.label("entrada"),
+            literal(0.0).label("saida"),
+        )
+        caixa = select(
+            Caixa.data,
+            literal("caixa"),
+            Caixa.id,
+            literal(None, String),
+            case((Caixa.tipo == "entrada", Caixa.valor), else_=0.0),
+            case((Caixa.tipo == "saida", Caixa.valor), else_=0.0),
+        ).where(Caixa.data.isnot(None))
+
+        todos = union_all(pagamentos, caixa).subquery()
+        ordem = (todos.c.data, todos.c.origem, todos.c.referencia_id)
+        return con.execute(insert(MovimentoCaixa.__table__).from_select(COLUNAS, select(
+            todos.c.data, todos.c.origem, todos.c.referencia_id, todos.c.tipo_pagamento,
+            todos.c.entrada, todos.c.saida,
+            func.sum(todos.c.entrada).over(order_by=ordem),
+            func.sum(todos.c.saida).over(order_by=ordem),
+        ).order_by(*ordem))).rowcount
+
+
+# -------------------------------
+# 🔹 Fechos diários
+# -------------------------------
+def _somas(inicio, fim):
+    """(entradas, saídas) dos movimentos em [inicio, fim); None deixa o limite em aberto."""
+    consulta = select(
+        func.coalesce(func.sum(MovimentoCaixa.entrada), 0.0),
+        func.coalesce(func.sum(MovimentoCaixa.saida), 0.0),
+    )
+    if inicio is not None:
+        consulta = consulta.where(MovimentoCaixa.data >= inicio)
+    if fim is not None:
+        consulta = consulta.where(MovimentoCaixa.data < fim)
+    return tuple(db.session.execute(consulta).one())
+
+
+def gerar_saldos():
+    """Cria os fechos das meias-noites que ainda não têm. Faz commit.
+
+    Cada fecho parte do anterior e soma os movimentos do dia que acaba
+    nele. Devolve o número de fechos criados.
+    """
+    hoje = hoje_local()
+    if datetime.utcnow() - meia_noite(hoje) < MARGEM:
+        hoje -= timedelta(days=1)  # pagamentos da véspera ainda a fechar
+
+    ultimo = db.session.execute(
+        select(SaldoCaixa.data, SaldoCaixa.entradas, SaldoCaixa.saidas)
+        .order_by(SaldoCaixa.data.desc()).limit(1)
+    ).first()
+    if ultimo is not None:
+        inicio, entradas, saidas = ultimo
+        dia = dia_local(inicio, utc=True) + timedelta(days=1)
+    else:
+        primeiro = db.session.query(func.min(MovimentoCaixa.data)).scalar()
+        if primeiro is None:
+            return 0
+        inicio, entradas, saidas = None, 0.0, 0.0
+        dia = dia_local(primeiro, utc=True) + timedelta(days=1)
+
+    fechos = []
+    while dia <= hoje:
+        fim = meia_noite(dia)
+        entradas_dia, saidas_dia = _somas(inicio, fim)
+        entradas += entradas_dia
+        saidas += saidas_dia
+        fechos.append({"data": fim, "entradas": entradas, "saidas": saidas})
+        inicio = fim
+        dia += timedelta(days=1)
+
+    if not fechos:
+        return 0
+    try:
+        db.session.execute(insert(SaldoCaixa), fechos)
+        db.session.commit()
+    except IntegrityError:
+        # Outro pedido gerou os mesmos fechos ao mesmo tempo
+        db.session.rollback()
+        return 0
+    return len(fechos)
+
+
+# -------------------------------
+# 🔹 Leitura
+# -------------------------------
+def totais_ate(instante=None):
+    """(entradas, saídas) acumuladas antes de ``instante`` (UTC); sem instante, todas."""
+    if instante is None:
+        ultimo = db.session.execute(
+            select(MovimentoCaixa.entradas_acumuladas, MovimentoCaixa.saidas_acumuladas)
+            .order_by(MovimentoCaixa.id.desc()).limit(1)
+        ).first()
+        return tuple(ultimo) if ultimo is not None else (0.0, 0.0)
+
+    fecho = db.session.execute(
+        select(SaldoCaixa.data, SaldoCaixa.entradas, SaldoCaixa.saidas)
+        .where(SaldoCaixa.data <= instante)
+        .order_by(SaldoCaixa.data.desc()).limit(1)
+    ).first()
+    desde, entradas, saidas = fecho if fecho is not None else (None, 0.0, 0.0)
+    entradas_depois, saidas_depois = _somas(desde, instante)
+    return entradas + entradas_depois, saidas + saidas_depois
+
+
+def totais_periodo(inicio=None, fim=None):
+    """{"entradas", "saidas", "saldo"} dos movimentos em [inicio, fim) (UTC)."""
+    gerar_saldos()
+    entradas, saidas = totais_ate(fim)
+    if inicio is not None:
+        entradas_antes, saidas_antes = totais_ate(inicio)
+        entradas -= entradas_antes
+        saidas -= saidas_antes
+    entradas, saidas = round(entradas, 2), round(saidas, 2)
+    return {"entradas": entradas, "saidas": saidas, "saldo": round(entradas - saidas, 2)}
+
+
+def saldo_actual():
+    """Saldo do caixa depois do último movimento."""
+    entradas, saidas = totais_ate()
+    return round(entradas - saidas, 2)
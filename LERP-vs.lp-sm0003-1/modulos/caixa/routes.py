@@ -1,14 +1,22 @@
 from flask import render_template, redirect, url_for, flash, request
-from datetime import datetime, timedelta
 from flask_babel import gettext as _
 from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
 
 from modulos.extensions import db
 from . import caixa_bp
 from .models import Caixa
-from .forms import SaidaForm
-from modulos.pagamentos.models import Pagamento
+from .forms import AbrirSessaoForm, FecharSessaoForm, SaidaForm
+from .movimentos import registrar_movimento_caixa, saldo_actual, totais_periodo
+from .sessoes import (
+    TIPO_GAVETA, ErroSessao, abrir_sessao, esperado_na_gaveta, fechar_sessao,
+    registrar_na_sessao, relatorio_do_dia, sessao_do_operador, totais_sessao,
+)
 from modulos.auditoria.utils import registrar_acao
+from modulos.resumo.utils import registrar_no_resumo
+from modulos.periodos import filtrar_intervalo, hoje_local, intervalo, ler_dia
+
+LIMITE_SAIDAS = 500  # saídas listadas abaixo dos totais
 
 
 # -------------------------------------------------------------------
@@ -27,6 +35,10 @@ def nova_saida():
         )
 
         db.session.add(saida)
+        db.session.flush()
+        registrar_no_resumo("caixa", saida.data, saidas=saida.valor)
+        registrar_movimento_caixa("caixa", saida.id, saida=saida.valor, data=saida.data)
+        registrar_na_sessao(saida, TIPO_GAVETA, saida=saida.valor)
         db.session.commit()
 
         # 🔹 Registrar auditoria
@@ -62,78 +74,147 @@ def nova_saida():
 @caixa_bp.route("/caixa")
 def lista_caixa():
 
-    # Entradas: caixa + pagamentos
-    entradas_caixa = db.session.query(Caixa.valor).filter(Caixa.tipo == "entrada").all()
-    entradas_pagamentos = db.session.query(Pagamento.valor).all()
+    # ---------------- FILTRAR POR PERÍODO ----------------
+    periodo = request.args.get("periodo", "hoje")
+    nomes_periodo = {
+        "hoje": _("Hoje"),
+        "semana": _("Esta Semana"),
+        "mes": _("Este Mês"),
+        "ano": _("Este Ano"),
+    }
+    nome_periodo = nomes_periodo.get(periodo, _("Todos os Registos"))
+
+    # Caixa e Pagamento gravam em UTC
+    data_inicio, data_fim = intervalo(periodo, utc=True)
+
+    # ---------------- SALDOS (razão de caixa) ----------------
+    # Entradas = pagamentos + entradas manuais; dois fechos diários e uma
+    # soma indexada de no máximo um dia, em vez de somar o histórico
+    totais = totais_periodo(data_inicio, data_fim)
+
+    saidas = filtrar_intervalo(
+        Caixa.query.filter(Caixa.tipo == "saida"), Caixa.data, data_inicio, data_fim
+    ).order_by(Caixa.data.desc(), Caixa.id.desc()).limit(LIMITE_SAIDAS).all()
+
+    # 🔹 Registrar auditoria – acesso ao relatório
+    registrar_acao(
+        acao="Visualizou relatório do caixa",
+        modulo="caixa",
+        detalhes=f"Período selecionado: {periodo}"
+    )
+
+    return render_template(
+        "caixa/lista_caixa.html",
+        entradas=totais["entradas"],
+        saidas=totais["saidas"],
+        saldo=totais["saldo"],
+        saldo_caixa=saldo_actual(),
+        sessao=sessao_do_operador(),
+        periodo=periodo,
+        nome_periodo=nome_periodo,
+        lista_saidas=saidas,
+        titulo=_("Movimentações do Caixa")
+    )
 
-    total_entradas = sum(v[0] for v in entradas_caixa) + sum(v[0] for v in entradas_pagamentos)
 
-    # Saídas
-    saidas = Caixa.query.filter_by(tipo="saida").all()
-    total_saidas = sum(s.valor for s in saidas)
+# -------------------------------------------------------------------
+# --- SESSÕES DE CAIXA (abrir / fechar a gaveta) ---
+# -------------------------------------------------------------------
+@caixa_bp.route("/caixa/sessao/abrir", methods=["GET", "POST"])
+def abrir_sessao_caixa():
+    if not current_user.is_authenticated:
+        flash(_("Entre com o seu utilizador para abrir o caixa."), "warning")
+        return redirect(url_for("admin.login_admin"))
 
-    # Saldo total geral
-    saldo = total_entradas - total_saidas
+    if sessao_do_operador() is not None:
+        flash(_("Já tem uma sessão de caixa aberta."), "info")
+        return redirect(url_for("caixa.fechar_sessao_caixa"))
 
-    # ---------------- FILTRAR POR PERÍODO ----------------
-    periodo = request.args.get("periodo", "hoje")
-    agora = datetime.utcnow()
+    form = AbrirSessaoForm()
+    if form.validate_on_submit():
+        try:
+            sessao = abrir_sessao(current_user.id, form.fundo_inicial.data)
+            db.session.commit()
+        except (ErroSessao, IntegrityError):
+            # Outro separador abriu a sessão ao mesmo tempo
+            db.session.rollback()
+            flash(_("Já tem uma sessão de caixa aberta."), "info")
+            return redirect(url_for("caixa.fechar_sessao_caixa"))
 
-    if periodo == "hoje":
-        data_inicio = datetime(agora.year, agora.month, agora.day)
-        nome_periodo = _("Hoje")
+        registrar_acao(
+            acao="Abriu sessão de caixa",
+            modulo="caixa",
+            detalhes=f"Sessão {sessao.id} | Fundo: {sessao.fundo_inicial} MT"
+        )
+        flash(_("Caixa aberto com fundo de %(valor).2f MT.", valor=sessao.fundo_inicial), "success")
+        return redirect(url_for("caixa.lista_caixa"))
 
-    elif periodo == "semana":
-        data_inicio = agora - timedelta(days=agora.weekday())
-        data_inicio = datetime(data_inicio.year, data_inicio.month, data_inicio.day)
-        nome_periodo = _("Esta Semana")
+    return render_template(
+        "caixa/abrir_sessao.html",
+        form=form,
+        titulo=_("Abrir Caixa")
+    )
 
-    elif periodo == "mes":
-        data_inicio = datetime(agora.year, agora.month, 1)
-        nome_periodo = _("Este Mês")
 
-    elif periodo == "ano":
-        data_inicio = datetime(agora.year, 1, 1)
-        nome_periodo = _("Este Ano")
+@caixa_bp.route("/caixa/sessao/fechar", methods=["GET", "POST"])
+def fechar_sessao_caixa():
+    sessao = sessao_do_operador()
+    if sessao is None:
+        flash(_("Não tem nenhuma sessão de caixa aberta."), "warning")
+        return redirect(url_for("caixa.lista_caixa"))
 
-    else:
-        data_inicio = None
-        nome_periodo = _("Todos os Registos")
+    form = FecharSessaoForm()
+    if form.validate_on_submit():
+        try:
+            esperado = fechar_sessao(sessao, form.contado.data, form.observacoes.data or None)
+            db.session.commit()
+        except ErroSessao as e:
+            db.session.rollback()
+            flash(str(e), "warning")
+            return redirect(url_for("caixa.lista_caixa"))
 
-    # ---------------- CALCULAR SALDOS POR PERÍODO ----------------
-    if data_inicio:
-        entradas_pagamentos_periodo = db.session.query(Pagamento.valor).filter(
-            Pagamento.data_pagamento >= data_inicio
-        ).all()
+        registrar_acao(
+            acao="Fechou sessão de caixa",
+            modulo="caixa",
+            detalhes=f"Sessão {sessao.id} | Esperado: {esperado} MT | Contado: {sessao.contado} MT"
+        )
+        flash(
+            _("Caixa fechado. Esperado %(esperado).2f MT, contado %(contado).2f MT, diferença %(diferenca).2f MT.",
+              esperado=esperado, contado=sessao.contado, diferenca=sessao.diferenca),
+            "success" if not sessao.diferenca else "warning"
+        )
+        return redirect(url_for("caixa.sessoes_caixa", dia=hoje_local().isoformat()))
 
-        saidas_periodo = Caixa.query.filter(
-            Caixa.tipo == "saida",
-            Caixa.data >= data_inicio
-        ).all()
+    # Só os contadores da sessão: uma linha por tipo de pagamento
+    totais = totais_sessao(sessao.id)
+    return render_template(
+        "caixa/fechar_sessao.html",
+        form=form,
+        sessao=sessao,
+        totais=totais,
+        esperado=esperado_na_gaveta(sessao.fundo_inicial, totais),
+        titulo=_("Fechar Caixa")
+    )
 
-        total_entradas_periodo = sum(v[0] for v in entradas_pagamentos_periodo)
-        total_saidas_periodo = sum(s.valor for s in saidas_periodo)
-        saldo_periodo = total_entradas_periodo - total_saidas_periodo
 
-    else:
-        total_entradas_periodo = total_entradas
-        total_saidas_periodo = total_saidas
-        saldo_periodo = saldo
+@caixa_bp.route("/caixa/sessoes")
+def sessoes_caixa():
+    dia = ler_dia(request.args.get("dia")) or hoje_local()
+    sessoes, por_sessao, sem_sessao, por_tipo = relatorio_do_dia(dia)
 
-    # 🔹 Registrar auditoria – acesso ao relatório
     registrar_acao(
-        acao="Visualizou relatório do caixa",
+        acao="Visualizou sessões do caixa",
         modulo="caixa",
-        detalhes=f"Período selecionado: {periodo}"
+        detalhes=f"Dia: {dia.isoformat()}"
     )
 
     return render_template(
-        "caixa/lista_caixa.html",
-        entradas=total_entradas_periodo,
-        saidas=total_saidas_periodo,
-        saldo=saldo_periodo,
-        periodo=periodo,
-        nome_periodo=nome_periodo,
-        lista_saidas=saidas,
-        titulo=_("Movimentações do Caixa")
+        "caixa/sessoes.html",
+        dia=dia,
+        sessoes=sessoes,
+        por_sessao=por_sessao,
+        sem_sessao=sem_sessao,
+        por_tipo=por_tipo,
+        tipo_gaveta=TIPO_GAVETA,
+        titulo=_("Sessões do Caixa")
     )
@@ -0,0 +1,217 @@
+# modulos/caixa/sessoes.py
+"""Sessões de gaveta: cada operador abre o caixa com um fundo e fecha-o contado.
+
+Os pagamentos e saídas registados por um operador com a sessão aberta
+ficam ligados a ela (``sessao_id``) e somam, na mesma transação, aos
+contadores (sessão, tipo de pagamento) de ``totais_sessao_caixa``.
+Fechar a sessão lê só esses contadores, e o relatório do dia soma as
+sessões abertas nesse dia mais os pagamentos e saídas do dia que ficaram
+sem sessão (``sessao_id`` nulo).
+
+A gaveta guarda o dinheiro físico: o esperado ao fechar é o fundo mais
+as entradas em dinheiro menos as saídas, que saem sempre da gaveta.
+"""
+from datetime import datetime
+
+from flask_babel import gettext as _
+from flask_login import current_user
+from sqlalchemy import case, func, select, update
+
+from modulos.extensions import db
+from modulos.periodos import intervalo_dias
+from .models import Caixa, SessaoCaixa, TotalSessaoCaixa
+
+TIPO_GAVETA = "cash"  # tipo de pagamento que entra na gaveta; as saídas contam aqui
+
+
+class ErroSessao(Exception):
+    """Operação de sessão inválida (já aberta, já fechada, sem operador)."""
+
+
+def sessao_aberta(usuario_id):
+    return SessaoCaixa.query.filter_by(usuario_id=usuario_id, fechada_em=None).first()
+
+
+def sessao_do_operador():
+    """Sessão aberta do utilizador autenticado, ou None."""
+    if not current_user.is_authenticated:
+        return None
+    return sessao_aberta(current_user.id)
+
+
+# -------------------------------
+# 🔹 Abrir / fechar
+# -------------------------------
+def abrir_sessao(usuario_id, fundo_inicial):
+    """Abre uma sessão para o operador. Não faz commit."""
+    if sessao_aberta(usuario_id) is not None:
+        raise ErroSessao(_("Já tem uma sessão de caixa aberta."))
+    sessao = SessaoCaixa(usuario_id=usuario_id, fundo_inicial=round(float(fundo_inicial or 0), 2))
+    db.session.add(sessao)
+    db.session.flush()
+    return sessao
+
+
+def fechar_sessao(sessao, contado, observacoes=None):
+    """Fecha a sessão com o dinheiro contado e grava o esperado. Não faz commit.
+
+    O UPDATE vem antes da leitura dos contadores: a transação fica com o
+    banco bloqueado para escrita e nenhum pagamento entra pelo meio.
+    """
+    fechada = db.session.execute(
+        update(SessaoCaixa)
+        .where(SessaoCaixa.id == sessao.id, SessaoCaixa.fechada_em.is_(None))
+        .values(fechada_em=datetime.utcnow(), contado=round(float(contado), 2), observacoes=observacoes)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not fechada:
+        raise ErroSessao(_("Esta sessão de caixa já foi fechada."))
+
+    esperado = esperado_na_gaveta(sessao.fundo_inicial, totais_sessao(sessao.id))
+    db.session.execute(
+        update(SessaoCaixa).where(SessaoCaixa.id == sessao.id).values(esperado=esperado)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.expire(sessao)
+    return esperado
+
+
+# -------------------------------
+# 🔹 Contadores
+# -------------------------------
+def registrar_na_sessao(registo, tipo_pagamento, entrada=0.0, saida=0.0):
+    """Liga o pagamento/saída à sessão aberta do operador e soma aos contadores.
+
+    Chamar depois do flush do registo, na mesma transação. Não faz
+    commit. Devolve o id da sessão, ou None se o operador não tem sessão.
+    """
+    sessao = sessao_do_operador()
+    if sessao is None:
+        return None
+    registo.sessao_id = sessao.id
+
+    linha = {"entradas": float(entrada or 0), "saidas": float(saida or 0), "movimentos": 1}
+    dialeto = db.session.get_bind().dialect.name
+    if dialeto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialeto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        insert = None
+
+    if insert is not None:
+        tabela = TotalSessaoCaixa.__table__
+        stmt = insert(tabela).values(sessao_id=sessao.id, tipo_pagamento=tipo_pagamento, **linha)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["sessao_id", "tipo_pagamento"],
+            set_={campo: tabela.c[campo] + stmt.excluded[campo] for campo in linha},
+        )
+        db.session.execute(stmt)
+        return sessao.id
+
+    # Outros bancos: leitura + escrita dentro da mesma transação
+    total = TotalSessaoCaixa.query.filter_by(
+        sessao_id=sessao.id, tipo_pagamento=tipo_pagamento
+    ).with_for_update().first()
+    if total is None:
+        db.session.add(TotalSessaoCaixa(sessao_id=sessao.id, tipo_pagamento=tipo_pagamento, **linha))
+    else:
+        for campo, valor in linha.items():
+            setattr(total, campo, (getattr(total, campo) or 0) + valor)
+    return sessao.id
+
+
+def totais_sessao(sessao_id):
+    """{tipo_pagamento: {"entradas", "saidas", "movimentos"}} da sessão."""
+    linhas = db.session.execute(
+        select(TotalSessaoCaixa.tipo_pagamento, TotalSessaoCaixa.entradas,
+               TotalSessaoCaixa.saidas, TotalSessaoCaixa.movimentos)
+        .where(TotalSessaoCaixa.sessao_id == sessao_id)
+    ).all()
+    return {
+        tipo: {"entradas": round(entradas, 2), "saidas": round(saidas, 2), "movimentos": movimentos}
+        for tipo, entradas, saidas, movimentos in linhas
+    }
+
+
+def esperado_na_gaveta(fundo_inicial, totais):
+    gaveta = totais.get(TIPO_GAVETA, {})
+    return round((fundo_inicial or 0) + gaveta.get("entradas", 0.0) - gaveta.get("saidas", 0.0), 2)
+
+
+# -------------------------------
+# 🔹 Relatório do dia
+# -------------------------------
+def relatorio_do_dia(dia):
+    """Sessões abertas no dia (Maputo) e os totais por tipo de pagamento.
+
+    Uma sessão que passa da meia-noite conta no dia em que foi aberta.
+    Pagamentos e saídas registados sem sessão aberta contam à parte, pela
+    sua data. Devolve (sessoes, {sessao_id: totais}, totais sem sessão,
+    totais do dia por tipo, com os sem sessão incluídos).
+    """
+    inicio, fim = intervalo_dias(dia, dia, utc=True)
+    sessoes = (
+        SessaoCaixa.query
+        .filter(SessaoCaixa.aberta_em >= inicio, SessaoCaixa.aberta_em < fim)
+        .order_by(SessaoCaixa.aberta_em)
+        .all()
+    )
+
+    por_sessao = {s.id: {} for s in sessoes}
+    por_tipo = {}
+
+    def somar(tipo, entradas, saidas, movimentos):
+        soma = por_tipo.setdefault(tipo, {"entradas": 0.0, "saidas": 0.0, "movimentos": 0})
+        soma["entradas"] += entradas
+        soma["saidas"] += saidas
+        soma["movimentos"] += movimentos
+
+    if sessoes:
+        linhas = db.session.execute(
+            select(TotalSessaoCaixa.sessao_id, TotalSessaoCaixa.tipo_pagamento,
+                   TotalSessaoCaixa.entradas, TotalSessaoCaixa.saidas, TotalSessaoCaixa.movimentos)
+            .where(TotalSessaoCaixa.sessao_id.in_(list(por_sessao)))
+        ).all()
+        for sessao_id, tipo, entradas, saidas, movimentos in linhas:
+            por_sessao[sessao_id][tipo] = {"entradas": entradas, "saidas": saidas, "movimentos": movimentos}
+            somar(tipo, entradas, saidas, movimentos)
+
+    sem_sessao = _sem_sessao(inicio, fim)
+    for tipo, t in sem_sessao.items():
+        somar(tipo, t["entradas"], t["saidas"], t["movimentos"])
+
+    return sessoes, por_sessao, sem_sessao, por_tipo
+
+
+def _sem_sessao(inicio, fim):
+    """{tipo: totais} dos pagamentos e movimentos do caixa sem sessão em [inicio, fim) (UTC).
+
+    Lidos pelos índices das datas; o caixa conta como dinheiro (a gaveta).
+    """
+    # Import local: as rotas de pagamentos importam este módulo
+    from modulos.pagamentos.models import Pagamento
+
+    totais = {}
+    pagamentos = db.session.execute(
+        select(Pagamento.tipo_pagamento, func.sum(Pagamento.valor), func.count(Pagamento.id))
+        .where(Pagamento.data_pagamento >= inicio, Pagamento.data_pagamento < fim,
+               Pagamento.sessao_id.is_(None))
+        .group_by(Pagamento.tipo_pagamento)
+    ).all()
+    for tipo, entradas, movimentos in pagamentos:
+        totais[tipo] = {"entradas": entradas or 0.0, "saidas": 0.0, "movimentos": movimentos}
+
+    entradas, saidas, movimentos = db.session.execute(
+        select(
+            func.coalesce(func.sum(case((Caixa.tipo == "entrada", Caixa.valor), else_=0.0)), 0.0),
+            func.coalesce(func.sum(case((Caixa.tipo == "saida", Caixa.valor), else_=0.0)), 0.0),
+            func.count(Caixa.id),
+        ).where(Caixa.data >= inicio, Caixa.data < fim, Caixa.sessao_id.is_(None))
+    ).one()
+    if movimentos:
+        gaveta = totais.setdefault(TIPO_GAVETA, {"entradas": 0.0, "saidas": 0.0, "movimentos": 0})
+        gaveta["entradas"] += entradas
+        gaveta["saidas"] += saidas
+        gaveta["movimentos"] += movimentos
+    return totais
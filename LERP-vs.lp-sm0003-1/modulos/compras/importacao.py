@@ -0,0 +1,292 @@
+# modulos/compras/importacao.py
+"""Entrada de uma factura de fornecedor inteira (CSV, XLSX ou JSON).
+
+Ao contrário de ``nova_compra`` (uma linha por pedido, média ponderada
+calculada em Python produto a produto), a factura é tratada de uma vez:
+
+1. as linhas são validadas com operações sobre colunas (pandas); se
+   alguma tiver erro nada é gravado e devolve-se o relatório;
+2. as linhas do mesmo produto são agregadas (``groupby``): quantidade
+   total e custo total da factura por produto;
+3. um ``UPDATE ... CASE`` por cada ``LOTE_PRODUTOS`` produtos soma o
+   stock e recalcula o custo médio ponderado no próprio banco, a partir
+   dos valores que lá estão nesse momento — não há leitura prévia, logo
+   não há corrida com as vendas de outros postos;
+4. as ``Compra`` e as camadas de custo (``HistoricoCustoProduto``, uma
+   por linha) entram com INSERT em lote, e o resumo diário com um só
+   upsert;
+5. o registo de auditoria da factura.
+
+Tudo corre na mesma transação.
+
+A média é calculada sobre a factura inteira e arredondada uma vez; com
+várias linhas do mesmo produto, o resultado pode diferir nos cêntimos de
+lançar as linhas uma a uma (que arredonda a cada linha).
+"""
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+from flask_babel import gettext as _
+from sqlalchemy import case, func, insert, select, update
+
+from modulos.auditoria.utils import novo_registo
+from modulos.extensions import db
+from modulos.produtos.importacao import ErroImportacao, converter_numero, ler_lotes
+from modulos.produtos.indice import normalizar
+from modulos.produtos.models import Produto
+from modulos.produtos.custos import registrar_entradas
+from modulos.produtos.movimentos import registrar_movimentos
+from modulos.produtos.stock import com_retentativas
+from modulos.resumo.utils import registrar_no_resumo
+from .models import Compra
+
+LOTE_PRODUTOS = 500  # produtos por UPDATE (limite de parâmetros do SQLite)
+
+# Cabeçalhos aceites (já normalizados) → coluna
+ALIASES = {
+    "codigo": "codigo", "cod": "codigo", "codigo_produto": "codigo", "sku": "codigo",
+    "referencia": "codigo",
+    "produto": "produto", "nome": "produto", "descricao": "produto",
+    "quantidade": "quantidade", "qtd": "quantidade", "quant": "quantidade",
+    "preco_compra": "preco_compra", "custo": "preco_compra", "preco": "preco_compra",
+    "preco_unitario": "preco_compra",
+    "preco_venda": "preco_venda", "pvp": "preco_venda",
+    "fornecedor": "fornecedor",
+}
+OBRIGATORIAS = ("codigo", "quantidade", "preco_compra")
+
+
+class ResultadoFatura:
+    def __init__(self):
+        self.linhas = 0
+        self.produtos = 0
+        self.valor_total = 0.0
+        self.lucro_total = 0.0
+        self.erros = []  # [{"linha", "codigo", "nome", "erro"}]
+
+    def como_dict(self):
+        return {
+            "linhas": self.linhas,
+            "produtos": self.produtos,
+            "valor_total": self.valor_total,
+            "lucro_total": self.lucro_total,
+            "erros": self.erros,
+        }
+
+
+# -------------------------------
+# 🔹 Entrada
+# -------------------------------
+def linhas_ficheiro(ficheiro, nome_ficheiro):
+    """Lê a factura inteira de um CSV/XLSX (índice = nº da linha)."""
+    try:
+        return pd.concat(list(ler_lotes(ficheiro, nome_ficheiro)))
+    except (ValueError, KeyError, pd.errors.ParserError, zipfile.BadZipFile) as e:
+        raise ErroImportacao(_("Ficheiro ilegível: %(erro)s", erro=e))
+
+
+def linhas_json(dados):
+    """Aceita ``[{...}, ...]`` ou ``{"fornecedor": ..., "linhas": [...]}``.
+
+    Devolve (DataFrame de texto, fornecedor); a linha 1 é o primeiro item.
+    """
+    fornecedor = None
+    if isinstance(dados, dict):
+        fornecedor = dados.get("fornecedor")
+        dados = dados.get("linhas")
+    if not isinstance(dados, list) or not all(isinstance(l, dict) for l in dados):
+        raise ErroImportacao(_("JSON inválido: esperava uma lista de linhas."))
+
+    bloco = pd.DataFrame(dados, dtype=object)
+    bloco = bloco.where(bloco.notna(), "").astype(str)
+    bloco.index = bloco.index + 1
+    return bloco, fornecedor
+
+
+def _cabecalho(nome):
+    return ALIASES.get(normalizar(str(nome)).replace(" ", "_"))
+
+
+def _preparar(bloco, fornecedor):
+    """Valida a factura e devolve (linhas, série de mensagens de erro)."""
+    colunas = {c: _cabecalho(c) for c in bloco.columns}
+    bloco = bloco[[c for c, destino in colunas.items() if destino]].rename(columns=colunas)
+    bloco = bloco.loc[:, ~bloco.columns.duplicated()].copy()
+
+    faltam = [c for c in OBRIGATORIAS if c not in bloco.columns]
+    if faltam:
+        raise ErroImportacao(_("Colunas obrigatórias em falta: %(colunas)s", colunas=", ".join(faltam)))
+
+    for coluna in ("codigo", "produto", "preco_venda", "fornecedor"):
+        if coluna not in bloco.columns:
+            bloco[coluna] = ""
+        bloco[coluna] = bloco[coluna].fillna("").astype(str).str.strip()
+
+    erros = pd.Series("", index=bloco.index)
+
+    def erro(mascara, mensagem):
+        if mascara.any():
+            erros[mascara] = erros[mascara] + mensagem + "; "
+
+    erro(bloco["codigo"] == "", _("código em falta"))
+
+    bloco["quantidade"] = converter_numero(bloco["quantidade"].fillna("").astype(str).str.strip())
+    erro(bloco["quantidade"].isna(), _("quantidade inválida"))
+    erro(bloco["quantidade"] <= 0, _("quantidade tem de ser positiva"))
+    erro(bloco["quantidade"].notna() & (bloco["quantidade"] % 1 != 0), _("quantidade tem de ser inteira"))
+
+    bloco["preco_compra"] = converter_numero(bloco["preco_compra"].fillna("").astype(str).str.strip())
+    erro(bloco["preco_compra"].isna(), _("preço de compra inválido"))
+    erro(bloco["preco_compra"] < 0, _("preço de compra negativo"))
+
+    bruto = bloco["preco_venda"]
+    bloco["preco_venda"] = converter_numero(bruto)
+    erro((bruto != "") & bloco["preco_venda"].isna(), _("preço de venda inválido"))
+
+    # Produtos da factura: uma só consulta
+    codigos = bloco.loc[bloco["codigo"] != "", "codigo"].unique().tolist()
+    produtos = pd.DataFrame(
+        db.session.execute(
+            select(Produto.codigo, Produto.id, Produto.nome, Produto.categoria, Produto.preco_venda)
+            .where(Produto.codigo.in_(codigos))
+        ).all() if codigos else [],
+        columns=["codigo", "produto_id", "nome", "categoria", "preco_venda_atual"],
+    ).set_index("codigo")
+
+    for coluna in produtos.columns:
+        bloco[coluna] = bloco["codigo"].map(produtos[coluna])
+    erro((bloco["codigo"] != "") & bloco["produto_id"].isna(), _("produto inexistente"))
+
+    # Sem preço de venda na factura: fica o do produto
+    bloco["preco_venda"] = bloco["preco_venda"].fillna(bloco["preco_venda_atual"])
+    erro(bloco["produto_id"].notna() & bloco["preco_venda"].isna(), _("preço de venda em falta"))
+    erro(bloco["preco_venda"] < bloco["preco_compra"],
+         _("o preço de venda não pode ser inferior ao preço de compra"))
+
+    if fornecedor:
+        bloco["fornecedor"] = bloco["fornecedor"].mask(bloco["fornecedor"] == "", fornecedor.strip())
+    erro(bloco["fornecedor"].str.len() > 100, _("fornecedor com mais de 100 caracteres"))
+
+    return bloco, erros.str.rstrip("; ")
+
+
+# -------------------------------
+# 🔹 Gravação
+# -------------------------------
+def atualizar_custos(por_produto):
+    """Soma o stock e recalcula o custo médio ponderado de vários produtos.
+
+    ``por_produto`` é {produto_id: (quantidade, custo total)}. O cálculo
+    usa o stock e o custo que estão no banco no momento do UPDATE:
+
+        preco_unitario = (preco_unitario * stock + custo) / (stock + quantidade)
+
+    Incrementa ``versao`` (ver produtos/stock.py). Não faz commit.
+    """
+    ids = list(por_produto)
+    for inicio in range(0, len(ids), LOTE_PRODUTOS):
+        parte = ids[inicio:inicio + LOTE_PRODUTOS]
+        quantidade = case({i: por_produto[i][0] for i in parte}, value=Produto.id, else_=0)
+        custo = case({i: por_produto[i][1] for i in parte}, value=Produto.id, else_=0.0)
+        stock = Produto.stock + quantidade
+
+        resultado = db.session.execute(
+            update(Produto)
+            .where(Produto.id.in_(parte))
+            .values(
+                stock=stock,
+                preco_unitario=case(
+                    (stock > 0, func.round(
+                        (func.coalesce(Produto.preco_unitario, 0) * Produto.stock + custo) / stock, 2
+                    )),
+                    else_=custo / quantidade,
+                ),
+                versao=Produto.versao + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount != len(parte):
+            raise ErroImportacao(_("Um produto da factura foi apagado entretanto. Tente novamente."))
+
+
+def importar_fatura(bloco, fornecedor=None):
+    """Valida e grava a factura (DataFrame de texto, índice = nº da linha).
+
+    Devolve um ResultadoFatura; com erros, nada foi gravado. Faz commit,
+    junto com o registo de auditoria.
+    """
+    resultado = ResultadoFatura()
+    bloco, erros = _preparar(bloco, fornecedor)
+    resultado.linhas = len(bloco)
+
+    invalidos = erros != ""
+    for linha, codigo, nome, mensagem in zip(
+        bloco.index[invalidos], bloco["codigo"][invalidos],
+        bloco["nome"].fillna(bloco["produto"])[invalidos], erros[invalidos]
+    ):
+        resultado.erros.append({"linha": int(linha), "codigo": codigo, "nome": nome, "erro": mensagem})
+    if resultado.erros:
+        return resultado
+    if bloco.empty:
+        raise ErroImportacao(_("A factura não tem linhas."))
+
+    # Cálculos por linha (como em nova_compra) e por produto
+    bloco["produto_id"] = bloco["produto_id"].astype(int)
+    bloco["quantidade"] = bloco["quantidade"].astype(int)
+    bloco["custo"] = bloco["preco_compra"] * bloco["quantidade"]
+    bloco["valor_total"] = bloco["custo"].round(2)
+    bloco["margem_lucro"] = (bloco["preco_venda"] - bloco["preco_compra"]).round(2)
+    bloco["lucro_total"] = (bloco["margem_lucro"] * bloco["quantidade"]).round(2)
+
+    agregado = bloco.groupby("produto_id")[["quantidade", "custo"]].sum()
+    por_produto = {
+        int(pid): (int(q), float(c))
+        for pid, q, c in zip(agregado.index, agregado["quantidade"], agregado["custo"])
+    }
+
+    agora = datetime.utcnow()
+    compras = pd.DataFrame({
+        "codigo_produto": bloco["codigo"],
+        "produto": bloco["nome"],
+        "preco_compra": bloco["preco_compra"],
+        "preco_venda": bloco["preco_venda"].astype(float),
+        "quantidade": bloco["quantidade"].astype(float),
+        "valor_total": bloco["valor_total"],
+        "margem_lucro": bloco["margem_lucro"],
+        "lucro_total": bloco["lucro_total"],
+        "fornecedor": bloco["fornecedor"].mask(bloco["fornecedor"] == "", None),
+        "categoria": bloco["categoria"],
+        "data_compra": agora,
+    }).to_dict("records")
+    # Uma camada de custo por linha, pela ordem da factura
+    camadas = list(zip(
+        bloco["produto_id"].tolist(), bloco["quantidade"].tolist(), bloco["preco_compra"].tolist()
+    ))
+
+    resultado.produtos = len(por_produto)
+    resultado.valor_total = round(float(bloco["valor_total"].sum()), 2)
+    resultado.lucro_total = round(float(bloco["lucro_total"].sum()), 2)
+
+    def gravar_fatura():
+        atualizar_custos(por_produto)
+        registrar_entradas(camadas, "compra", agora)
+        registrar_movimentos([(pid, q) for pid, q, _c in camadas], "compra", data=agora)
+        db.session.execute(insert(Compra), compras)
+        registrar_no_resumo(
+            "compras", agora,
+            compras=resultado.valor_total, lucro=resultado.lucro_total
+        )
+        db.session.add(novo_registo(
+            "Factura de compra importada", "compras",
+            f"{fornecedor or '-'} | Linhas: {resultado.linhas} | Produtos: {resultado.produtos} | "
+            f"Total: {resultado.valor_total} | Lucro: {resultado.lucro_total}"
+        ))
+        db.session.commit()
+
+    try:
+        com_retentativas(gravar_fatura)
+    except ErroImportacao:
+        db.session.rollback()
+        raise
+    return resultado
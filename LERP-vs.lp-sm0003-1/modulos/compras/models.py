@@ -9,7 +9,7 @@ class Compra(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
 
-    codigo_produto = db.Column(db.String(20), nullable=False)
+    codigo_produto = db.Column(db.String(20), nullable=False, index=True)
     produto = db.Column(db.String(100), nullable=False)
 
     preco_compra = db.Column(db.Float, nullable=False)
@@ -28,7 +28,8 @@ class Compra(db.Model):
     data_compra = db.Column(
         db.DateTime,
         default=datetime.utcnow,
-        nullable=False
+        nullable=False,
+        index=True
     )
 
     def __repr__(self):
@@ -42,6 +43,9 @@ class Compra(db.Model):
 # =========================================================
 # 📉 HISTÓRICO DE CUSTO DO PRODUTO
 # =========================================================
+# Cada linha é uma camada de custo (entrada de stock). Os acumulados
+# permitem custear as saídas em FIFO (ver produtos/custos.py); linhas
+# anteriores ao custeio por camadas têm-nos a NULL e são ignoradas.
 class HistoricoCustoProduto(db.Model):
     __tablename__ = "historico_custo_produto"
 
@@ -68,6 +72,13 @@ class HistoricoCustoProduto(db.Model):
         nullable=False
     )
 
+    # Unidades do produto entradas até ao fim desta camada, e o seu custo
+    entrada_acumulada = db.Column(db.Integer)
+    custo_acumulado = db.Column(db.Float)
+
+    # "compra", "ajuste" ou "abertura"
+    origem = db.Column(db.String(20))
+
     def __repr__(self):
         return (
             f"<HistoricoCusto "
@@ -75,3 +86,10 @@ class HistoricoCustoProduto(db.Model):
             f"Custo: {self.custo} | "
             f"Qtd: {self.quantidade}>"
         )
+
+
+db.Index(
+    "ix_historico_custo_camadas",
+    HistoricoCustoProduto.produto_codigo,
+    HistoricoCustoProduto.entrada_acumulada,
+)
@@ -1,21 +1,25 @@
-from flask import render_template, request, redirect, url_for, flash, send_file
+from flask import render_template, request, redirect, url_for, flash, jsonify
 from flask_babel import gettext as _
 from flask_login import login_required, current_user
+from sqlalchemy import or_
 
-from io import BytesIO
-import pandas as pd
-from datetime import datetime, timedelta
-from sqlalchemy import func
-
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
+from datetime import timedelta
 
 from . import compras_bp
 from .forms import CompraForm
-from .models import Compra, HistoricoCustoProduto
+from .importacao import importar_fatura, linhas_ficheiro, linhas_json
+from .models import Compra
 from modulos.extensions import db
 from modulos.produtos.models import Produto
+from modulos.produtos.importacao import ErroImportacao
+from modulos.produtos.pesquisa import codigos_produtos
+from modulos.produtos.stock import ConflitoVersao, com_retentativas, movimentar_stock
 from modulos.auditoria.utils import registrar_acao
+from modulos.resumo.utils import registrar_no_resumo, serie_diaria, totais_resumo
+from modulos.periodos import hoje_local
+from modulos.paginacao import paginar, totais
+from modulos.exportacao import Coluna, Documento
+from modulos.tarefas.utils import exportacao, pedir_exportacao
 
 # =========================================================
 # 🧾 LISTA DE COMPRAS
@@ -37,10 +41,14 @@ def lista_compras():
     if filtro:
         if campo == "codigo":
             query = query.filter(Compra.codigo_produto.ilike(f"%{filtro}%"))
-        elif campo == "categoria":
-            query = query.filter(Compra.categoria.ilike(f"%{filtro}%"))
         else:
-            query = query.filter(Compra.produto.ilike(f"%{filtro}%"))
+            coluna = Compra.categoria if campo == "categoria" else Compra.produto
+            condicao = coluna.ilike(f"%{filtro}%")
+            # Mais as compras dos produtos que o FTS encontra ("acucar" → "Açúcar")
+            codigos = codigos_produtos(filtro, "categoria" if campo == "categoria" else "nome")
+            if codigos is not None:
+                condicao = or_(condicao, Compra.codigo_produto.in_(codigos))
+            query = query.filter(condicao)
 
         registrar_acao(
             acao="Pesquisa na lista de compras",
@@ -48,18 +56,23 @@ def lista_compras():
             detalhes=f"{campo}: {filtro}"
         )
 
-    compras = query.order_by(Compra.data_compra.desc()).all()
-
-    total_geral = db.session.query(func.sum(Compra.valor_total)).scalar() or 0
-    total_lucro = db.session.query(func.sum(Compra.lucro_total)).scalar() or 0
+    pagina = paginar(query, Compra.data_compra, Compra.id)
+    resumo = totais(query, ("compras", campo, filtro), Compra.id,
+                    valor=Compra.valor_total, lucro=Compra.lucro_total)
 
-    produtos_stock = {p.nome: p.stock for p in Produto.query.all()}
+    # Stock actual só dos produtos desta página
+    codigos = {c.codigo_produto for c in pagina.itens}
+    produtos_stock = dict(
+        db.session.query(Produto.nome, Produto.stock).filter(Produto.codigo.in_(codigos))
+    ) if codigos else {}
 
     return render_template(
         "compras/lista_compras.html",
-        compras=compras,
-        total_geral=total_geral,
-        total_lucro=total_lucro,
+        compras=pagina.itens,
+        pagina=pagina,
+        total_registos=resumo["registos"],
+        total_geral=resumo["valor"],
+        total_lucro=resumo["lucro"],
         produtos=produtos_stock,
         titulo=_("Lista de Compras")
     )
@@ -71,20 +84,12 @@ def lista_compras():
 # @login_required
 def nova_compra():
     form = CompraForm()
-    produtos = Produto.query.all()
-
-    produtos_data = [{
-        "codigo": p.codigo,
-        "nome": p.nome,
-        "preco_compra": p.preco_unitario,
-        "preco_venda": p.preco_venda,
-        "categoria": p.categoria
-    } for p in produtos]
 
     if request.method == "POST":
         try:
             codigo_produto = request.form.get("codigo_produto")
-            quantidade = float(request.form.get("quantidade"))
+            # Inteira, como o stock e as camadas de custo
+            quantidade = int(request.form.get("quantidade"))
             preco_compra = float(request.form.get("preco_compra"))
             preco_venda = float(request.form.get("preco_venda"))
             categoria = request.form.get("categoria")
@@ -92,6 +97,11 @@ def nova_compra():
             flash(_("Valores inválidos."), "danger")
             return redirect(url_for("compras.nova_compra"))
 
+        # Uma quantidade abaixo de 1 baixaria o stock e consumiria camadas de custo
+        if quantidade < 1 or preco_compra < 0:
+            flash(_("Valores inválidos."), "danger")
+            return redirect(url_for("compras.nova_compra"))
+
         produto = Produto.query.filter_by(codigo=codigo_produto).first()
         if not produto:
             flash(_("Produto não encontrado."), "danger")
@@ -108,43 +118,41 @@ def nova_compra():
         margem_lucro = round(preco_venda - preco_compra, 2)
         lucro_total = round(margem_lucro * quantidade, 2)
 
-        compra = Compra(
-            codigo_produto=produto.codigo,
-            produto=produto.nome,
-            preco_compra=preco_compra,
-            preco_venda=preco_venda,
-            quantidade=quantidade,
-            valor_total=valor_total,
-            margem_lucro=margem_lucro,
-            lucro_total=lucro_total,
-            categoria=categoria
-        )
+        def gravar_compra():
+            compra = Compra(
+                codigo_produto=produto.codigo,
+                produto=produto.nome,
+                preco_compra=preco_compra,
+                preco_venda=preco_venda,
+                quantidade=quantidade,
+                valor_total=valor_total,
+                margem_lucro=margem_lucro,
+                lucro_total=lucro_total,
+                categoria=categoria
+            )
+
+            # ===============================
+            # ATUALIZAR STOCK (MÉDIA PONDERADA)
+            # ===============================
+            # Compare-and-swap sobre a versão do produto: se outro posto
+            # vender ou comprar entretanto, a operação é repetida.
+            # Também grava a camada no histórico de custo (produtos/custos.py)
+            movimentar_stock(produto.id, quantidade, custo=preco_compra)
+
+            db.session.add(compra)
+            db.session.flush()
+
+            registrar_no_resumo(
+                "compras", compra.data_compra,
+                compras=valor_total, lucro=lucro_total
+            )
+            db.session.commit()
 
-        # ===============================
-        # ATUALIZAR STOCK (MÉDIA PONDERADA)
-        # ===============================
-        stock_antigo = produto.stock
-        custo_antigo = produto.preco_unitario
-
-        produto.stock += quantidade
-        produto.preco_unitario = round(
-            ((custo_antigo * stock_antigo) + (preco_compra * quantidade)) / (stock_antigo + quantidade),
-            2
-        )
-
-        produto.atualizar_estado()
-
-        # ===============================
-        # HISTÓRICO DE CUSTO
-        # ===============================
-        historico = HistoricoCustoProduto(
-            produto_codigo=produto.codigo,
-            custo=preco_compra,
-            quantidade=quantidade
-        )
-
-        db.session.add_all([compra, historico])
-        db.session.commit()
+        try:
+            com_retentativas(gravar_compra)
+        except ConflitoVersao:
+            flash(_("O stock está a ser alterado noutro posto. Tente novamente."), "warning")
+            return redirect(url_for("compras.nova_compra"))
 
         registrar_acao(
             acao="Nova compra registrada",
@@ -155,41 +163,81 @@ def nova_compra():
         flash(_("Compra registrada com sucesso!"), "success")
         return redirect(url_for("compras.lista_compras"))
 
+    # O autocomplete consulta /produtos/api/buscar; o catálogo não vai na página
     return render_template(
         "compras/nova_compra.html",
-        form=form,
-        produtos=produtos_data
+        form=form
     )
 
+# =========================================================
+# 📥 IMPORTAR FACTURA DO FORNECEDOR (CSV / XLSX / JSON)
+# =========================================================
+@compras_bp.route("/compras/importar", methods=["GET", "POST"])
+# @login_required
+def importar_compras():
+    if request.method == "GET":
+        return render_template("compras/importar.html", resultado=None)
+
+    # JSON: {"fornecedor": "...", "linhas": [{"codigo", "quantidade", "preco_compra", ...}]}
+    if request.is_json:
+        try:
+            bloco, fornecedor = linhas_json(request.get_json(silent=True))
+            resultado = importar_fatura(bloco, fornecedor)
+        except ErroImportacao as e:
+            return jsonify({"erro": str(e)}), 400
+        return jsonify(resultado.como_dict()), 400 if resultado.erros else 200
+
+    ficheiro = request.files.get("ficheiro")
+    fornecedor = request.form.get("fornecedor", "").strip() or None
+    if not ficheiro or not ficheiro.filename:
+        flash(_("Escolha um ficheiro CSV ou XLSX."), "danger")
+        return redirect(url_for("compras.importar_compras"))
+
+    try:
+        resultado = importar_fatura(linhas_ficheiro(ficheiro.stream, ficheiro.filename), fornecedor)
+    except ErroImportacao as e:
+        flash(str(e), "danger")
+        return redirect(url_for("compras.importar_compras"))
+
+    if resultado.erros:
+        flash(_("A factura tem %(n)s linhas com erro; nada foi registado.", n=len(resultado.erros)), "danger")
+        return render_template("compras/importar.html", resultado=resultado)
+
+    flash(_("Factura registada: %(linhas)s linhas, %(produtos)s produtos, total %(total).2f MT.",
+            linhas=resultado.linhas, produtos=resultado.produtos, total=resultado.valor_total),
+          "success")
+    return redirect(url_for("compras.lista_compras"))
+
+
 # =========================================================
 # 📊 EXPORTAR EXCEL
 # =========================================================
+def colunas_excel():
+    return [
+        Coluna(_("Código"), "codigo_produto"),
+        Coluna(_("Produto"), "produto", largura=30),
+        Coluna(_("Categoria"), "categoria"),
+        Coluna(_("Preço Compra"), "preco_compra", "dinheiro"),
+        Coluna(_("Preço Venda"), "preco_venda", "dinheiro"),
+        Coluna(_("Quantidade"), "quantidade", "numero"),
+        Coluna(_("Valor Total"), "valor_total", "dinheiro"),
+        Coluna(_("Margem"), "margem_lucro", "dinheiro"),
+        Coluna(_("Lucro Total"), "lucro_total", "dinheiro"),
+        Coluna(_("Data"), "data_compra", "data"),
+    ]
+
+
+@exportacao("compras.excel")
+def documento_excel(parametros):
+    compras = Compra.query.order_by(Compra.data_compra.desc(), Compra.id.desc())
+    return Documento("excel", "compras.xlsx", _("Compras"), colunas_excel(), compras)
+
+
 @compras_bp.route("/compras/exportar/excel")
 # @login_required
 def exportar_excel():
-    compras = Compra.query.order_by(Compra.data_compra.desc()).all()
-
     registrar_acao(acao="Exportou compras para Excel", modulo="compras")
-
-    data = [{
-        _("Código"): c.codigo_produto,
-        _("Produto"): c.produto,
-        _("Categoria"): c.categoria,
-        _("Preço Compra"): c.preco_compra,
-        _("Preço Venda"): c.preco_venda,
-        _("Quantidade"): c.quantidade,
-        _("Valor Total"): c.valor_total,
-        _("Margem"): c.margem_lucro,
-        _("Lucro Total"): c.lucro_total,
-        _("Data"): c.data_compra.strftime("%d/%m/%Y %H:%M"),
-    } for c in compras]
-
-    df = pd.DataFrame(data)
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name=_("Compras"))
-    output.seek(0)
-    return send_file(output, as_attachment=True, download_name="compras.xlsx")
+    return pedir_exportacao("compras.excel")
 
 # =========================================================
 # 📄 EXPORTAR PDF
@@ -197,60 +245,21 @@ def exportar_excel():
 @compras_bp.route("/compras/exportar/pdf")
 # @login_required
 def exportar_pdf():
-    compras = Compra.query.order_by(Compra.data_compra.desc()).all()
-
     registrar_acao(acao="Exportou compras para PDF", modulo="compras")
+    return pedir_exportacao("compras.pdf")
 
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    largura, altura = A4
-
-    y = altura - 50
-    pdf.setFont("Helvetica-Bold", 16)
-    pdf.drawCentredString(largura / 2, y, _("Relatório de Compras - LERP Management"))
-    y -= 30
-
-    pdf.setFont("Helvetica", 9)
-    pdf.drawString(40, y, _("Gerado em: ") + datetime.now().strftime("%d/%m/%Y %H:%M"))
-    y -= 25
-
-    pdf.setFont("Helvetica-Bold", 9)
-    pdf.drawString(40, y, _("Produto"))
-    pdf.drawString(200, y, _("Total"))
-    pdf.drawString(270, y, _("Lucro"))
-    pdf.drawString(340, y, _("Categoria"))
-    pdf.drawString(440, y, _("Data"))
-    y -= 15
-
-    pdf.setFont("Helvetica", 9)
-    total_geral = 0
-    total_lucro = 0
-
-    for c in compras:
-        pdf.drawString(40, y, c.produto[:30])
-        pdf.drawString(200, y, f"{c.valor_total:.2f} MT")
-        pdf.drawString(270, y, f"{c.lucro_total:.2f} MT")
-        pdf.drawString(340, y, c.categoria or "-")
-        pdf.drawString(440, y, c.data_compra.strftime("%d/%m/%Y"))
-
-        total_geral += c.valor_total
-        total_lucro += c.lucro_total
-        y -= 14
-
-        if y < 60:
-            pdf.showPage()
-            pdf.setFont("Helvetica", 9)
-            y = altura - 50
-
-    y -= 10
-    pdf.setFont("Helvetica-Bold", 11)
-    pdf.drawString(40, y, _("Total Compras: ") + f"{total_geral:.2f} MT")
-    y -= 15
-    pdf.drawString(40, y, _("Total Lucro: ") + f"{total_lucro:.2f} MT")
-
-    pdf.save()
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name="compras.pdf", mimetype="application/pdf")
+
+@exportacao("compras.pdf")
+def documento_pdf(parametros):
+    compras = Compra.query.order_by(Compra.data_compra.desc(), Compra.id.desc())
+    colunas = [
+        Coluna(_("Produto"), "produto", largura=30),
+        Coluna(_("Total"), "valor_total", "dinheiro", total=True),
+        Coluna(_("Lucro"), "lucro_total", "dinheiro", total=True),
+        Coluna(_("Categoria"), "categoria"),
+        Coluna(_("Data"), "data_compra", "dia", largura=12),
+    ]
+    return Documento("pdf", "compras.pdf", _("Relatório de Compras - LERP Management"), colunas, compras)
 
 # =========================================================
 # 📊 DASHBOARD FINANCEIRO
@@ -258,31 +267,27 @@ def exportar_pdf():
 @compras_bp.route("/compras/dashboard")
 # @login_required
 def dashboard_compras():
-    hoje = datetime.today().date()
+    hoje = hoje_local()
 
-    # Totais gerais
-    total_compras = db.session.query(func.sum(Compra.valor_total)).scalar() or 0
-    total_lucro = db.session.query(func.sum(Compra.lucro_total)).scalar() or 0
-
-    # Compras de hoje
-    compras_hoje = db.session.query(func.sum(Compra.valor_total)).filter(func.date(Compra.data_compra) == hoje).scalar() or 0
-    lucro_hoje = db.session.query(func.sum(Compra.lucro_total)).filter(func.date(Compra.data_compra) == hoje).scalar() or 0
+    # Totais gerais (resumo diário)
+    totais = totais_resumo("compras")
+    total_compras = totais["compras"]
+    total_lucro = totais["lucro"]
 
     # Últimas compras
     ultimas_compras = Compra.query.order_by(Compra.data_compra.desc()).limit(5).all()
 
-    # ======= Gráfico últimos 30 dias =======
+    # ======= Gráfico últimos 30 dias (uma leitura por intervalo) =======
     dias = [hoje - timedelta(days=i) for i in reversed(range(30))]
-    chart_labels = [d.strftime("%d/%m") for d in dias]
+    resumo = serie_diaria("compras", dias[0], hoje)
 
-    chart_compras = []
-    chart_lucro = []
+    chart_labels = [d.strftime("%d/%m") for d in dias]
+    chart_compras = [round(resumo[d].compras, 2) if d in resumo else 0 for d in dias]
+    chart_lucro = [round(resumo[d].lucro, 2) if d in resumo else 0 for d in dias]
 
-    for d in dias:
-        soma_compra = db.session.query(func.sum(Compra.valor_total)).filter(func.date(Compra.data_compra) == d).scalar() or 0
-        soma_lucro = db.session.query(func.sum(Compra.lucro_total)).filter(func.date(Compra.data_compra) == d).scalar() or 0
-        chart_compras.append(round(soma_compra, 2))
-        chart_lucro.append(round(soma_lucro, 2))
+    # Compras de hoje
+    compras_hoje = chart_compras[-1]
+    lucro_hoje = chart_lucro[-1]
 
     registrar_acao(acao="Acessou dashboard financeiro", modulo="compras")
 
@@ -1,19 +1,20 @@
 from flask import (
-    render_template, redirect, url_for, flash, request, send_file, session
+    render_template, redirect, url_for, flash, request
 )
 from flask_babel import gettext as _
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 import json
-import pandas as pd
+from operator import itemgetter
 
 from . import cotacoes_bp
 from modulos.extensions import db
 from modulos.produtos.models import Produto
 from modulos.vendas.models import Venda
+from modulos.vendas.carrinho import carregar_no_carrinho
 from .models import Cotacao
 from .forms import CotacaoForm
+from modulos.exportacao import Coluna, resposta_excel
+from modulos.renderizacao import resposta_renderizada
+from modulos.renderizacao.documentos import cotacao_pdf
 
 
 # ================================
@@ -125,7 +126,7 @@ def abrir_na_venda(cotacao_id):
         flash(_("Esta cotação já foi utilizada."), "warning")
         return redirect(url_for("cotacoes.listar_cotacoes"))
 
-    session["carrinho_venda"] = cotacao.itens
+    carregar_no_carrinho(cotacao.itens)
     cotacao.status = "convertida"
     db.session.commit()
 
@@ -140,39 +141,30 @@ def abrir_na_venda(cotacao_id):
 def gerar_pdf(cotacao_id):
     cotacao = Cotacao.query.get_or_404(cotacao_id)
 
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    y = 800
-
-    pdf.setFont("Helvetica-Bold", 14)
-    pdf.drawString(50, y, "COTAÇÃO")
-    y -= 30
-
-    pdf.setFont("Helvetica", 11)
-    pdf.drawString(50, y, f"Cliente: {cotacao.cliente}")
-    y -= 20
-    pdf.drawString(50, y, f"Data: {cotacao.data_cotacao.strftime('%d/%m/%Y %H:%M')}")
-    y -= 30
-
-    for i, item in enumerate(cotacao.itens, 1):
-        pdf.drawString(
-            50,
-            y,
+    espec = {
+        "titulo": "COTAÇÃO",
+        "cabecalho": [
+            f"Cliente: {cotacao.cliente}",
+            f"Data: {cotacao.data_cotacao.strftime('%d/%m/%Y %H:%M')}",
+        ],
+        "itens": [
             f"{i}. {item['nome']} | Qtd: {item['quantidade']} | "
             f"Preço: {item['preco_unitario']:.2f} | "
             f"Subtotal: {item['subtotal']:.2f}"
-        )
-        y -= 15
-
-    y -= 20
-    pdf.setFont("Helvetica-Bold", 12)
-    pdf.drawString(50, y, f"TOTAL: {cotacao.total_valor:.2f}")
+            for i, item in enumerate(cotacao.itens, 1)
+        ],
+        "total": f"TOTAL: {cotacao.total_valor:.2f}",
+    }
+    return resposta_renderizada(cotacao_pdf, espec, f"Cotacao_{cotacao.id}.pdf")
 
-    pdf.showPage()
-    pdf.save()
-    buffer.seek(0)
 
-    return send_file(buffer, as_attachment=True, download_name=f"Cotacao_{cotacao.id}.pdf", mimetype="application/pdf")
+# Itens da cotação (dicts gravados em itens_json)
+COLUNAS_EXCEL = [
+    Coluna("Produto", itemgetter("nome"), largura=30),
+    Coluna("Quantidade", itemgetter("quantidade"), "numero"),
+    Coluna("Preço Unitário", itemgetter("preco_unitario"), "dinheiro"),
+    Coluna("Subtotal", itemgetter("subtotal"), "dinheiro"),
+]
 
 
 # ================================
@@ -182,24 +174,4 @@ def gerar_pdf(cotacao_id):
 def gerar_excel(cotacao_id):
     cotacao = Cotacao.query.get_or_404(cotacao_id)
 
-    data = []
-    for item in cotacao.itens:
-        data.append({
-            "Produto": item["nome"],
-            "Quantidade": item["quantidade"],
-            "Preço Unitário": item["preco_unitario"],
-            "Subtotal": item["subtotal"]
-        })
-
-    df = pd.DataFrame(data)
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Cotacao")
-    output.seek(0)
-
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name=f"Cotacao_{cotacao.id}.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    return resposta_excel(f"Cotacao_{cotacao.id}.xlsx", "Cotacao", COLUNAS_EXCEL, cotacao.itens)
@@ -0,0 +1,134 @@
+# modulos/esquema.py
+"""Manutenção do esquema do banco que o db.create_all() não cobre."""
+import time
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, inspect, text
+
+from modulos.extensions import db
+from modulos.periodos import hoje_local, intervalo
+
+esquema_cli = AppGroup("esquema", help="Manutenção do esquema do banco.")
+
+
+# -------------------------------
+# 🔹 Índices
+# -------------------------------
+def garantir_indices():
+    """Cria os índices declarados nos modelos que ainda não existem.
+
+    O db.create_all() só cria índices junto com tabelas novas; bancos já
+    em produção recebem aqui os índices acrescentados depois.
+    """
+    for tabela in db.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            indice.create(db.engine, checkfirst=True)
+
+
+# -------------------------------
+# 🔹 Modo WAL (SQLite)
+# -------------------------------
+def garantir_wal():
+    """Põe o banco SQLite em modo WAL (a escolha fica gravada no ficheiro).
+
+    Sem WAL, uma leitura longa — uma exportação em segundo plano a
+    percorrer a tabela — impede as outras ligações de gravar até acabar.
+    Em WAL leitores e escritor não se bloqueiam.
+    """
+    if db.engine.dialect.name != "sqlite":
+        return
+    with db.engine.connect() as con:
+        con.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+
+# -------------------------------
+# 🔹 Colunas
+# -------------------------------
+def garantir_colunas():
+    """Acrescenta às tabelas existentes as colunas novas dos modelos.
+
+    Só serve para colunas opcionais ou com ``server_default`` — é o caso
+    de todas as colunas acrescentadas depois da primeira versão.
+    """
+    inspetor = inspect(db.engine)
+    tabelas = set(inspetor.get_table_names())
+
+    with db.engine.begin() as con:
+        for tabela in db.metadata.sorted_tables:
+            if tabela.name not in tabelas:
+                continue
+            existentes = {c["name"] for c in inspetor.get_columns(tabela.name)}
+            for coluna in tabela.columns:
+                if coluna.name in existentes:
+                    continue
+                tipo = coluna.type.compile(dialect=db.engine.dialect)
+                sql = f"ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {tipo}"
+                if coluna.server_default is not None:
+                    sql += f" DEFAULT {coluna.server_default.arg}"
+                    if not coluna.nullable:
+                        sql += " NOT NULL"
+                con.execute(text(sql))
+                print(f"✔ Coluna {tabela.name}.{coluna.name} criada.")
+
+
+# -------------------------------
+# 🔹 flask esquema plano
+# -------------------------------
+def _consultas_por_data():
+    """(nome, coluna de data, coluna somada, utc) de cada livro com filtro de data."""
+    from modulos.vendas.models import Venda
+    from modulos.compras.models import Compra
+    from modulos.pagamentos.models import Pagamento
+    from modulos.caixa.models import Caixa
+    from modulos.auditoria.models import Auditoria
+
+    return [
+        ("vendas.data_venda", Venda.data_venda, Venda.total_valor, False),
+        ("compras.data_compra", Compra.data_compra, Compra.valor_total, True),
+        ("pagamentos.data_pagamento", Pagamento.data_pagamento, Pagamento.valor, True),
+        ("caixa.data", Caixa.data, Caixa.valor, True),
+        ("auditoria.data", Auditoria.data, Auditoria.id, True),
+    ]
+
+
+def _plano(consulta):
+    sql = str(consulta.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+    if db.engine.dialect.name == "sqlite":
+        linhas = db.session.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+        return " | ".join(linha[-1] for linha in linhas)
+    linhas = db.session.execute(text("EXPLAIN " + sql)).all()
+    return " | ".join(str(linha[0]) for linha in linhas)
+
+
+def _cronometrar(consulta, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        consulta.scalar()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+@esquema_cli.command("plano")
+@click.option("--periodo", default="mes", show_default=True,
+              type=click.Choice(["hoje", "semana", "mes", "ano"]))
+@click.option("--repeticoes", default=20, show_default=True)
+def plano(periodo, repeticoes):
+    """Compara o filtro antigo (func.date) com o intervalo indexado."""
+    hoje = hoje_local()
+
+    for nome, coluna, valor, utc in _consultas_por_data():
+        inicio, fim = intervalo(periodo, hoje, utc=utc)
+        antiga = db.session.query(func.sum(valor)).filter(func.date(coluna) == hoje)
+        nova = db.session.query(func.sum(valor)).filter(coluna >= inicio, coluna < fim)
+
+        click.echo(f"== {nome}")
+        click.echo(f"   antes : {_cronometrar(antiga, repeticoes):8.3f} ms  {_plano(antiga)}")
+        click.echo(f"   depois: {_cronometrar(nova, repeticoes):8.3f} ms  {_plano(nova)}")
+
+
+@esquema_cli.command("indices")
+def indices():
+    """Cria as colunas e os índices em falta num banco existente."""
+    garantir_colunas()
+    garantir_indices()
+    click.echo("✔ Colunas e índices verificados.")
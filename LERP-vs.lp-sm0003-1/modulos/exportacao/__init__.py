@@ -0,0 +1,4 @@
+# Exportação de listagens (Excel e PDF) partilhada pelos módulos
+from .excel import Coluna, escrever_excel, ler_em_lotes, resposta_excel
+from .pdf import escrever_pdf
+from .documento import Documento
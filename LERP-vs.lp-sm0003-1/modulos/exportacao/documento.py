@@ -0,0 +1,48 @@
+# modulos/exportacao/documento.py
+"""Descrição completa de uma exportação, para ser escrita mais tarde.
+
+As rotas de exportação devolvem um ``Documento`` em vez da resposta; a
+fila de tarefas (modulos/tarefas) escreve-o em segundo plano.
+"""
+from .excel import MIMETYPE_XLSX, escrever_excel, ler_em_lotes
+from .pdf import MIMETYPE_PDF, escrever_pdf
+
+MIMETYPES = {"excel": MIMETYPE_XLSX, "pdf": MIMETYPE_PDF}
+
+
+class Documento:
+    """Formato ("excel" ou "pdf"), nome do download, colunas e query.
+
+    ``titulo`` é o título do relatório PDF ou o nome da folha Excel.
+    """
+
+    def __init__(self, formato, nome_ficheiro, titulo, colunas, query, subtitulo=""):
+        if formato not in MIMETYPES:
+            raise ValueError(f"Formato de exportação desconhecido: {formato}")
+        self.formato = formato
+        self.nome_ficheiro = nome_ficheiro
+        self.titulo = str(titulo)
+        self.colunas = colunas
+        self.query = query
+        self.subtitulo = str(subtitulo)
+
+    @property
+    def mimetype(self):
+        return MIMETYPES[self.formato]
+
+    def contar(self):
+        """Número de linhas que a exportação vai ter."""
+        return self.query.order_by(None).count()
+
+    def escrever(self, destino, envolver=None):
+        """Escreve o documento em ``destino`` e devolve quantas linhas teve.
+
+        ``envolver`` recebe o iterador das linhas e devolve outro (ex.:
+        para contar o progresso).
+        """
+        linhas = ler_em_lotes(self.query, self.colunas)
+        if envolver is not None:
+            linhas = envolver(linhas)
+        if self.formato == "pdf":
+            return escrever_pdf(destino, self.titulo, self.colunas, linhas, self.subtitulo)
+        return escrever_excel(destino, self.titulo, self.colunas, linhas)
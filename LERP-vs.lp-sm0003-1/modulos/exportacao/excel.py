@@ -0,0 +1,134 @@
+# modulos/exportacao/excel.py
+"""Exportação para Excel com memória constante.
+
+Os módulos declaram apenas as colunas:
+
+    COLUNAS = [
+        Coluna("Código", "codigo_venda"),
+        Coluna("Data", "data_venda", "data"),
+        Coluna("Total", "total_valor", "dinheiro"),
+    ]
+    return resposta_excel("vendas.xlsx", "Vendas", COLUNAS, ler_em_lotes(query, COLUNAS))
+
+As linhas são lidas do banco em lotes (``yield_per``) e escritas uma a
+uma pelo xlsxwriter em modo ``constant_memory``; o ficheiro final vai
+para um SpooledTemporaryFile (memória até ``EXPORTACAO_MAX_MEMORIA``
+bytes, depois disco) e é enviado em blocos. Nenhuma fase guarda a
+tabela inteira em memória.
+"""
+import tempfile
+from datetime import date, datetime
+from operator import attrgetter
+
+import xlsxwriter
+from flask import current_app, send_file
+
+MIMETYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Limite de linhas de uma folha do Excel (inclui o cabeçalho)
+MAX_LINHAS_FOLHA = 1_048_576
+
+LOTE = 1000
+
+FORMATOS = {
+    "texto": {},
+    "numero": {"num_format": "0.##"},
+    "dinheiro": {"num_format": "#,##0.00"},
+    "data": {"num_format": "dd/mm/yyyy hh:mm"},
+    "dia": {"num_format": "dd/mm/yyyy"},
+}
+
+
+class Coluna:
+    """Uma coluna da exportação.
+
+    ``valor`` é o nome do atributo da linha ou uma função linha → valor;
+    ``formato`` é uma das chaves de FORMATOS. ``total`` marca as colunas
+    somadas nos relatórios PDF.
+    """
+
+    def __init__(self, titulo, valor, formato="texto", largura=16, total=False):
+        self.titulo = titulo
+        self.atributo = None if callable(valor) else valor
+        self.valor = valor if callable(valor) else attrgetter(valor)
+        self.formato = formato
+        self.largura = largura
+        self.total = total
+
+
+def ler_em_lotes(query, colunas=None, lote=LOTE):
+    """Percorre a query em lotes, com cursor no servidor quando o banco suporta.
+
+    Com ``colunas`` (todas por nome de atributo), lê só essas colunas em
+    vez de montar um objeto ORM por linha.
+    """
+    if colunas and all(c.atributo for c in colunas):
+        modelo = query.column_descriptions[0]["entity"]
+        nomes = dict.fromkeys(c.atributo for c in colunas)
+        query = query.with_entities(*(getattr(modelo, nome) for nome in nomes))
+    return query.execution_options(stream_results=True).yield_per(lote)
+
+
+# -------------------------------
+# 🔹 Escrita
+# -------------------------------
+def _nova_folha(livro, nome, colunas, cabecalho, formatos):
+    folha = livro.add_worksheet(nome[:31])
+    for c, coluna in enumerate(colunas):
+        folha.set_column(c, c, coluna.largura, formatos[coluna.formato])
+        folha.write(0, c, str(coluna.titulo), cabecalho)
+    return folha
+
+
+def escrever_excel(destino, nome_folha, colunas, linhas):
+    """Escreve as linhas em ``destino`` (caminho ou ficheiro) e devolve quantas foram.
+
+    Passado o limite de linhas do Excel, continua numa folha nova.
+    """
+    livro = xlsxwriter.Workbook(destino, {
+        "constant_memory": True,
+        "tmpdir": tempfile.gettempdir(),
+        "remove_timezone": True,
+    })
+    cabecalho = livro.add_format({"bold": True})
+    formatos = {nome: livro.add_format(spec) for nome, spec in FORMATOS.items()}
+
+    folhas = 1
+    folha = _nova_folha(livro, nome_folha, colunas, cabecalho, formatos)
+    total = 0
+    r = 0
+
+    for linha in linhas:
+        r += 1
+        if r == MAX_LINHAS_FOLHA:
+            folhas += 1
+            folha = _nova_folha(livro, f"{nome_folha} ({folhas})"[-31:], colunas, cabecalho, formatos)
+            r = 1
+
+        for c, coluna in enumerate(colunas):
+            valor = coluna.valor(linha)
+            if valor is None:
+                continue
+            formato = formatos[coluna.formato]
+            if isinstance(valor, (datetime, date)):
+                folha.write_datetime(r, c, valor, formato)
+            else:
+                folha.write(r, c, valor, formato)
+        total += 1
+
+    livro.close()
+    return total
+
+
+def resposta_excel(nome_ficheiro, nome_folha, colunas, linhas):
+    """Gera o .xlsx num ficheiro temporário e devolve-o como download."""
+    limite = current_app.config.get("EXPORTACAO_MAX_MEMORIA", 8 * 1024 * 1024)
+    ficheiro = tempfile.SpooledTemporaryFile(max_size=limite)
+    escrever_excel(ficheiro, str(nome_folha), colunas, linhas)
+    ficheiro.seek(0)
+    return send_file(
+        ficheiro,
+        as_attachment=True,
+        download_name=nome_ficheiro,
+        mimetype=MIMETYPE_XLSX,
+    )
@@ -0,0 +1,243 @@
+# modulos/exportacao/pdf.py
+"""Relatórios PDF de listagens, escritos página a página.
+
+Usa as mesmas colunas da exportação Excel; as rotas devolvem um
+``Documento`` e a fila de tarefas chama ``escrever_pdf``:
+
+    @exportacao("vendas.pdf")
+    def documento_pdf(parametros):
+        COLUNAS = [
+            Coluna("Código", "codigo_venda"),
+            Coluna("Total (MT)", "total_valor", "dinheiro", total=True),
+        ]
+        return Documento("pdf", "vendas.pdf", "Relatório de Vendas", COLUNAS, query)
+
+Cada página tem altura de linha fixa, por isso cabe sempre o mesmo
+número de linhas: o relatório tira do iterador um bloco desse tamanho,
+desenha a página num ``Canvas`` do reportlab (título, cabeçalho da
+tabela, "Transporte" com os totais acumulados, linhas e rodapé com "A
+transportar" ou "Total") e fecha-a com ``showPage()``. Só há uma página
+de linhas em memória de cada vez, e o tempo cresce em linha recta com o
+número de linhas. Até ao ``save()`` o reportlab guarda de cada página
+apenas os operadores de desenho (alguns KB), não as linhas.
+"""
+from datetime import date, datetime
+from itertools import islice
+
+from flask_babel import gettext as _
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
+
+MIMETYPE_PDF = "application/pdf"
+
+MARGEM = 36
+ALTURA_LINHA = 14
+TAMANHO_FONTE = 8.5
+TAMANHO_TITULO = 14
+FOLGA = 3  # espaço entre o texto e a borda da célula
+
+COR_CABECALHO = (0.043, 0.310, 0.541)  # #0b4f8a, como nas tabelas antigas
+COR_ZEBRA = (0.95, 0.95, 0.95)
+COR_TOTAIS = (0.85, 0.85, 0.85)
+
+FONTE = "Helvetica"
+FONTE_NEGRITO = "Helvetica-Bold"
+NUMERICOS = ("numero", "dinheiro")
+RETICENCIAS = "…"
+
+
+# -------------------------------
+# 🔹 Formatação das células
+# -------------------------------
+def formatar(valor, formato):
+    """Texto de uma célula segundo o formato da coluna."""
+    if valor is None:
+        return ""
+    if formato == "dinheiro":
+        return f"{float(valor):,.2f}"
+    if formato == "numero":
+        if isinstance(valor, float) and not valor.is_integer():
+            return f"{valor:,.2f}"
+        return f"{int(valor):,}"
+    if formato == "data" and isinstance(valor, datetime):
+        return valor.strftime("%d/%m/%Y %H:%M")
+    if formato in ("data", "dia") and isinstance(valor, date):
+        return valor.strftime("%d/%m/%Y")
+    return str(valor)
+
+
+def _cortar(texto, fonte, largura):
+    """Corta o texto com "…" para caber em ``largura`` pontos."""
+    medida = stringWidth(texto, fonte, TAMANHO_FONTE)
+    if medida <= largura:
+        return texto
+
+    def cabe(n):
+        return stringWidth(texto[:n] + RETICENCIAS, fonte, TAMANHO_FONTE) <= largura
+
+    # Estimativa proporcional, acertada letra a letra
+    n = int(len(texto) * largura / medida)
+    while n > 0 and not cabe(n):
+        n -= 1
+    while n + 1 < len(texto) and cabe(n + 1):
+        n += 1
+    return texto[:n] + RETICENCIAS
+
+
+# -------------------------------
+# 🔹 Relatório
+# -------------------------------
+class Relatorio:
+    """Tudo o que é igual em todas as páginas de um relatório.
+
+    Os rótulos já vêm traduzidos.
+    """
+
+    def __init__(self, colunas, titulo, subtitulo, rotulos, tamanho=A4):
+        self.largura, self.altura = tamanho
+        util = self.largura - 2 * MARGEM
+        peso = sum(c.largura for c in colunas) or 1
+        self.formatos = [c.formato for c in colunas]
+        self.totais = [c.total for c in colunas]
+        self.com_totais = any(self.totais)
+        self.larguras = [util * c.largura / peso for c in colunas]
+        self.xs = [MARGEM + sum(self.larguras[:i]) for i in range(len(colunas))]
+        self.direita = [c.formato in NUMERICOS for c in colunas]
+        self.titulos = [str(c.titulo) for c in colunas]
+        self.cabecalho = str(titulo)
+        self.subtitulo = str(subtitulo)
+        self.rotulos = rotulos
+
+        # Por cima da tabela: título e subtítulo; por baixo: o número da página.
+        # Além das linhas de dados cabem o cabeçalho, o transporte e os totais.
+        self.topo_tabela = self.altura - MARGEM - 2 * ALTURA_LINHA - 6
+        base = MARGEM + ALTURA_LINHA
+        self.linhas_por_pagina = int((self.topo_tabela - base - 2) / ALTURA_LINHA) - 3
+
+    def somar(self, totais, valores):
+        """Acrescenta a ``totais`` as colunas somadas das linhas ``valores``."""
+        for i, somada in enumerate(self.totais):
+            if somada:
+                totais[i] += sum(float(linha[i]) for linha in valores if linha[i] is not None)
+
+    def _faixa(self, canvas, y, cor):
+        canvas.setFillColorRGB(*cor)
+        canvas.rect(MARGEM, y, self.largura - 2 * MARGEM, ALTURA_LINHA, stroke=0, fill=1)
+
+    def _celulas(self, canvas, y, textos, fonte=FONTE, cor=(0, 0, 0)):
+        canvas.setFont(fonte, TAMANHO_FONTE)
+        canvas.setFillColorRGB(*cor)
+        for texto, x, largura, direita in zip(textos, self.xs, self.larguras, self.direita):
+            if not texto:
+                continue
+            texto = _cortar(texto, fonte, largura - 2 * FOLGA)
+            if direita:
+                canvas.drawRightString(x + largura - FOLGA, y + 4, texto)
+            else:
+                canvas.drawString(x + FOLGA, y + 4, texto)
+
+    def _linha_totais(self, canvas, y, rotulo, totais):
+        textos = [formatar(t, f) if somada else "" for t, f, somada in zip(totais, self.formatos, self.totais)]
+        if not textos[0]:
+            textos[0] = rotulo
+        self._faixa(canvas, y, COR_TOTAIS)
+        self._celulas(canvas, y, textos, FONTE_NEGRITO)
+
+    def pagina(self, canvas, valores, numero, totais, ultima):
+        """Desenha uma página no canvas e fecha-a; soma as linhas em ``totais``."""
+        topo = self.altura - MARGEM
+        canvas.setFillColorRGB(0, 0, 0)
+        canvas.setFont(FONTE_NEGRITO, TAMANHO_TITULO)
+        canvas.drawString(MARGEM, topo - TAMANHO_TITULO, self.cabecalho)
+        canvas.setFont(FONTE, TAMANHO_FONTE)
+        canvas.drawString(MARGEM, topo - TAMANHO_TITULO - ALTURA_LINHA, self.subtitulo)
+
+        y = self.topo_tabela - ALTURA_LINHA
+        self._faixa(canvas, y, COR_CABECALHO)
+        self._celulas(canvas, y, self.titulos, FONTE_NEGRITO, cor=(1, 1, 1))
+
+        if self.com_totais and numero > 1:
+            y -= ALTURA_LINHA
+            self._linha_totais(canvas, y, self.rotulos["transporte"], totais)
+
+        for i, linha in enumerate(valores):
+            y -= ALTURA_LINHA
+            if i % 2:
+                self._faixa(canvas, y, COR_ZEBRA)
+            self._celulas(canvas, y, [formatar(v, f) for v, f in zip(linha, self.formatos)])
+        self.somar(totais, valores)
+
+        if not valores:
+            y -= ALTURA_LINHA
+            canvas.setFont(FONTE, TAMANHO_FONTE)
+            canvas.setFillColorRGB(0, 0, 0)
+            canvas.drawString(MARGEM + FOLGA, y + 4, self.rotulos["sem_registos"])
+
+        y -= 2
+        canvas.setLineWidth(0.5)
+        canvas.setStrokeGray(0.5)
+        canvas.line(MARGEM, y, self.largura - MARGEM, y)
+        if self.com_totais:
+            y -= ALTURA_LINHA
+            rotulo = self.rotulos["total"] if ultima else self.rotulos["a_transportar"]
+            self._linha_totais(canvas, y, rotulo, totais)
+
+        canvas.setFont(FONTE, TAMANHO_FONTE)
+        canvas.setFillColorRGB(0, 0, 0)
+        canvas.drawRightString(self.largura - MARGEM, MARGEM, f"{self.rotulos['pagina']} {numero}")
+        canvas.showPage()
+
+
+def rotulos_pdf():
+    """Rótulos fixos do relatório, traduzidos no idioma actual."""
+    return {
+        "transporte": _("Transporte"),
+        "a_transportar": _("A transportar"),
+        "total": _("Total"),
+        "sem_registos": _("Sem registos."),
+        "pagina": _("Página"),
+    }
+
+
+def escrever_pdf(destino, titulo, colunas, linhas, subtitulo="", tamanho=A4):
+    """Escreve o relatório em ``destino`` (ficheiro binário) e devolve quantas linhas teve.
+
+    As colunas com ``total=True`` são somadas: cada página a partir da
+    segunda começa com o "Transporte" e termina com "A transportar";
+    a última termina com o "Total".
+    """
+    gerado_em = _("Gerado em: %(data)s", data=datetime.now().strftime("%d/%m/%Y %H:%M"))
+    relatorio = Relatorio(
+        colunas, titulo,
+        f"{subtitulo}  ·  {gerado_em}" if subtitulo else gerado_em,
+        rotulos_pdf(), tamanho,
+    )
+    canvas = Canvas(destino, pagesize=tamanho, pageCompression=1)
+    canvas.setTitle(str(titulo))
+    extrair = [c.valor for c in colunas]
+    por_pagina = relatorio.linhas_por_pagina
+
+    def ler_pagina():
+        return [[valor(linha) for valor in extrair] for linha in islice(linhas, por_pagina)]
+
+    linhas = iter(linhas)
+    seguinte = ler_pagina()
+    totais = [0.0] * len(colunas)
+    numero = 1
+    contadas = 0
+
+    while True:
+        valores = seguinte
+        # A página seguinte é lida antes de desenhar, para saber se esta é a última
+        seguinte = ler_pagina()
+        ultima = not seguinte
+        relatorio.pagina(canvas, valores, numero, totais, ultima)
+        numero += 1
+        contadas += len(valores)
+        if ultima:
+            break
+
+    canvas.save()
+    return contadas
+
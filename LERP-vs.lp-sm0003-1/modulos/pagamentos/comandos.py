@@ -0,0 +1,27 @@
+import time
+
+import click
+
+from . import pagamentos_bp
+from .fecho import fechar_dias_pendentes, recalcular_dias
+
+
+# -------------------------------
+# 🔹 flask pagamentos fechar-dias / recalcular-dias
+# -------------------------------
+@pagamentos_bp.cli.command("fechar-dias")
+def fechar_dias():
+    """Fecha na folha de caixa os dias que ainda não têm fecho (para o cron)."""
+    inicio = time.perf_counter()
+    dias = fechar_dias_pendentes()
+    click.echo(f"✔ {dias} dias fechados em {time.perf_counter() - inicio:.2f} s.")
+
+
+@pagamentos_bp.cli.command("recalcular-dias")
+@click.argument("inicio", type=click.DateTime(formats=["%Y-%m-%d"]))
+@click.argument("fim", type=click.DateTime(formats=["%Y-%m-%d"]), required=False)
+def recalcular(inicio, fim):
+    """Volta a fechar os dias INICIO a FIM (AAAA-MM-DD) a partir do razão de caixa."""
+    inicio = inicio.date()
+    dias = recalcular_dias(inicio, fim.date() if fim else inicio)
+    click.echo(f"✔ {dias} dias recalculados.")
@@ -0,0 +1,181 @@
+# modulos/pagamentos/fecho.py
+"""Fecho diário do caixa em ``folha_caixa``.
+
+Cada dia fechado tem uma linha por tipo de pagamento e uma linha
+"Todos", com as entradas, saídas e número de movimentos do dia somados
+do razão de caixa (caixa/movimentos.py). Saídas e entradas manuais
+contam como dinheiro ("cash"). A linha "Todos" marca o dia como fechado,
+mesmo sem movimentos.
+
+Os relatórios de caixa lêem os dias fechados daqui e só agregam ao vivo
+os dias ainda abertos: hoje e, nos primeiros minutos depois da
+meia-noite, a véspera. ``fechar_dias_pendentes`` fecha os dias que
+faltam (``flask pagamentos fechar-dias``, para o cron, e antes de cada
+relatório). Um movimento com data de um dia já fechado reabre esse dia,
+que volta a ser fechado no relatório seguinte; ``recalcular_dias``
+refaz dias à mão.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import Date, delete, func, insert, literal, select, union_all
+from sqlalchemy.exc import IntegrityError
+
+from modulos.extensions import db
+from modulos.caixa.models import MovimentoCaixa
+from modulos.caixa.movimentos import MARGEM, meia_noite
+from modulos.caixa.sessoes import TIPO_GAVETA
+from modulos.periodos import dia_local, hoje_local, intervalo_dias
+from .models import FolhaCaixa
+
+TODOS = "Todos"
+
+
+def _tipo():
+    return func.coalesce(MovimentoCaixa.tipo_pagamento, TIPO_GAVETA)
+
+
+def ultimo_dia_fechavel():
+    """Véspera de hoje, ou a anterior nos primeiros minutos do dia."""
+    hoje = hoje_local()
+    if datetime.utcnow() - meia_noite(hoje) < MARGEM:
+        return hoje - timedelta(days=2)  # movimentos da véspera ainda a gravar
+    return hoje - timedelta(days=1)
+
+
+# -------------------------------
+# 🔹 Fechar / recalcular
+# -------------------------------
+def fechar_dia(dia, detalhes=None):
+    """Grava as linhas do dia, substituindo as que houver. Não faz commit."""
+    inicio, fim = intervalo_dias(dia, dia, utc=True)
+    linhas = db.session.execute(
+        select(_tipo(), func.sum(MovimentoCaixa.entrada), func.sum(MovimentoCaixa.saida),
+               func.count(MovimentoCaixa.id))
+        .where(MovimentoCaixa.data >= inicio, MovimentoCaixa.data < fim)
+        .group_by(_tipo())
+    ).all()
+
+    agora = datetime.utcnow()
+    folhas = [
+        {"data": dia, "tipo_pagamento": tipo, "total_entrada": round(entradas, 2),
+         "total_saida": round(saidas, 2), "movimentos": movimentos,
+         "detalhes": detalhes, "criado_em": agora}
+        for tipo, entradas, saidas, movimentos in linhas
+    ]
+    folhas.append({
+        "data": dia, "tipo_pagamento": TODOS,
+        "total_entrada": round(sum(f["total_entrada"] for f in folhas), 2),
+        "total_saida": round(sum(f["total_saida"] for f in folhas), 2),
+        "movimentos": sum(f["movimentos"] for f in folhas),
+        "detalhes": detalhes, "criado_em": agora,
+    })
+
+    db.session.execute(delete(FolhaCaixa).where(FolhaCaixa.data == dia))
+    db.session.execute(insert(FolhaCaixa), folhas)
+
+
+def dias_por_fechar():
+    """Dias desde o primeiro movimento até ``ultimo_dia_fechavel`` sem linha "Todos"."""
+    primeiro = db.session.query(func.min(MovimentoCaixa.data)).scalar()
+    if primeiro is None:
+        return []
+    dia, ultimo = dia_local(primeiro, utc=True), ultimo_dia_fechavel()
+    fechados = set(db.session.execute(
+        select(FolhaCaixa.data).where(FolhaCaixa.tipo_pagamento == TODOS, FolhaCaixa.data >= dia)
+    ).scalars())
+
+    dias = []
+    while dia <= ultimo:
+        if dia not in fechados:
+            dias.append(dia)
+        dia += timedelta(days=1)
+    return dias
+
+
+def fechar_dias_pendentes():
+    """Fecha os dias que faltam. Faz commit e devolve quantos fechou."""
+    dias = dias_por_fechar()
+    if not dias:
+        return 0
+    for dia in dias:
+        fechar_dia(dia)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Outro pedido fechou os mesmos dias ao mesmo tempo
+        db.session.rollback()
+        return 0
+    return len(dias)
+
+
+def recalcular_dias(inicio, fim):
+    """Volta a fechar os dias de ``inicio`` a ``fim`` a partir do razão. Faz commit.
+
+    Para correcções com data atrasada feitas fora da aplicação. Dias
+    ainda abertos ficam de fora. Devolve quantos dias foram fechados.
+    """
+    fim = min(fim, ultimo_dia_fechavel())
+    detalhes = f"Recalculado em {datetime.utcnow():%d/%m/%Y %H:%M} (UTC)"
+    dias = 0
+    dia = inicio
+    while dia <= fim:
+        fechar_dia(dia, detalhes)
+        dias += 1
+        dia += timedelta(days=1)
+    db.session.commit()
+    return dias
+
+
+def reabrir_dia(data):
+    """Apaga o fecho do dia de um movimento (UTC) com data atrasada. Não faz commit."""
+    dia = dia_local(data, utc=True)
+    if dia <= ultimo_dia_fechavel():
+        db.session.execute(delete(FolhaCaixa).where(FolhaCaixa.data == dia))
+
+
+# -------------------------------
+# 🔹 Leitura
+# -------------------------------
+def folha(inicio=None, fim=None, tipo=None):
+    """Query (dia, tipo, movimentos, entradas, saidas) dos dias ``inicio`` a ``fim``.
+
+    Dias fechados vêm de ``folha_caixa``; os dias ainda abertos são
+    somados do razão. Sem ``tipo``, as linhas "Todos". Chamar
+    ``fechar_dias_pendentes`` antes, para não faltarem dias.
+    """
+    alvo = tipo or TODOS
+    fechados = select(
+        FolhaCaixa.data.label("dia"),
+        FolhaCaixa.tipo_pagamento.label("tipo"),
+        FolhaCaixa.movimentos.label("movimentos"),
+        FolhaCaixa.total_entrada.label("entradas"),
+        FolhaCaixa.total_saida.label("saidas"),
+    ).where(FolhaCaixa.tipo_pagamento == alvo)
+    if inicio is not None:
+        fechados = fechados.where(FolhaCaixa.data >= inicio)
+    if fim is not None:
+        fechados = fechados.where(FolhaCaixa.data <= fim)
+
+    partes = [fechados]
+    dia = ultimo_dia_fechavel() + timedelta(days=1)
+    while dia <= hoje_local():
+        if (inicio is None or dia >= inicio) and (fim is None or dia <= fim):
+            partes.append(_ao_vivo(dia, alvo, tipo))
+        dia += timedelta(days=1)
+
+    todas = union_all(*partes).subquery()
+    return db.session.query(todas).order_by(todas.c.dia.desc(), todas.c.tipo)
+
+
+def _ao_vivo(dia, alvo, tipo):
+    inicio, fim = intervalo_dias(dia, dia, utc=True)
+    consulta = select(
+        literal(dia, Date),
+        literal(alvo),
+        func.count(MovimentoCaixa.id),
+        func.coalesce(func.sum(MovimentoCaixa.entrada), 0.0),
+        func.coalesce(func.sum(MovimentoCaixa.saida), 0.0),
+    ).where(MovimentoCaixa.data >= inicio, MovimentoCaixa.data < fim)
+    if tipo:
+        consulta = consulta.where(_tipo() == tipo)
+    return consulta
@@ -1,14 +1,15 @@
 from flask import render_template, redirect, url_for, request, flash
 from flask_wtf import FlaskForm
-from wtforms import StringField, FloatField, SelectField, TextAreaField
-from wtforms.validators import DataRequired, Optional
+from wtforms import StringField, FloatField, IntegerField, SelectField, TextAreaField
+from wtforms.widgets import HiddenInput
+from wtforms.validators import DataRequired, NumberRange, Optional
 from . import pagamentos_bp
 from .models import Pagamento  # Assumindo que você tem um modelo Pagamento
 from modulos.extensions import db  # Para a conexão com o banco de dados
 
 class PagamentoForm(FlaskForm):
     codigo_pagamento = StringField("Código Pagamento", validators=[DataRequired()])
-    preco_unitario = FloatField("Valor (MT)", validators=[DataRequired()])
+    preco_unitario = FloatField("Valor (MT)", validators=[DataRequired(), NumberRange(min=0.01)])
     tipo_pagamento = SelectField(
         "Tipo de Pagamento",
         choices=[
@@ -21,4 +22,4 @@ class PagamentoForm(FlaskForm):
         validators=[DataRequired()]
     )
     descricao = TextAreaField("Descrição", validators=[Optional()])
-
+    venda_id = IntegerField(widget=HiddenInput(), validators=[Optional()])
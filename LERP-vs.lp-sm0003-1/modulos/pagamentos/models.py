@@ -15,11 +15,14 @@ class Pagamento(db.Model):
     data = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     # Pode ser preenchida pelo usuário ou automaticamente
-    data_pagamento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    
-    # Se futuramente quiser vincular a uma venda:
-    # venda_id = db.Column(db.Integer, db.ForeignKey("vendas.id"), nullable=True)
-    # venda = db.relationship("Venda", backref="pagamentos")
+    data_pagamento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    # Sessão de caixa do operador que recebeu (ver caixa/sessoes.py)
+    sessao_id = db.Column(db.Integer, db.ForeignKey("sessoes_caixa.id"), nullable=True, index=True)
+
+    # Venda a que o pagamento se refere (pagamentos avulsos ficam sem venda)
+    venda_id = db.Column(db.Integer, db.ForeignKey("vendas.id"), nullable=True, index=True)
+    venda = db.relationship("Venda", backref="pagamentos")
 
     def __repr__(self):
         return f"<Pagamento {self.codigo_pagamento} - {self.valor:.2f}>"
@@ -31,10 +34,13 @@ class Pagamento(db.Model):
             "valor": self.valor,
             "preco_unitario": self.preco_unitario,
             "tipo_pagamento": self.tipo_pagamento,
+            "venda_id": self.venda_id,
             "data_pagamento": self.data_pagamento.isoformat()
         }
 
 
+# Fecho diário do caixa: uma linha por dia e tipo de pagamento, mais a
+# linha "Todos" que marca o dia como fechado (ver pagamentos/fecho.py)
 class FolhaCaixa(db.Model):
     __tablename__ = 'folha_caixa'
 
@@ -43,8 +49,12 @@ class FolhaCaixa(db.Model):
     tipo_pagamento = db.Column(db.String(50), nullable=False, default="Todos")
     total_entrada = db.Column(db.Float, nullable=False, default=0.0)
     total_saida = db.Column(db.Float, nullable=False, default=0.0)
+    movimentos = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     detalhes = db.Column(db.String(200), nullable=True)
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
         return f"<FolhaCaixa {self.data} - Entrada: {self.total_entrada:.2f}>"
+
+
+db.Index("uq_folha_caixa_data_tipo", FolhaCaixa.data, FolhaCaixa.tipo_pagamento, unique=True)
@@ -1,21 +1,28 @@
 from flask import (
     render_template, redirect, url_for, flash,
-    request, send_file
+    request
 )
-from io import BytesIO
-import pandas as pd
-from datetime import datetime
+from datetime import timedelta
 from flask_babel import _
 from sqlalchemy.exc import SQLAlchemyError
 
 from . import pagamentos_bp
-from .models import Pagamento, FolhaCaixa
+from .models import Pagamento
+from .fecho import fechar_dias_pendentes, folha, recalcular_dias
 from .forms import PagamentoForm
 from modulos.extensions import db
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
+from modulos.resumo.utils import registrar_no_resumo
+from modulos.caixa.movimentos import registrar_movimento_caixa
+from modulos.caixa.sessoes import registrar_na_sessao
+from modulos.vendas.models import Venda
+from modulos.vendas.recebimentos import PagamentoExcedeSaldo, registrar_pagamento_venda
+from modulos.sequencias.utils import proximo_codigo
+from modulos.periodos import hoje_local, ler_dia
+from modulos.paginacao import paginar, totais
+from modulos.exportacao import Coluna, Documento
+from modulos.tarefas.utils import exportacao, pedir_exportacao
+from modulos.renderizacao import resposta_renderizada
+from modulos.renderizacao.documentos import recibo_pdf
 
 
 
@@ -31,14 +38,7 @@ except ImportError:
 # 🔹 Função para gerar código único
 # -------------------------------
 def gerar_codigo_pagamento():
-    ultimo = Pagamento.query.order_by(Pagamento.id.desc()).first()
-    if ultimo:
-        try:
-            num = int(str(ultimo.codigo_pagamento).replace("pgag", ""))
-        except Exception:
-            num = ultimo.id or 0
-        return f"pgag{num + 1:04d}"
-    return "pgag0001"
+    return proximo_codigo(Pagamento.codigo_pagamento, "pgag", 4)
 
 # -------------------------------
 # 🔹 Novo Pagamento
@@ -51,29 +51,67 @@ def novo_pagamento():
     # Receber valor e código via query string (da venda)
     valor = request.args.get("total")
     codigo = request.args.get("codigo")
+    venda = _venda_do_pedido(form)
 
     if request.method == "GET":
         # Preencher automaticamente campos do pagamento
-        form.preco_unitario.data = float(valor) if valor else 0.0
-        form.codigo_pagamento.data = codigo or gerar_codigo_pagamento()
+        if venda is not None:
+            form.venda_id.data = venda.id
+            form.preco_unitario.data = venda.saldo
+            form.codigo_pagamento.data = gerar_codigo_pagamento()
+        else:
+            form.preco_unitario.data = float(valor) if valor else 0.0
+            form.codigo_pagamento.data = codigo or gerar_codigo_pagamento()
 
     if form.validate_on_submit():
         pagamento = Pagamento(
             codigo_pagamento=form.codigo_pagamento.data,
             valor=form.preco_unitario.data,
             tipo_pagamento=form.tipo_pagamento.data,
-            descricao=form.descricao.data or ""
+            descricao=form.descricao.data or "",
+            venda_id=venda.id if venda is not None else None,
         )
         try:
             db.session.add(pagamento)
+            db.session.flush()
+            if venda is not None:
+                saldo = registrar_pagamento_venda(venda.id, pagamento.valor)
+            registrar_no_resumo("pagamentos", pagamento.data_pagamento, entradas=pagamento.valor)
+            registrar_movimento_caixa(
+                "pagamento", pagamento.id, entrada=pagamento.valor,
+                tipo_pagamento=pagamento.tipo_pagamento, data=pagamento.data_pagamento,
+            )
+            registrar_na_sessao(pagamento, pagamento.tipo_pagamento, entrada=pagamento.valor)
             db.session.commit()
-            flash(_("Pagamento registrado com sucesso!"), "success")
+            if venda is not None and saldo > 0:
+                flash(_("Pagamento registrado. Falta receber %(saldo).2f MT da venda %(venda)s.",
+                        saldo=saldo, venda=venda.codigo_venda), "success")
+            else:
+                flash(_("Pagamento registrado com sucesso!"), "success")
             return redirect(url_for("pagamentos.lista_pagamentos"))
+        except PagamentoExcedeSaldo as e:
+            db.session.rollback()
+            flash(_("O valor excede o saldo em dívida da venda (%(saldo).2f MT).", saldo=e.saldo or 0), "danger")
         except Exception as e:
             db.session.rollback()
             flash(_("Erro ao registrar pagamento: ") + str(e), "danger")
 
-    return render_template("pagamentos/novo_pagamento.html", form=form)
+    return render_template("pagamentos/novo_pagamento.html", form=form, venda=venda)
+
+
+def _venda_do_pedido(form):
+    """Venda a receber: ``?venda=<id>``, o campo escondido do formulário ou
+    ``?codigo=`` quando é o código de uma venda. None para pagamentos avulsos."""
+    if request.method == "POST":
+        venda_id = form.venda_id.data
+    else:
+        venda_id = request.args.get("venda", type=int)
+    if venda_id:
+        return Venda.query.get_or_404(venda_id)
+    codigo = request.args.get("codigo")
+    if codigo and request.method == "GET":
+        return Venda.query.filter_by(codigo_venda=codigo).first()
+    return None
 
 # -------------------------------
 # 🔹 Lista de Pagamentos
@@ -91,166 +129,172 @@ def lista_pagamentos():
     if tipo:
         query = query.filter(Pagamento.tipo_pagamento == tipo)
 
-    pagamentos = query.order_by(Pagamento.data_pagamento.desc()).all()
+    pagina = paginar(query, Pagamento.data_pagamento, Pagamento.id)
 
-    # Total pago
-    total_pago = sum(float(p.preco_unitario or 0) for p in pagamentos)
+    # Total pago (o valor recebido está em "valor"; preco_unitario fica a 0)
+    resumo = totais(query, ("pagamentos", filtro, tipo), Pagamento.id, pago=Pagamento.valor)
 
     return render_template(
         "pagamentos/lista_pagamentos.html",
-        pagamentos=pagamentos,
-        total_pago=total_pago
+        pagamentos=pagina.itens,
+        pagina=pagina,
+        total_registos=resumo["registos"],
+        total_pago=resumo["pago"]
     )
 
 
 # -------------------------------
 # 🔹 Exportar Excel
 # -------------------------------
+def colunas_excel():
+    return [
+        Coluna(_("Código"), "codigo_pagamento"),
+        Coluna(_("Valor"), "valor", "dinheiro"),
+        Coluna(_("Preço Unitário"), "preco_unitario", "dinheiro"),
+        Coluna(_("Tipo de Pagamento"), "tipo_pagamento"),
+        Coluna(_("Data"), "data_pagamento", "data"),
+    ]
+
+
+@exportacao("pagamentos.excel")
+def documento_excel(parametros):
+    pagamentos = Pagamento.query.order_by(Pagamento.data_pagamento.desc(), Pagamento.id.desc())
+    return Documento("excel", "pagamentos.xlsx", _("Pagamentos"), colunas_excel(), pagamentos)
+
+
 @pagamentos_bp.route("/pagamentos/exportar_excel")
 def exportar_excel():
-    pagamentos = Pagamento.query.order_by(Pagamento.data_pagamento.desc()).all()
-    data = [{
-        _("Código"): p.codigo_pagamento,
-        _("Valor"): p.valor,
-        _("Preço Unitário"): p.preco_unitario,
-        _("Tipo de Pagamento"): p.tipo_pagamento,
-        _("Data"): p.data_pagamento.strftime("%d/%m/%Y %H:%M") if p.data_pagamento else ""
-    } for p in pagamentos]
-
-    df = pd.DataFrame(data)
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name=str(_("Pagamentos")))
-    output.seek(0)
-
     registrar_acao("exportar_excel_pagamentos", "pagamentos", "")
-    return send_file(output, as_attachment=True, download_name="pagamentos.xlsx")
+    return pedir_exportacao("pagamentos.excel")
 
 # -------------------------------
 # 🔹 Gerar Recibo
 # -------------------------------
 @pagamentos_bp.route("/pagamentos/recibo/<int:pagamento_id>")
 def gerar_recibo(pagamento_id):
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import mm
-
     pagamento = Pagamento.query.get_or_404(pagamento_id)
-    buffer = BytesIO()
-    largura, altura = 80*mm, 200*mm
-    pdf = canvas.Canvas(buffer, pagesize=(largura, altura))
-
-    pdf.setFont("Helvetica-Bold", 12)
-    pdf.drawCentredString(largura/2, altura-10*mm, _("INSTITUIÇÃO EXEMPLO LDA"))
-    pdf.setFont("Helvetica", 9)
-    pdf.drawCentredString(largura/2, altura-15*mm, _("NUIT: 123456789"))
-    pdf.drawCentredString(largura/2, altura-20*mm, _("Rua Exemplo"))
-    pdf.drawCentredString(largura/2, altura-25*mm, _("+258 84 123 4567"))
-    pdf.line(5*mm, altura-28*mm, largura-5*mm, altura-28*mm)
-
-    pdf.setFont("Helvetica-Bold", 11)
-    pdf.drawCentredString(largura/2, altura-35*mm, _("RECIBO DE PAGAMENTO"))
-
-    y = altura - 50*mm
-    pdf.setFont("Helvetica", 9)
-    pdf.drawString(5*mm, y, f"{_('Código')}: {pagamento.codigo_pagamento}")
-    y -= 6*mm
-    pdf.drawString(5*mm, y, f"{_('Valor Pago')}: {(pagamento.valor or 0):.2f} MT")
-    y -= 6*mm
-    pdf.drawString(5*mm, y, f"{_('Preço Unitário')}: {(pagamento.preco_unitario or 0):.2f} MT")
-    y -= 6*mm
-    pdf.drawString(5*mm, y, f"{_('Método')}: {pagamento.tipo_pagamento or ''}")
-    y -= 6*mm
-    pdf.drawString(5*mm, y, f"{_('Data')}: {pagamento.data_pagamento.strftime('%d/%m/%Y %H:%M') if pagamento.data_pagamento else ''}")
-
-    pdf.line(5*mm, 25*mm, largura-5*mm, 25*mm)
-    pdf.setFont("Helvetica-Oblique", 8)
-    pdf.drawCentredString(largura/2, 18*mm, _("Processado por computador"))
-    pdf.drawCentredString(largura/2, 12*mm, _("Obrigado pela preferência!"))
-    pdf.drawCentredString(largura/2, 6*mm, _("LERP - The Power of Technology"))
-
-    pdf.showPage()
-    pdf.save()
-    buffer.seek(0)
+    data = pagamento.data_pagamento.strftime('%d/%m/%Y %H:%M') if pagamento.data_pagamento else ''
+
+    espec = {
+        "empresa": [
+            _("INSTITUIÇÃO EXEMPLO LDA"), _("NUIT: 123456789"),
+            _("Rua Exemplo"), _("+258 84 123 4567"),
+        ],
+        "titulo": _("RECIBO DE PAGAMENTO"),
+        "linhas": [
+            f"{_('Código')}: {pagamento.codigo_pagamento}",
+            f"{_('Valor Pago')}: {(pagamento.valor or 0):.2f} MT",
+            f"{_('Preço Unitário')}: {(pagamento.preco_unitario or 0):.2f} MT",
+            f"{_('Método')}: {pagamento.tipo_pagamento or ''}",
+            f"{_('Data')}: {data}",
+        ] + ([f"{_('Venda')}: {pagamento.venda.codigo_venda}"] if pagamento.venda_id else []),
+        "rodape": [
+            _("Processado por computador"),
+            _("Obrigado pela preferência!"),
+            _("LERP - The Power of Technology"),
+        ],
+    }
 
     registrar_acao("gerar_recibo_pagamento", "pagamentos", f"codigo={pagamento.codigo_pagamento}")
-    return send_file(buffer, as_attachment=True, download_name=f"recibo_{pagamento.codigo_pagamento}.pdf", mimetype="application/pdf")
+    return resposta_renderizada(recibo_pdf, espec, f"recibo_{pagamento.codigo_pagamento}.pdf")
+
+
+# -------------------------------
+# 🔹 Folha de caixa (fecho diário)
+# -------------------------------
+@pagamentos_bp.route("/caixa/folha", methods=["GET", "POST"])
+def fechar_caixa():
+    if request.method == "POST":
+        # Recalcular: volta a fechar os dias do intervalo a partir do razão
+        inicio = ler_dia(request.form.get("data_inicio"))
+        fim = ler_dia(request.form.get("data_fim")) or inicio
+        if inicio is None or fim < inicio:
+            flash(_("Indique o intervalo de dias a recalcular."), "warning")
+        else:
+            dias = recalcular_dias(inicio, fim)
+            registrar_acao("recalcular_folha_caixa", "pagamentos", f"{inicio} a {fim}: {dias} dias")
+            flash(_("%(dias)d dias recalculados.", dias=dias), "success")
+        return redirect(url_for(
+            "pagamentos.fechar_caixa", data_inicio=request.form.get("data_inicio") or None,
+            data_fim=request.form.get("data_fim") or None, tipo=request.form.get("tipo") or None,
+        ))
+
+    filtros = _filtros_folha(request.args.get("data_inicio"), request.args.get("data_fim"))
+    tipo = request.args.get("tipo") or None
+    fechar_dias_pendentes()
+    folhas = folha(*filtros, tipo=tipo).all()
+
+    return render_template(
+        "pagamentos/fechar_caixa.html",
+        folhas=folhas,
+        data_inicio=filtros[0],
+        data_fim=filtros[1],
+        tipo=tipo or "",
+        total_entrada=sum(f.entradas for f in folhas),
+        total_saida=sum(f.saidas for f in folhas),
+    )
+
+
+def _filtros_folha(data_inicio, data_fim):
+    """Dias do filtro; sem datas, os últimos 31 dias."""
+    inicio, fim = ler_dia(data_inicio), ler_dia(data_fim)
+    if inicio is None and fim is None:
+        fim = hoje_local()
+        inicio = fim - timedelta(days=30)
+    return inicio, fim
+
+
+def _documento_folha(formato, nome_ficheiro, parametros):
+    tipo_pag = parametros.get("tipo_pagamento")
+    data_inicio = parametros.get("data_inicio")
+    data_fim = parametros.get("data_fim")
+
+    # Dias fechados lidos de folha_caixa; só os dias abertos são somados
+    fechar_dias_pendentes()
+    linhas = folha(ler_dia(data_inicio), ler_dia(data_fim), tipo=tipo_pag)
+
+    colunas = [
+        Coluna(_("Dia"), "dia", "dia", largura=14),
+        Coluna(_("Tipo de Pagamento"), "tipo", largura=18),
+        Coluna(_("Movimentos"), "movimentos", "numero", total=True),
+        Coluna(_("Entradas (MT)"), "entradas", "dinheiro", largura=18, total=True),
+        Coluna(_("Saídas (MT)"), "saidas", "dinheiro", largura=18, total=True),
+        Coluna(_("Saldo (MT)"), lambda linha: round(linha.entradas - linha.saidas, 2),
+               "dinheiro", largura=18, total=True),
+    ]
+    filtros = _("Filtros: Tipo=%(tipo)s, Início=%(inicio)s, Fim=%(fim)s",
+                tipo=tipo_pag or _("Todos"), inicio=data_inicio or "---", fim=data_fim or "---")
+    return Documento(
+        formato, nome_ficheiro, _("Relatório de Folha de Caixa"), colunas, linhas,
+        subtitulo=filtros
+    )
 
 
 @pagamentos_bp.route("/caixa/exportar_pdf", endpoint="exportar_pdf_caixa")
 def exportar_pdf_caixa():
-    tipo_pag = request.args.get("tipo_pagamento")
-    data_inicio = request.args.get("data_inicio")
-    data_fim = request.args.get("data_fim")
+    return pedir_exportacao(
+        "pagamentos.caixa_pdf",
+        tipo_pagamento=request.args.get("tipo_pagamento") or None,
+        data_inicio=request.args.get("data_inicio") or None,
+        data_fim=request.args.get("data_fim") or None,
+    )
 
-    # Filtrar pagamentos
-    query = Pagamento.query
-    if tipo_pag:
-        query = query.filter(Pagamento.tipo_pagamento == tipo_pag)
 
-    if data_inicio:
-        try:
-            dt_ini = datetime.strptime(data_inicio, "%Y-%m-%d")
-            query = query.filter(Pagamento.data_pagamento >= dt_ini)
-        except:
-            pass
+@exportacao("pagamentos.caixa_pdf")
+def documento_caixa_pdf(parametros):
+    return _documento_folha("pdf", "folha_caixa.pdf", parametros)
 
-    if data_fim:
-        try:
-            dt_fim = datetime.strptime(data_fim, "%Y-%m-%d")
-            dt_fim = dt_fim.replace(hour=23, minute=59, second=59)
-            query = query.filter(Pagamento.data_pagamento <= dt_fim)
-        except:
-            pass
-
-    pagamentos = query.order_by(Pagamento.data_pagamento.desc()).all()
-
-    total_geral = sum(float(p.valor or 0) for p in pagamentos)
-
-    # Criar PDF (igual ao que você já implementou)
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
-                            rightMargin=20, leftMargin=20,
-                            topMargin=30, bottomMargin=20)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    elements.append(Paragraph("Relatório de Folha de Caixa", styles['Title']))
-    elements.append(Spacer(1, 12))
-    filtros = f"Filtros: Tipo={tipo_pag or 'Todos'}, Início={data_inicio or '---'}, Fim={data_fim or '---'}"
-    elements.append(Paragraph(filtros, styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    cabecalho = ["Código", "Valor (MT)", "Preço Unitário (MT)", "Tipo de Pagamento", "Data Pagamento"]
-    data = [cabecalho]
-    for p in pagamentos:
-        data.append([
-            p.codigo_pagamento,
-            f"{float(p.valor or 0):.2f}",
-            f"{float(p.preco_unitario or 0):.2f}",
-            p.tipo_pagamento or "",
-            p.data_pagamento.strftime("%d/%m/%Y %H:%M") if p.data_pagamento else ""
-        ])
-    data.append(["", f"TOTAL: {total_geral:.2f} MT", "", "", ""])
-
-    tabela = Table(data, repeatRows=1, hAlign='CENTER')
-    tabela.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#0b4f8a")),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('GRID', (0,0), (-1,-1), 0.7, colors.grey),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,-1), 9),
-        ('BACKGROUND', (0,-1), (-1,-1), colors.lightgrey),
-        ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold')
-    ]))
-
-    elements.append(tabela)
-    doc.build(elements)
-    buffer.seek(0)
-
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name="folha_caixa.pdf",
-        mimetype="application/pdf"
+
+@pagamentos_bp.route("/caixa/exportar_excel", endpoint="exportar_excel_caixa")
+def exportar_excel_caixa():
+    return pedir_exportacao(
+        "pagamentos.caixa_excel",
+        tipo_pagamento=request.args.get("tipo_pagamento") or None,
+        data_inicio=request.args.get("data_inicio") or None,
+        data_fim=request.args.get("data_fim") or None,
     )
+
+
+@exportacao("pagamentos.caixa_excel")
+def documento_caixa_excel(parametros):
+    return _documento_folha("excel", "folha_caixa.xlsx", parametros)
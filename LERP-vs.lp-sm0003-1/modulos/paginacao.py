@@ -0,0 +1,163 @@
+# modulos/paginacao.py
+"""Paginação por chave (keyset) e totais das listagens.
+
+As listas ordenam por (data, id) decrescente e cada página continua a
+partir da última linha da anterior:
+
+    WHERE (data, id) < (:data, :id) ORDER BY data DESC, id DESC LIMIT n
+
+Ao contrário de OFFSET, o custo de uma página não cresce com o
+histórico, e o cursor continua estável quando entram registos novos.
+O cursor é um token opaco (base64 de [data, id]) que vai na query
+string como ``?cursor=...``.
+
+Linhas sem data (colunas que aceitam NULL) vêm no fim, por id
+decrescente; o cursor de uma delas leva ``null`` na data. Com NULL na
+comparação de tuplos essas linhas nunca apareceriam.
+
+Os totais do filtro activo vêm de uma única consulta agregada,
+guardada em memória até entrar um registo novo na tabela (ou, para
+alterações e exclusões, durante no máximo ``TOTAIS_LISTAS_TTL`` segundos).
+"""
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, request, url_for
+from sqlalchemy import func, tuple_
+
+POR_PAGINA = 50
+MAX_TOTAIS_EM_CACHE = 256
+
+_lock = threading.Lock()
+
+
+# -------------------------------
+# 🔹 Cursor
+# -------------------------------
+def codificar_cursor(data, id):
+    bruto = json.dumps([data.isoformat() if data is not None else None, id]).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def ler_cursor(token):
+    """(data, id) do token, ou None se vier vazio ou inválido.
+
+    A data vem None quando a última linha da página não tinha data.
+    """
+    if not token:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data, id = json.loads(bruto)
+        return (datetime.fromisoformat(data) if data is not None else None), int(id)
+    except (ValueError, TypeError):
+        return None
+
+
+# -------------------------------
+# 🔹 Página
+# -------------------------------
+class Pagina:
+    def __init__(self, itens, proximo_cursor, primeira):
+        self.itens = itens
+        self.proximo_cursor = proximo_cursor
+        self.primeira = primeira
+
+    @property
+    def tem_mais(self):
+        return self.proximo_cursor is not None
+
+    def url(self, cursor=None):
+        """URL da mesma listagem (mesmos filtros) com outro cursor."""
+        argumentos = {k: v for k, v in request.args.items() if k != "cursor"}
+        if cursor:
+            argumentos["cursor"] = cursor
+        return url_for(request.endpoint, **(request.view_args or {}), **argumentos)
+
+
+def paginar(query, coluna_data, coluna_id, por_pagina=None, cursor=None):
+    """Uma página da query, ordenada por (data, id) decrescente.
+
+    ``cursor`` é o token recebido; por omissão lê ``request.args["cursor"]``.
+    Se ``coluna_data`` aceitar NULL, as linhas sem data seguem-se às
+    restantes, numa segunda consulta só na página em que estas acabam.
+    """
+    por_pagina = por_pagina or current_app.config.get("LISTAS_POR_PAGINA", POR_PAGINA)
+    if cursor is None:
+        cursor = request.args.get("cursor")
+    posicao = ler_cursor(cursor)
+    aceita_nulos = getattr(coluna_data.expression, "nullable", True)
+
+    linhas = []
+    if posicao is None or posicao[0] is not None:
+        com_data = query.filter(coluna_data.isnot(None)) if aceita_nulos else query
+        if posicao is not None:
+            com_data = com_data.filter(tuple_(coluna_data, coluna_id) < tuple_(*posicao))
+        linhas = (
+            com_data.order_by(coluna_data.desc(), coluna_id.desc())
+            .limit(por_pagina + 1)
+            .all()
+        )
+
+    if aceita_nulos and len(linhas) <= por_pagina:
+        # Separado do tuplo acima para cada consulta continuar a usar o índice
+        sem_data = query.filter(coluna_data.is_(None))
+        if posicao is not None and posicao[0] is None:
+            sem_data = sem_data.filter(coluna_id < posicao[1])
+        linhas += (
+            sem_data.order_by(coluna_id.desc())
+            .limit(por_pagina + 1 - len(linhas))
+            .all()
+        )
+
+    proximo = None
+    if len(linhas) > por_pagina:
+        linhas = linhas[:por_pagina]
+        ultima = linhas[-1]
+        proximo = codificar_cursor(
+            getattr(ultima, coluna_data.key), getattr(ultima, coluna_id.key)
+        )
+
+    return Pagina(linhas, proximo, primeira=posicao is None)
+
+
+# -------------------------------
+# 🔹 Totais do filtro
+# -------------------------------
+def totais(query, chave, coluna_id, **colunas):
+    """Soma as colunas indicadas sobre a query (sem ordenação nem limite).
+
+    ``chave`` identifica o filtro (ex.: ("vendas", filtro)). O resultado
+    fica em cache enquanto ``max(coluna_id)`` não mudar, até
+    TOTAIS_LISTAS_TTL segundos. Devolve um dict com "registos" e cada
+    nome de ``colunas``.
+    """
+    ttl = current_app.config.get("TOTAIS_LISTAS_TTL", 60)
+    cache = current_app.extensions.setdefault("totais_listas", {})
+    agora = time.monotonic()
+    # Pela chave primária: uma descida no índice, não um varrimento
+    ultimo_id = query.session.query(func.max(coluna_id)).scalar()
+
+    with _lock:
+        guardado = cache.get(chave)
+    if guardado and guardado[0] > agora and guardado[1] == ultimo_id:
+        return guardado[2]
+
+    nomes = list(colunas)
+    linha = query.order_by(None).with_entities(
+        func.count(coluna_id),
+        *(func.coalesce(func.sum(colunas[nome]), 0) for nome in nomes)
+    ).one()
+
+    resultado = {"registos": linha[0]}
+    resultado.update({nome: float(valor) for nome, valor in zip(nomes, linha[1:])})
+
+    with _lock:
+        if len(cache) >= MAX_TOTAIS_EM_CACHE:
+            for velha in [c for c, v in cache.items() if v[0] <= agora] or list(cache):
+                del cache[velha]
+        cache[chave] = (agora + ttl, ultimo_id, resultado)
+    return resultado
@@ -0,0 +1,113 @@
+# modulos/periodos.py
+"""Intervalos de datas partilhados pelas rotas.
+
+Todos os filtros de data devolvem intervalos semiabertos [inicio, fim)
+para serem usados directamente sobre a coluna indexada:
+
+    inicio, fim = intervalo("mes", utc=True)
+    query.filter(Caixa.data >= inicio, Caixa.data < fim)
+
+Os dias, semanas, meses e anos são os do fuso de Africa/Maputo. Como os
+modelos gravam datas de formas diferentes (Venda usa a hora local,
+Compra/Pagamento/Caixa/Auditoria usam UTC), cada chamada indica com
+``utc=True`` se a coluna está em UTC. Os limites são sempre datetimes
+sem fuso, tal como estão gravados no banco.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    FUSO = ZoneInfo("Africa/Maputo")
+except (ImportError, ZoneInfoNotFoundError):
+    # Windows sem o pacote tzdata: Maputo é UTC+2 fixo, sem horário de verão
+    FUSO = timezone(timedelta(hours=2), "CAT")
+
+PERIODOS = ("hoje", "semana", "mes", "ano")
+
+
+# -------------------------------
+# 🔹 Conversões
+# -------------------------------
+def agora_local():
+    """Data/hora actual em Maputo (sem fuso)."""
+    return datetime.now(FUSO).replace(tzinfo=None)
+
+
+def hoje_local():
+    return agora_local().date()
+
+
+def para_local(data):
+    """Converte um datetime UTC gravado no banco para a hora de Maputo."""
+    return data.replace(tzinfo=timezone.utc).astimezone(FUSO).replace(tzinfo=None)
+
+
+def para_utc(data):
+    """Converte uma hora de Maputo (sem fuso) para UTC (sem fuso)."""
+    return data.replace(tzinfo=FUSO).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def ler_dia(texto):
+    """Lê uma data "AAAA-MM-DD" vinda de um formulário; inválida → None."""
+    try:
+        return datetime.strptime(texto, "%Y-%m-%d").date() if texto else None
+    except ValueError:
+        return None
+
+
+def dia_local(data, utc=False):
+    """Dia de Maputo a que pertence um datetime gravado no banco."""
+    return (para_local(data) if utc else data).date()
+
+
+# -------------------------------
+# 🔹 Intervalos [inicio, fim)
+# -------------------------------
+def intervalo_dias(inicio, fim, utc=False):
+    """Intervalo que cobre os dias ``inicio`` a ``fim`` (ambos incluídos).
+
+    ``None`` num dos lados deixa esse limite em aberto.
+    """
+    data_inicio = datetime.combine(inicio, time.min) if inicio else None
+    data_fim = datetime.combine(fim + timedelta(days=1), time.min) if fim else None
+
+    if utc:
+        data_inicio = para_utc(data_inicio) if data_inicio else None
+        data_fim = para_utc(data_fim) if data_fim else None
+
+    return data_inicio, data_fim
+
+
+def intervalo(periodo, referencia=None, utc=False):
+    """Intervalo do dia, semana, mês ou ano que contém ``referencia``.
+
+    ``periodo`` aceita "hoje"/"dia", "semana", "mes" e "ano"; qualquer
+    outro valor devolve (None, None), ou seja, sem filtro de data.
+    """
+    dia = referencia or hoje_local()
+    if isinstance(dia, datetime):
+        dia = dia.date()
+
+    if periodo in ("hoje", "dia"):
+        inicio, fim = dia, dia
+    elif periodo == "semana":
+        inicio = dia - timedelta(days=dia.weekday())
+        fim = inicio + timedelta(days=6)
+    elif periodo == "mes":
+        inicio = dia.replace(day=1)
+        fim = (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    elif periodo == "ano":
+        inicio, fim = date(dia.year, 1, 1), date(dia.year, 12, 31)
+    else:
+        return None, None
+
+    return intervalo_dias(inicio, fim, utc=utc)
+
+
+def filtrar_intervalo(query, coluna, inicio, fim):
+    """Aplica ``inicio <= coluna < fim`` ignorando limites em aberto."""
+    if inicio is not None:
+        query = query.filter(coluna >= inicio)
+    if fim is not None:
+        query = query.filter(coluna < fim)
+    return query
@@ -0,0 +1,47 @@
+# modulos/produtos/carregador.py
+from flask import g
+
+from .models import Produto
+
+# Limite de parâmetros por IN (...) — seguro para qualquer versão do SQLite
+TAMANHO_LOTE = 500
+
+
+class CarregadorProdutos:
+    """Mapa de identidade dos produtos carregados no pedido corrente.
+
+    Junta os ids pedidos e resolve-os com um único ``IN (...)`` por lote,
+    em vez de um ``Produto.query.get`` por linha do carrinho.
+    """
+
+    def __init__(self):
+        self._produtos = {}
+        self._inexistentes = set()
+
+    def carregar(self, ids):
+        """Garante que os produtos indicados estão no mapa e devolve-o."""
+        faltam = [
+            pid for pid in dict.fromkeys(int(i) for i in ids)
+            if pid not in self._produtos and pid not in self._inexistentes
+        ]
+
+        for i in range(0, len(faltam), TAMANHO_LOTE):
+            lote = faltam[i:i + TAMANHO_LOTE]
+            for produto in Produto.query.filter(Produto.id.in_(lote)):
+                self._produtos[produto.id] = produto
+            self._inexistentes.update(pid for pid in lote if pid not in self._produtos)
+
+        return self._produtos
+
+    def obter(self, produto_id):
+        produto_id = int(produto_id)
+        if produto_id not in self._produtos:
+            self.carregar([produto_id])
+        return self._produtos.get(produto_id)
+
+
+def carregador_produtos():
+    """Carregador partilhado por todo o pedido (guardado em ``g``)."""
+    if "carregador_produtos" not in g:
+        g.carregador_produtos = CarregadorProdutos()
+    return g.carregador_produtos
@@ -0,0 +1,48 @@
+# modulos/produtos/codigos.py
+"""Códigos de produto: prefixo da categoria + número da série do prefixo."""
+from modulos.sequencias.utils import proximo_codigo
+from .indice import normalizar
+from .models import Produto
+
+PREFIXOS = {
+    "ferragem": "gf",
+    "loja": "gl",
+    "botle store": "gbs",
+    "mercearia": "gm",
+    "supermercado": "gs",
+    "farmacia": "gfm",
+    "restaurantes": "grs",
+    "bar": "gbr",
+    "acessorios": "gac",
+    "servicos": "gsv"
+}
+PREFIXO_OUTROS = "gen"
+LARGURA = 3  # dígitos mínimos do número
+
+# Como as categorias ficam gravadas (os valores do formulário de cadastro)
+CATEGORIAS = (
+    "Botle Store", "Mercearia", "Loja", "Supermercado", "Farmacia",
+    "Restaurantes", "Bar", "Ferragem", "Acessorios", "Servicos",
+)
+
+
+def normalizar_categoria(categoria):
+    """Minúsculas, sem acentos e com espaços simples ("  Farmácia " → "farmacia")."""
+    return " ".join(normalizar(categoria).split())
+
+
+_CANONICAS = {normalizar_categoria(c): c for c in CATEGORIAS}
+
+
+def categoria_canonica(categoria):
+    """Valor a gravar: "  farmácia " → "Farmacia"; outras só sem espaços a mais."""
+    return _CANONICAS.get(normalizar_categoria(categoria), " ".join(categoria.split()))
+
+
+def prefixo_categoria(categoria):
+    return PREFIXOS.get(normalizar_categoria(categoria), PREFIXO_OUTROS)
+
+
+def gerar_codigo(nome, categoria):
+    # Série própria por prefixo: não repete códigos depois de apagar produtos
+    return proximo_codigo(Produto.codigo, prefixo_categoria(categoria), LARGURA)
@@ -0,0 +1,262 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import click
+from flask import Flask, current_app
+from flask_babel import force_locale
+from sqlalchemy import func, text
+
+from modulos.extensions import db
+from . import produtos_bp
+from .models import Produto
+from .importacao import ErroImportacao, importar_catalogo
+from .pesquisa import _SQL_FTS, consulta_fts
+from .custos import garantir_camadas
+from .movimentos import LOTE, conciliar_stock, garantir_movimentos, gerar_snapshots, stock_em
+from .stock import com_retentativas, movimentar_stock
+
+PALAVRAS = [
+    "arroz", "feijão", "açúcar", "óleo", "sabão", "pão", "leite", "farinha",
+    "cimento", "prego", "martelo", "tinta", "cerveja", "refresco", "água",
+    "sumo", "bolacha", "massa", "atum", "sal", "vela", "fósforo", "parafuso",
+]
+CATEGORIAS = ["mercearia", "ferragem", "botle store", "supermercado", "loja"]
+
+
+def _cronometrar(con, sql, parametros, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        con.execute(sql, parametros).fetchall()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+# -------------------------------
+# 🔹 flask produtos benchmark-pesquisa
+# -------------------------------
+@produtos_bp.cli.command("benchmark-pesquisa")
+@click.option("--linhas", "-n", multiple=True, type=int, default=[10_000, 100_000, 1_000_000],
+              show_default=True, help="Tamanhos de catálogo a testar.")
+@click.option("--repeticoes", default=5, show_default=True)
+def benchmark_pesquisa(linhas, repeticoes):
+    """Compara ilike('%termo%') com FTS5 num banco temporário (não toca no banco da aplicação)."""
+    termos = ["acucar", "cimento prego", "gm0012", "agua"]
+
+    for n in linhas:
+        caminho = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+        con = sqlite3.connect(caminho)
+        con.execute("""CREATE TABLE produtos (
+            id INTEGER PRIMARY KEY, codigo TEXT, nome TEXT, categoria TEXT
+        )""")
+        for sql in _SQL_FTS:
+            con.execute(sql)
+
+        rnd = random.Random(n)
+        con.executemany(
+            "INSERT INTO produtos (codigo, nome, categoria) VALUES (?, ?, ?)",
+            (
+                (f"gm{i:07d}", f"{rnd.choice(PALAVRAS)} {rnd.choice(PALAVRAS)} {i}", rnd.choice(CATEGORIAS))
+                for i in range(n)
+            ),
+        )
+        con.commit()
+
+        click.echo(f"== {n:,} produtos")
+        for termo in termos:
+            antigo = _cronometrar(
+                con,
+                "SELECT id FROM produtos WHERE nome LIKE ? OR codigo LIKE ? LIMIT 20",
+                (f"%{termo}%", f"%{termo}%"), repeticoes,
+            )
+            novo = _cronometrar(
+                con,
+                "SELECT rowid FROM produtos_fts WHERE produtos_fts MATCH ? "
+                "ORDER BY bm25(produtos_fts) LIMIT 20",
+                (consulta_fts(termo),), repeticoes,
+            )
+            # Listagens: todos os resultados, não só os 20 primeiros
+            antigo_todos = _cronometrar(
+                con,
+                "SELECT count(*) FROM produtos WHERE nome LIKE ? OR codigo LIKE ?",
+                (f"%{termo}%", f"%{termo}%"), repeticoes,
+            )
+            novo_todos = _cronometrar(
+                con,
+                "SELECT count(*) FROM produtos_fts WHERE produtos_fts MATCH ?",
+                (consulta_fts(termo),), repeticoes,
+            )
+            click.echo(
+                f"   {termo!r:16} top 20 → LIKE: {antigo:8.2f} ms  FTS5+bm25: {novo:8.2f} ms"
+                f" | todos → LIKE: {antigo_todos:8.2f} ms  FTS5: {novo_todos:8.2f} ms"
+            )
+
+        con.close()
+        os.remove(caminho)
+
+
+# -------------------------------
+# 🔹 flask produtos stress-stock
+# -------------------------------
+def _operacao(rnd, produtos, compra):
+    """Uma venda (baixa em massa de 3 produtos) ou uma compra (CAS com custo)."""
+    from modulos.vendas.finalizacao import baixar_stock
+
+    if compra:
+        movimentar_stock(rnd.choice(produtos), 5, custo=round(rnd.uniform(40, 60), 2))
+    else:
+        baixar_stock({pid: 1 for pid in rnd.sample(produtos, min(3, len(produtos)))})
+    db.session.commit()
+
+
+def _executar(app, modo, threads, vendas, produtos):
+    """Corre ``threads`` x ``vendas`` operações e devolve (segundos, tentativas, entradas, saídas)."""
+    tentativas = [0]
+    movimentos = {"entradas": 0, "saidas": 0}
+    lock = threading.Lock()
+
+    def posto(semente):
+        rnd = random.Random(semente)
+        with app.app_context():
+            for i in range(vendas):
+                compra = i % 5 == 4
+
+                def operacao():
+                    with lock:
+                        tentativas[0] += 1
+                    if modo == "bloqueio":
+                        # Linha de base: a transação bloqueia o banco inteiro
+                        db.session.execute(text("BEGIN EXCLUSIVE"))
+                    _operacao(rnd, produtos, compra)
+
+                com_retentativas(operacao, tentativas=50)
+                with lock:
+                    if compra:
+                        movimentos["entradas"] += 5
+                    else:
+                        movimentos["saidas"] += min(3, len(produtos))
+            db.session.remove()
+
+    inicio = time.perf_counter()
+    postos = [threading.Thread(target=posto, args=(n,)) for n in range(threads)]
+    for t in postos:
+        t.start()
+    for t in postos:
+        t.join()
+    return time.perf_counter() - inicio, tentativas[0], movimentos["entradas"], movimentos["saidas"]
+
+
+@produtos_bp.cli.command("stress-stock")
+@click.option("--threads", "-t", default=8, show_default=True, help="Postos de venda simultâneos.")
+@click.option("--vendas", "-m", default=200, show_default=True, help="Operações por posto.")
+@click.option("--produtos", "-p", default=5, show_default=True, help="Produtos disputados.")
+def stress_stock(threads, vendas, produtos):
+    """Vários postos a vender e comprar os mesmos produtos num SQLite em ficheiro.
+
+    Compara o compare-and-swap por versão com uma linha de base que
+    bloqueia o banco inteiro (BEGIN EXCLUSIVE) e confirma que o stock
+    final é exactamente o esperado. Não toca no banco da aplicação.
+    """
+    stock_inicial = threads * vendas * 3
+
+    for modo in ("cas", "bloqueio"):
+        caminho = os.path.join(tempfile.mkdtemp(), "stress.db")
+        app = Flask("stress_stock")
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{caminho}"
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Produto(codigo=f"st{i:03d}", nome=f"Produto {i}", categoria="teste",
+                        preco_unitario=50, preco_venda=70, stock=stock_inicial)
+                for i in range(produtos)
+            ])
+            db.session.commit()
+            garantir_camadas()
+            garantir_movimentos()
+            ids = [p.id for p in Produto.query.all()]
+
+        segundos, tentativas, entradas, saidas = _executar(app, modo, threads, vendas, ids)
+
+        with app.app_context():
+            final = db.session.query(func.sum(Produto.stock)).scalar()
+            versoes = db.session.query(func.sum(Produto.versao)).scalar()
+            # Contadores do custeio: stock = entradas - saídas em cada produto
+            descasados = Produto.query.filter(
+                Produto.stock != Produto.entradas_acumuladas - Produto.saidas_acumuladas
+            ).count()
+            razao = sum(stock_em().values())
+            db.engine.dispose()
+
+        esperado = stock_inicial * produtos + entradas - saidas
+        operacoes = threads * vendas
+        click.echo(
+            f"== {modo:8} {operacoes} operações em {segundos:6.2f} s "
+            f"({operacoes / segundos:7.1f} op/s), {tentativas - operacoes} repetições"
+        )
+        click.echo(
+            f"   stock final {final} / esperado {esperado} "
+            f"{'✔' if final == esperado else '✘ DIFERENTE'} | versões: {versoes}"
+            f" | camadas {'✔' if not descasados else f'✘ {descasados} produtos'}"
+            f" | razão {razao} {'✔' if razao == final else '✘'}"
+        )
+        os.remove(caminho)
+
+
+# -------------------------------
+# 🔹 flask produtos importar
+# -------------------------------
+@produtos_bp.cli.command("importar")
+@click.argument("ficheiro", type=click.Path(exists=True, dir_okay=False))
+@click.option("--lote", type=int, default=None, help="Linhas por transação (padrão: IMPORTACAO_LOTE).")
+@click.option("--erros", "mostrar", default=20, show_default=True, help="Linhas com erro a mostrar.")
+def importar(ficheiro, lote, mostrar):
+    """Importa o catálogo de um CSV ou XLSX (mesmas regras do formulário)."""
+    inicio = time.perf_counter()
+    with force_locale(current_app.config.get("BABEL_DEFAULT_LOCALE", "pt")), open(ficheiro, "rb") as f:
+        try:
+            resultado = importar_catalogo(f, ficheiro, lote)
+        except ErroImportacao as e:
+            raise click.ClickException(str(e))
+
+    segundos = time.perf_counter() - inicio
+    click.echo(
+        f"✔ {resultado.linhas} linhas em {segundos:.2f} s: {resultado.inseridos} novos, "
+        f"{resultado.atualizados} actualizados, {len(resultado.erros)} com erro"
+    )
+    for erro in resultado.erros[:mostrar]:
+        click.echo(f"   linha {erro['linha']}: {erro['erro']} ({erro['codigo'] or erro['nome']})")
+
+
+# -------------------------------
+# 🔹 flask produtos snapshots / conciliar-stock
+# -------------------------------
+@produtos_bp.cli.command("snapshots")
+def snapshots():
+    """Cria os snapshots diários de stock em falta (para correr no cron)."""
+    inicio = time.perf_counter()
+    criados = gerar_snapshots()
+    click.echo(f"✔ {criados} snapshots criados em {time.perf_counter() - inicio:.2f} s.")
+
+
+@produtos_bp.cli.command("conciliar-stock")
+@click.option("--lote", default=LOTE, show_default=True, help="Produtos por lote.")
+@click.option("--corrigir", is_flag=True, help="Grava um movimento de acerto para cada diferença.")
+@click.option("--mostrar", default=20, show_default=True, help="Diferenças a mostrar.")
+def conciliar(lote, corrigir, mostrar):
+    """Compara o razão de stock com o stock dos produtos."""
+    inicio = time.perf_counter()
+    diferencas = conciliar_stock(lote, corrigir)
+    segundos = time.perf_counter() - inicio
+
+    if not diferencas:
+        click.echo(f"✔ Razão e stock coincidem ({segundos:.2f} s).")
+        return
+    click.echo(f"✘ {len(diferencas)} produtos com diferenças ({segundos:.2f} s)"
+               f"{' — acertos gravados' if corrigir else ''}:")
+    for _pid, codigo, stock, no_razao in diferencas[:mostrar]:
+        click.echo(f"   {codigo}: stock {stock}, razão {no_razao}")
@@ -0,0 +1,257 @@
+# modulos/produtos/custos.py
+"""Custeio das saídas de stock: FIFO por camadas ou custo médio ponderado.
+
+Cada entrada de stock (compra, ajuste positivo, stock inicial) é uma
+camada em ``HistoricoCustoProduto`` com a quantidade e o custo unitário,
+e ainda dois acumulados do produto até ao fim dessa camada:
+
+    entrada_acumulada   unidades entradas
+    custo_acumulado     custo dessas unidades
+
+As camadas de um produto formam assim um vector ordenado de somas
+prefixas, e o produto só guarda dois contadores, ``entradas_acumuladas``
+e ``saidas_acumuladas`` (stock = entradas − saídas). Em FIFO a n-ésima
+unidade a sair é a n-ésima que entrou, e o custo das primeiras x
+unidades é
+
+    F(x) = custo_acumulado_j − (entrada_acumulada_j − x) × custo_j
+
+com j a primeira camada em que entrada_acumulada >= x: uma procura no
+índice (produto_codigo, entrada_acumulada), O(log n). Uma saída de q
+unidades custa F(S + q) − F(S), sendo S as saídas anteriores. As camadas
+nunca são reescritas; a venda só avança o contador.
+
+Em média ponderada a saída custa ``preco_unitario × q``, o custo médio
+que as compras mantêm. O método vem de ``CUSTEIO_METODO`` ("media", o
+padrão, ou "fifo"). Os acumulados são mantidos nos dois métodos, por
+isso pode-se mudar de método a qualquer momento.
+
+O estado está todo no banco e o arranque não repete o histórico:
+``garantir_camadas`` só acerta, em SQL, os produtos cujo stock não bate
+com os contadores (bancos antigos, produtos criados fora da aplicação).
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, case, func, insert, literal, select, tuple_, union_all, update
+
+from modulos.extensions import db
+from .models import Produto
+
+METODOS = ("media", "fifo")
+METODO_PADRAO = "media"
+PONTOS_POR_CONSULTA = 200  # SQLite aceita até 500 SELECT num UNION
+
+
+def metodo_custeio():
+    metodo = current_app.config.get("CUSTEIO_METODO", METODO_PADRAO)
+    return metodo if metodo in METODOS else METODO_PADRAO
+
+
+def _historico():
+    # Import local: compras importa produtos.stock, que importa este módulo
+    from modulos.compras.models import HistoricoCustoProduto
+    return HistoricoCustoProduto
+
+
+# -------------------------------
+# 🔹 Entradas (novas camadas)
+# -------------------------------
+def registrar_entradas(entradas, origem, data=None):
+    """Acrescenta camadas de custo. Não faz commit.
+
+    ``entradas`` é uma lista de (produto_id, quantidade, custo unitário);
+    várias entradas do mesmo produto ficam em camadas seguidas, pela
+    ordem da lista. O stock em si é alterado por quem chama.
+    """
+    entradas = [(pid, int(q), float(c or 0)) for pid, q, c in entradas if q and q > 0]
+    if not entradas:
+        return
+    Historico = _historico()
+
+    totais = defaultdict(int)
+    for pid, q, _c in entradas:
+        totais[pid] += q
+
+    # O UPDATE reserva as posições das novas camadas sem ler antes
+    linhas = db.session.execute(
+        update(Produto)
+        .where(Produto.id.in_(list(totais)))
+        .values(entradas_acumuladas=Produto.entradas_acumuladas + case(totais, value=Produto.id, else_=0))
+        .returning(Produto.id, Produto.codigo, Produto.entradas_acumuladas)
+        .execution_options(synchronize_session=False)
+    ).all()
+    codigos = {pid: codigo for pid, codigo, _e in linhas}
+    posicao = {pid: entradas_fim - totais[pid] for pid, _c, entradas_fim in linhas}
+
+    # Custo acumulado da última camada de cada produto
+    anteriores = [(codigos[pid], inicio) for pid, inicio in posicao.items() if inicio > 0]
+    custo = dict.fromkeys(codigos.values(), 0.0)
+    if anteriores:
+        custo.update(db.session.execute(
+            select(Historico.produto_codigo, Historico.custo_acumulado)
+            .where(tuple_(Historico.produto_codigo, Historico.entrada_acumulada).in_(anteriores))
+        ).all())
+
+    data = data or datetime.utcnow()
+    camadas = []
+    for pid, q, c in entradas:
+        if pid not in codigos:
+            continue  # produto apagado entretanto
+        codigo = codigos[pid]
+        posicao[pid] += q
+        custo[codigo] += q * c
+        camadas.append({
+            "produto_codigo": codigo,
+            "custo": c,
+            "quantidade": q,
+            "entrada_acumulada": posicao[pid],
+            "custo_acumulado": custo[codigo],
+            "origem": origem,
+            "data_registo": data,
+        })
+    db.session.execute(insert(Historico), camadas)
+
+
+# -------------------------------
+# 🔹 Saídas (custo das unidades)
+# -------------------------------
+def _custo_ate(pontos):
+    """F(x) de cada (codigo, x), com uma procura no índice por ponto."""
+    Historico = _historico()
+    pontos = sorted({p for p in pontos if p[1] > 0})
+    valores = {}
+    for inicio in range(0, len(pontos), PONTOS_POR_CONSULTA):
+        parte = pontos[inicio:inicio + PONTOS_POR_CONSULTA]
+        consultas = [
+            select(
+                literal(n).label("n"), Historico.entrada_acumulada,
+                Historico.custo_acumulado, Historico.custo,
+            )
+            .where(Historico.produto_codigo == codigo, Historico.entrada_acumulada >= x)
+            .order_by(Historico.entrada_acumulada)
+            .limit(1)
+            .subquery()
+            for n, (codigo, x) in enumerate(parte)
+        ]
+        for n, entrada, acumulado, custo in db.session.execute(
+            union_all(*[select(c) for c in consultas])
+        ):
+            x = parte[n][1]
+            valores[parte[n]] = acumulado - (entrada - x) * custo
+    return valores
+
+
+def consumir(saidas):
+    """Avança as saídas dos produtos e devolve {produto_id: custo das unidades}.
+
+    ``saidas`` é {produto_id: quantidade}. Chamar na transação que baixa
+    o stock, depois da baixa. Não faz commit. Unidades sem camada (stock
+    que não passou pelas entradas) custam o ``preco_unitario``.
+    """
+    pedidos = {pid: int(q) for pid, q in saidas.items() if q and q > 0}
+    if not pedidos:
+        return {}
+
+    linhas = db.session.execute(
+        update(Produto)
+        .where(Produto.id.in_(list(pedidos)))
+        .values(saidas_acumuladas=Produto.saidas_acumuladas + case(pedidos, value=Produto.id, else_=0))
+        .returning(
+            Produto.id, Produto.codigo, Produto.saidas_acumuladas,
+            Produto.entradas_acumuladas, Produto.preco_unitario,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    if metodo_custeio() == "media":
+        return {pid: round((preco or 0) * pedidos[pid], 2) for pid, _c, _s, _e, preco in linhas}
+
+    # FIFO: unidades (S, S + q], limitadas às que têm camada
+    intervalos = {}
+    for pid, codigo, fim, entradas, preco in linhas:
+        inicio = fim - pedidos[pid]
+        a, b = min(inicio, entradas), min(fim, entradas)
+        intervalos[pid] = (codigo, a, b, (fim - b) - (inicio - a), preco or 0)
+
+    valores = _custo_ate(
+        [(codigo, x) for codigo, a, b, _f, _p in intervalos.values() for x in (a, b)]
+    )
+    return {
+        pid: round(valores.get((codigo, b), 0.0) - valores.get((codigo, a), 0.0) + sem_camada * preco, 2)
+        for pid, (codigo, a, b, sem_camada, preco) in intervalos.items()
+    }
+
+
+# -------------------------------
+# 🔹 Valor do stock
+# -------------------------------
+def valor_stock(metodo=None):
+    """Valor total do stock actual pelo método indicado (ou o configurado)."""
+    metodo = metodo or metodo_custeio()
+    if metodo == "media":
+        return float(db.session.query(
+            func.coalesce(func.sum(Produto.stock * Produto.preco_unitario), 0.0)
+        ).scalar())
+
+    # FIFO: parte ainda por sair de cada camada aberta (entrada > saídas)
+    Historico = _historico()
+    por_sair = Historico.entrada_acumulada - Produto.saidas_acumuladas
+    restante = case((por_sair < Historico.quantidade, por_sair), else_=Historico.quantidade)
+    return float(db.session.query(
+        func.coalesce(func.sum(restante * Historico.custo), 0.0)
+    ).select_from(Produto).join(
+        Historico,
+        and_(
+            Historico.produto_codigo == Produto.codigo,
+            Historico.entrada_acumulada > Produto.saidas_acumuladas,
+        ),
+    ).scalar())
+
+
+# -------------------------------
+# 🔹 Acerto no arranque
+# -------------------------------
+def garantir_camadas():
+    """Acerta os contadores dos produtos cujo stock não bate com as camadas.
+
+    Stock a mais → camada de abertura ao ``preco_unitario``; stock a menos
+    → saídas. Em bancos antigos cria a camada de abertura de cada produto.
+    Devolve quantos produtos foram acertados.
+    """
+    Historico = _historico()
+    tabela = Produto.__table__
+    falta = tabela.c.stock - (tabela.c.entradas_acumuladas - tabela.c.saidas_acumuladas)
+    anterior = (
+        select(Historico.custo_acumulado)
+        .where(
+            Historico.produto_codigo == tabela.c.codigo,
+            Historico.entrada_acumulada == tabela.c.entradas_acumuladas,
+        )
+        .scalar_subquery()
+    )
+
+    with db.engine.begin() as con:
+        novas = con.execute(
+            insert(Historico.__table__).from_select(
+                ["produto_codigo", "custo", "quantidade", "entrada_acumulada",
+                 "custo_acumulado", "origem", "data_registo"],
+                select(
+                    tabela.c.codigo,
+                    func.coalesce(tabela.c.preco_unitario, 0),
+                    falta,
+                    tabela.c.entradas_acumuladas + falta,
+                    func.coalesce(anterior, 0) + falta * func.coalesce(tabela.c.preco_unitario, 0),
+                    literal("abertura"),
+                    literal(datetime.utcnow()),
+                ).where(falta > 0),
+            )
+        ).rowcount
+        con.execute(
+            update(tabela).where(falta > 0).values(entradas_acumuladas=tabela.c.entradas_acumuladas + falta)
+        )
+        a_menos = con.execute(
+            update(tabela).where(falta < 0).values(saidas_acumuladas=tabela.c.saidas_acumuladas - falta)
+        ).rowcount
+    return (novas or 0) + (a_menos or 0)
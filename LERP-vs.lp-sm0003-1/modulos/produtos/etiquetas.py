@@ -0,0 +1,96 @@
+# modulos/produtos/etiquetas.py
+"""Folhas de etiquetas com código de barras.
+
+Os modelos descrevem folhas A4 de etiquetas autocolantes (medidas em
+mm). Para acrescentar ou corrigir um modelo, basta pô-lo em
+``ETIQUETAS_MODELOS`` na configuração, com as mesmas chaves:
+
+    ETIQUETAS_MODELOS = {
+        "loja_2x5": {"nome": "2 × 5 (100 × 55 mm)", "colunas": 2, "linhas": 5,
+                     "largura": 100, "altura": 55, "margem_esquerda": 5,
+                     "margem_topo": 10, "espaco_h": 0, "espaco_v": 0},
+    }
+
+O desenho é feito por ``etiquetas_pdf`` (modulos/renderizacao).
+"""
+import math
+
+from flask import current_app
+from sqlalchemy import func
+
+from modulos.compras.models import Compra
+from modulos.extensions import db
+from .models import Produto
+
+MODELO_PADRAO = "a4_24"
+MAXIMO = 5000  # etiquetas por pedido
+
+MODELOS = {
+    "a4_14": {
+        "nome": "14 / A4 — 99,1 × 38,1 mm", "colunas": 2, "linhas": 7,
+        "largura": 99.1, "altura": 38.1, "margem_esquerda": 4.65, "margem_topo": 15.15,
+        "espaco_h": 2.5, "espaco_v": 0,
+    },
+    "a4_21": {
+        "nome": "21 / A4 — 63,5 × 38,1 mm", "colunas": 3, "linhas": 7,
+        "largura": 63.5, "altura": 38.1, "margem_esquerda": 7.2, "margem_topo": 15.15,
+        "espaco_h": 2.5, "espaco_v": 0,
+    },
+    "a4_24": {
+        "nome": "24 / A4 — 70 × 37 mm", "colunas": 3, "linhas": 8,
+        "largura": 70, "altura": 37, "margem_esquerda": 0, "margem_topo": 0.5,
+        "espaco_h": 0, "espaco_v": 0,
+    },
+    "a4_40": {
+        "nome": "40 / A4 — 52,5 × 29,7 mm", "colunas": 4, "linhas": 10,
+        "largura": 52.5, "altura": 29.7, "margem_esquerda": 0, "margem_topo": 0,
+        "espaco_h": 0, "espaco_v": 0,
+    },
+    "a4_65": {
+        "nome": "65 / A4 — 38,1 × 21,2 mm", "colunas": 5, "linhas": 13,
+        "largura": 38.1, "altura": 21.2, "margem_esquerda": 4.7, "margem_topo": 10.7,
+        "espaco_h": 2.5, "espaco_v": 0,
+    },
+}
+
+
+def modelos_etiquetas():
+    return {**MODELOS, **current_app.config.get("ETIQUETAS_MODELOS", {})}
+
+
+def selecionar_etiquetas(produtos=(), categoria=None, compras=(), copias=1):
+    """Lista [[nome, codigo, preco, copias]] para ``etiquetas_pdf``.
+
+    Produtos escolhidos e os de uma categoria levam ``copias`` etiquetas
+    cada; cada compra leva uma etiqueta por unidade comprada.
+    """
+    colunas = db.session.query(Produto.codigo, Produto.nome, Produto.preco_venda, Produto.preco_unitario)
+    quantidades = {}
+
+    def juntar(linhas, n):
+        for codigo, nome, preco_venda, preco_unitario in linhas:
+            entrada = quantidades.setdefault(codigo, [nome, preco_venda or preco_unitario, 0])
+            entrada[2] += n(codigo)
+
+    ids = list(produtos)
+    if ids:
+        juntar(colunas.filter(Produto.id.in_(ids)).order_by(Produto.nome), lambda _c: copias)
+
+    if categoria:
+        query = colunas.filter(func.lower(Produto.categoria) == categoria.strip().lower())
+        # Produtos já escolhidos à mão não levam cópias a dobrar
+        ja_escolhidos = set(quantidades)
+        juntar((l for l in query.order_by(Produto.nome) if l.codigo not in ja_escolhidos), lambda _c: copias)
+
+    if compras:
+        unidades = {}
+        for codigo, quantidade in db.session.query(Compra.codigo_produto, Compra.quantidade).filter(
+            Compra.id.in_(list(compras))
+        ):
+            unidades[codigo] = unidades.get(codigo, 0) + max(math.ceil(quantidade or 0), 0)
+        juntar(colunas.filter(Produto.codigo.in_(unidades)).order_by(Produto.nome), unidades.get)
+
+    return [
+        [nome, codigo, f"{preco:.2f} MT" if preco else "", n]
+        for codigo, (nome, preco, n) in quantidades.items() if n > 0
+    ]
@@ -0,0 +1,355 @@
+# modulos/produtos/importacao.py
+"""Importação em massa do catálogo a partir de CSV ou XLSX.
+
+O ficheiro é lido em lotes de ``IMPORTACAO_LOTE`` linhas (pandas para
+CSV, openpyxl em modo só-leitura para XLSX). Em cada lote:
+
+1. os cabeçalhos são reconhecidos (``ALIASES``) e os valores validados
+   com operações sobre colunas inteiras, sem ciclo por linha;
+2. as categorias ficam com a grafia do cadastro ("  farmácia " → "Farmacia");
+3. as linhas sem código recebem "<prefixo da categoria><número>",
+   reservando de uma vez um bloco da série de cada prefixo, acima dos
+   códigos com esse prefixo que vêm no ficheiro;
+4. numa só transação, as linhas novas entram com um INSERT em lote
+   (executemany) e as de código já existente são actualizadas com um
+   UPDATE em lote, e as séries de códigos avançam para lá dos códigos
+   do ficheiro (``novo_produto`` não volta a gerá-los).
+
+O stock inicial dos produtos novos entra como camada de custo e como
+movimento de abertura no razão de stock. Nos produtos já existentes o
+stock não é mexido (o stock muda por compras, vendas e ajustes); células
+vazias mantêm o valor que lá estava.
+Linhas inválidas não são gravadas e aparecem no relatório de erros com
+o número da linha no ficheiro.
+"""
+import io
+import os
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+from flask import current_app
+from flask_babel import gettext as _
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from modulos.extensions import db
+from modulos.sequencias.utils import avancar_series, maiores_numeros, reservar_codigos
+from .codigos import LARGURA, PREFIXO_OUTROS, PREFIXOS, categoria_canonica, prefixo_categoria
+from .indice import indice_produtos, normalizar
+from .models import LIMITE_ALERTA, MovimentoStock, Produto
+
+LOTE = 5000
+
+# Cabeçalhos aceites (já normalizados) → coluna
+ALIASES = {
+    "codigo": "codigo", "cod": "codigo", "sku": "codigo", "referencia": "codigo",
+    "nome": "nome", "produto": "nome", "descricao": "nome",
+    "categoria": "categoria",
+    "preco_unitario": "preco_unitario", "preco": "preco_unitario", "custo": "preco_unitario",
+    "preco_compra": "preco_unitario",
+    "preco_venda": "preco_venda", "pvp": "preco_venda",
+    "stock": "stock", "quantidade": "stock", "qtd": "stock",
+    "stock_minimo": "stock_minimo", "minimo": "stock_minimo",
+}
+OBRIGATORIAS = ("nome", "categoria", "preco_unitario")
+TEXTO = ("codigo", "nome", "categoria")
+TAMANHOS = {"codigo": 20, "nome": 100, "categoria": 50}
+
+
+class ErroImportacao(Exception):
+    """Ficheiro que não se consegue importar (formato ou colunas em falta)."""
+
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.inseridos = 0
+        self.atualizados = 0
+        self.erros = []  # [{"linha", "codigo", "nome", "erro"}]
+
+    @property
+    def linhas(self):
+        return self.inseridos + self.atualizados + len(self.erros)
+
+
+# -------------------------------
+# 🔹 Leitura em lotes
+# -------------------------------
+def _cabecalho(nome):
+    return ALIASES.get(normalizar(str(nome)).replace(" ", "_"))
+
+
+def _lotes_csv(ficheiro, lote):
+    bruto = ficheiro.read()
+    try:
+        texto = bruto.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        texto = bruto.decode("cp1252")  # CSV gravado pelo Excel em português
+    primeira = texto.split("\n", 1)[0]
+    separador = max((";", ",", "\t"), key=primeira.count)
+
+    leitor = pd.read_csv(
+        io.StringIO(texto), sep=separador, dtype=str, keep_default_na=False,
+        chunksize=lote, skipinitialspace=True,
+    )
+    for bloco in leitor:
+        bloco.index = bloco.index + 2  # linha 1 é o cabeçalho
+        yield bloco
+
+
+def _celula(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _lotes_xlsx(ficheiro, lote):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErroImportacao(_("Para importar XLSX é preciso o pacote openpyxl; use CSV."))
+
+    livro = load_workbook(ficheiro, read_only=True, data_only=True)
+    try:
+        linhas = livro.worksheets[0].iter_rows(values_only=True)
+        cabecalho = [_celula(c) for c in next(linhas, ())]
+        largura = len(cabecalho)
+        bloco, inicio = [], 2
+        for numero, linha in enumerate(linhas, start=2):
+            if not any(v is not None for v in linha):
+                continue
+            bloco.append([_celula(v) for v in linha[:largura]] + [""] * (largura - len(linha)))
+            if len(bloco) == lote:
+                yield pd.DataFrame(bloco, columns=cabecalho, index=range(inicio, numero + 1))
+                bloco, inicio = [], numero + 1
+        if bloco:
+            yield pd.DataFrame(bloco, columns=cabecalho, index=range(inicio, inicio + len(bloco)))
+    finally:
+        livro.close()
+
+
+def ler_lotes(ficheiro, nome_ficheiro, lote=LOTE):
+    extensao = os.path.splitext(nome_ficheiro or "")[1].lower()
+    if extensao in (".xlsx", ".xlsm"):
+        return _lotes_xlsx(ficheiro, lote)
+    if extensao in (".csv", ".txt"):
+        return _lotes_csv(ficheiro, lote)
+    raise ErroImportacao(_("Formato não suportado: use um ficheiro CSV ou XLSX."))
+
+
+# -------------------------------
+# 🔹 Validação (por colunas)
+# -------------------------------
+SEM_ESPACOS = str.maketrans("", "", " ")
+VIRGULA_DECIMAL = str.maketrans({",": ".", ".": None, " ": None})
+
+
+def converter_numero(serie):
+    """Texto → número; aceita "1.234,50", "1234,5" e "1234.5". Vazio → NaN."""
+    com_virgula = serie.str.contains(",", regex=False)
+    if com_virgula.any():
+        serie = serie.copy()
+        serie[com_virgula] = serie[com_virgula].str.translate(VIRGULA_DECIMAL)
+    com_espaco = serie.str.contains(" ", regex=False)
+    if com_espaco.any():
+        serie = serie.copy()
+        serie[com_espaco] = serie[com_espaco].str.translate(SEM_ESPACOS)
+    return pd.to_numeric(serie, errors="coerce")
+
+
+def _preparar(bloco):
+    """Normaliza o lote e devolve (lote, série de mensagens de erro por linha)."""
+    colunas = {c: _cabecalho(c) for c in bloco.columns}
+    bloco = bloco[[c for c, destino in colunas.items() if destino]].rename(columns=colunas)
+    bloco = bloco.loc[:, ~bloco.columns.duplicated()].copy()
+
+    faltam = [c for c in OBRIGATORIAS if c not in bloco.columns]
+    if faltam:
+        raise ErroImportacao(_("Colunas obrigatórias em falta: %(colunas)s", colunas=", ".join(faltam)))
+
+    for coluna in TEXTO:
+        if coluna in bloco.columns:
+            bloco[coluna] = bloco[coluna].fillna("").astype(str).str.strip()
+        else:
+            bloco[coluna] = ""
+
+    erros = pd.Series("", index=bloco.index)
+
+    def erro(mascara, mensagem):
+        if mascara.any():
+            erros[mascara] = erros[mascara] + mensagem + "; "
+
+    erro(bloco["nome"] == "", _("nome em falta"))
+    erro(bloco["categoria"] == "", _("categoria em falta"))
+    for coluna, tamanho in TAMANHOS.items():
+        erro(bloco[coluna].str.len() > tamanho,
+             _("%(coluna)s com mais de %(n)s caracteres", coluna=coluna, n=tamanho))
+
+    bruto = bloco["preco_unitario"].fillna("").astype(str)
+    bloco["preco_unitario"] = converter_numero(bruto)
+    erro(bloco["preco_unitario"].isna(), _("preço unitário inválido"))
+    erro(bloco["preco_unitario"] < 0, _("preço unitário negativo"))
+
+    for coluna in ("preco_venda", "stock", "stock_minimo"):
+        if coluna not in bloco.columns:
+            bloco[coluna] = float("nan")
+            continue
+        bruto = bloco[coluna].fillna("").astype(str).str.strip()
+        bloco[coluna] = converter_numero(bruto)
+        erro((bruto != "") & bloco[coluna].isna(), _("%(coluna)s inválido", coluna=coluna))
+        erro(bloco[coluna] < 0, _("%(coluna)s negativo", coluna=coluna))
+        if coluna != "preco_venda":
+            erro(bloco[coluna].notna() & (bloco[coluna] % 1 != 0),
+                 _("%(coluna)s tem de ser inteiro", coluna=coluna))
+
+    # Categorias: a grafia do cadastro, calculada só para os valores distintos
+    distintas = bloco["categoria"].unique()
+    bloco["categoria"] = bloco["categoria"].map({c: categoria_canonica(c) for c in distintas})
+
+    return bloco, erros.str.rstrip("; ")
+
+
+# -------------------------------
+# 🔹 Gravação
+# -------------------------------
+def _registos(bloco, colunas):
+    """Lista de dicts para executemany, com NaN/NA → None."""
+    valores = [
+        [None if pd.isna(v) else v for v in bloco[c].tolist()] if bloco[c].hasnans else bloco[c].tolist()
+        for c in colunas
+    ]
+    return [dict(zip(colunas, linha)) for linha in zip(*valores)]
+
+
+def _gravar_lote(bloco, vistos, resultado):
+    # Import local: compras importa este módulo
+    from modulos.compras.models import HistoricoCustoProduto
+
+    bloco, erros = _preparar(bloco)
+
+    # Código repetido no ficheiro (neste lote ou num anterior)
+    com_codigo = bloco["codigo"] != ""
+    repetido = com_codigo & (bloco["codigo"].duplicated() | bloco["codigo"].isin(vistos))
+    erros = erros.mask(repetido & (erros == ""), _("código repetido no ficheiro"))
+    vistos.update(bloco.loc[com_codigo, "codigo"])
+
+    invalidos = erros != ""
+    for linha, codigo, nome, mensagem in zip(
+        bloco.index[invalidos], bloco["codigo"][invalidos], bloco["nome"][invalidos], erros[invalidos]
+    ):
+        resultado.erros.append({"linha": int(linha), "codigo": codigo, "nome": nome, "erro": mensagem})
+
+    bloco = bloco[~invalidos].copy()
+    if bloco.empty:
+        return
+    for coluna in ("stock", "stock_minimo"):
+        bloco[coluna] = bloco[coluna].astype("Int64")
+
+    tabela = Produto.__table__
+    codigos = bloco.loc[bloco["codigo"] != "", "codigo"].tolist()
+    existentes = set()
+    if codigos:
+        with db.engine.connect() as con:
+            existentes = set(con.execute(select(tabela.c.codigo).where(tabela.c.codigo.in_(codigos))).scalars())
+
+    # Códigos do ficheiro com a forma "<prefixo><número>": as séries passam à frente deles
+    maiores = maiores_numeros(codigos, set(PREFIXOS.values()) | {PREFIXO_OUTROS})
+
+    # Códigos novos: um bloco reservado por prefixo (antes da transação de escrita)
+    sem_codigo = bloco["codigo"] == ""
+    if sem_codigo.any():
+        categorias = bloco.loc[sem_codigo, "categoria"]
+        prefixos = categorias.map({c: prefixo_categoria(c) for c in categorias.unique()})
+        inicios = {
+            p: reservar_codigos(Produto.codigo, p, int(n), acima=maiores.get(p, 0))
+            for p, n in prefixos.value_counts().items()
+        }
+        numeros = prefixos.map(inicios) + prefixos.groupby(prefixos).cumcount()
+        bloco.loc[sem_codigo, "codigo"] = prefixos + numeros.astype(str).str.zfill(LARGURA)
+
+    atualizar = bloco["codigo"].isin(existentes)
+    novos = bloco[~atualizar].copy()
+    novos["stock"] = novos["stock"].fillna(0)
+    novos["stock_minimo"] = novos["stock_minimo"].fillna(LIMITE_ALERTA)
+    novos["versao"] = 0
+    novos["entradas_acumuladas"] = novos["stock"]
+    novos["criado_em"] = datetime.utcnow()
+
+    # Stock inicial dos produtos novos = primeira camada de custo (produtos/custos.py)
+    aberturas = novos.loc[novos["stock"] > 0, ["codigo", "preco_unitario", "stock", "criado_em"]].rename(
+        columns={"codigo": "produto_codigo", "preco_unitario": "custo",
+                 "stock": "quantidade", "criado_em": "data_registo"}
+    )
+    aberturas["entrada_acumulada"] = aberturas["quantidade"]
+    aberturas["custo_acumulado"] = aberturas["quantidade"] * aberturas["custo"]
+    aberturas["origem"] = "abertura"
+
+    try:
+        with db.engine.begin() as con:
+            if not novos.empty:
+                con.execute(tabela.insert(), _registos(novos, (
+                    "codigo", "nome", "categoria", "preco_unitario", "preco_venda",
+                    "stock", "stock_minimo", "versao", "entradas_acumuladas", "criado_em",
+                )))
+            if not aberturas.empty:
+                con.execute(HistoricoCustoProduto.__table__.insert(), _registos(aberturas, tuple(aberturas.columns)))
+                # ... e o movimento de abertura no razão (produtos/movimentos.py)
+                ids = dict(con.execute(
+                    select(tabela.c.codigo, tabela.c.id).where(tabela.c.codigo.in_(aberturas["produto_codigo"].tolist()))
+                ).all())
+                con.execute(MovimentoStock.__table__.insert(), [
+                    {"produto_id": ids[codigo], "quantidade": int(q), "tipo": "abertura", "data": data}
+                    for codigo, q, data in zip(aberturas["produto_codigo"], aberturas["quantidade"], aberturas["data_registo"])
+                ])
+            if atualizar.any():
+                con.execute(
+                    update(tabela)
+                    .where(tabela.c.codigo == bindparam("b_codigo"))
+                    .values(
+                        nome=bindparam("nome"),
+                        categoria=bindparam("categoria"),
+                        preco_unitario=bindparam("preco_unitario"),
+                        preco_venda=func.coalesce(bindparam("preco_venda"), tabela.c.preco_venda),
+                        stock_minimo=func.coalesce(bindparam("stock_minimo"), tabela.c.stock_minimo),
+                    ),
+                    _registos(
+                        bloco[atualizar].rename(columns={"codigo": "b_codigo"}),
+                        ("b_codigo", "nome", "categoria", "preco_unitario", "preco_venda", "stock_minimo"),
+                    ),
+                )
+            avancar_series(con, Produto.codigo, maiores)
+    except IntegrityError as e:
+        # Ex.: produto gravado noutro posto com um código deste lote
+        mensagem = _("lote rejeitado pelo banco: %(erro)s", erro=str(e.orig)[:200])
+        for linha, codigo, nome in zip(bloco.index, bloco["codigo"], bloco["nome"]):
+            resultado.erros.append({"linha": int(linha), "codigo": codigo, "nome": nome, "erro": mensagem})
+        return
+
+    resultado.inseridos += len(novos)
+    resultado.atualizados += int(atualizar.sum())
+
+
+def importar_catalogo(ficheiro, nome_ficheiro, lote=None):
+    """Importa o ficheiro e devolve um ResultadoImportacao.
+
+    Cada lote é gravado na sua transação: um lote rejeitado não desfaz os
+    anteriores. Levanta ErroImportacao se o ficheiro não for legível.
+    """
+    lote = lote or current_app.config.get("IMPORTACAO_LOTE", LOTE)
+    resultado = ResultadoImportacao()
+    vistos = set()
+    try:
+        for bloco in ler_lotes(ficheiro, nome_ficheiro, lote):
+            _gravar_lote(bloco, vistos, resultado)
+    except (ValueError, KeyError, pd.errors.ParserError, zipfile.BadZipFile) as e:
+        if resultado.linhas:
+            raise ErroImportacao(
+                _("Importação interrompida depois de %(n)s linhas: %(erro)s", n=resultado.linhas, erro=e)
+            )
+        raise ErroImportacao(_("Ficheiro ilegível: %(erro)s", erro=e))
+    finally:
+        if resultado.inseridos or resultado.atualizados:
+            indice_produtos.reconstruir_em_segundo_plano()
+    return resultado
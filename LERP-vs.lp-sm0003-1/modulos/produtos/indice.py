@@ -0,0 +1,201 @@
+# modulos/produtos/indice.py
+"""Índice ordenado em memória para o autocomplete de produtos.
+
+Guarda uma lista ordenada de chaves normalizadas (código, nome completo e
+cada palavra do nome) e procura por prefixo com ``bisect``, sem tocar no
+banco. O índice é construído na primeira busca e actualizado a cada
+commit que insere, altera ou apaga um ``Produto``; como cada worker tem o
+seu próprio índice, é reconstruído em segundo plano após
+``INDICE_PRODUTOS_TTL`` segundos para apanhar alterações feitas por
+outros processos.
+"""
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .models import Produto
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ("Pão" → "pao")."""
+    texto = unicodedata.normalize("NFKD", (texto or "").strip().lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def dados_produto(produto):
+    return {
+        "id": produto.id,
+        "codigo": produto.codigo,
+        "nome": produto.nome,
+        "categoria": produto.categoria or "",
+        "preco_venda": float(produto.preco_venda or 0),
+        "preco_unitario": float(produto.preco_unitario or 0),
+    }
+
+
+def _chaves(dados):
+    nome = normalizar(dados["nome"])
+    chaves = {normalizar(dados["codigo"]), nome}
+    chaves.update(nome.split())
+    chaves.discard("")
+    return chaves
+
+
+class IndiceProdutos:
+    def __init__(self):
+        self._chaves = []     # [(chave, produto_id)] ordenada
+        self._produtos = {}   # produto_id -> dados
+        self._lock = threading.RLock()
+        self._alteracoes = None  # alterações recebidas durante uma reconstrução
+        self.construido_em = None
+
+    # ---------- Construção ----------
+    def construir(self):
+        with self._lock:
+            if self._alteracoes is not None:
+                return
+            self._alteracoes = []
+
+        try:
+            self._construir()
+        finally:
+            with self._lock:
+                alteracoes, self._alteracoes = self._alteracoes, None
+                for dados in alteracoes:
+                    self._aplicar(dados)
+
+    def _construir(self):
+        consulta = Produto.query.with_entities(
+            Produto.id, Produto.codigo, Produto.nome, Produto.categoria,
+            Produto.preco_venda, Produto.preco_unitario
+        )
+        produtos = {p.id: dados_produto(p) for p in consulta.yield_per(5000)}
+        chaves = sorted((chave, pid) for pid, dados in produtos.items() for chave in _chaves(dados))
+
+        with self._lock:
+            self._produtos = produtos
+            self._chaves = chaves
+            self.construido_em = time.monotonic()
+
+    def garantir_construido(self):
+        if self.construido_em is None:
+            self.construir()
+            return
+
+        ttl = current_app.config.get("INDICE_PRODUTOS_TTL", 300)
+        if time.monotonic() - self.construido_em > ttl:
+            self.reconstruir_em_segundo_plano()
+
+    def reconstruir_em_segundo_plano(self):
+        """Reconstrói o índice numa thread (ex.: depois de uma importação em massa)."""
+        if self.construido_em is None or self._alteracoes is not None:
+            return
+        app = current_app._get_current_object()
+
+        def reconstruir():
+            with app.app_context():
+                self.construir()
+
+        threading.Thread(target=reconstruir, daemon=True).start()
+
+    # ---------- Actualização incremental ----------
+    def _retirar(self, produto_id):
+        antigo = self._produtos.pop(produto_id, None)
+        if antigo is None:
+            return
+        for chave in _chaves(antigo):
+            i = bisect_left(self._chaves, (chave, produto_id))
+            if i < len(self._chaves) and self._chaves[i] == (chave, produto_id):
+                del self._chaves[i]
+
+    def _aplicar(self, dados):
+        """``dados`` de um produto gravado, ou só {"id": ...} se foi apagado."""
+        self._retirar(dados["id"])
+        if len(dados) > 1:
+            self._produtos[dados["id"]] = dados
+            for chave in _chaves(dados):
+                insort(self._chaves, (chave, dados["id"]))
+
+    def _registar(self, dados):
+        with self._lock:
+            if self._alteracoes is not None:
+                self._alteracoes.append(dados)
+            if self.construido_em is not None:
+                self._aplicar(dados)
+
+    def gravar(self, dados):
+        self._registar(dados)
+
+    def remover(self, produto_id):
+        self._registar({"id": produto_id})
+
+    # ---------- Busca ----------
+    def buscar(self, termo, pagina=1, limite=20):
+        """Produtos cujo código ou nome (ou uma palavra do nome) começa por ``termo``.
+
+        Devolve (itens, tem_mais) para a página pedida.
+        """
+        prefixo = normalizar(termo)
+        if not prefixo:
+            return [], False
+
+        self.garantir_construido()
+
+        ignorar = (pagina - 1) * limite
+        vistos = set()
+        itens = []
+
+        with self._lock:
+            i = bisect_left(self._chaves, (prefixo,))
+            while i < len(self._chaves):
+                chave, pid = self._chaves[i]
+                i += 1
+                if not chave.startswith(prefixo):
+                    break
+                if pid in vistos:
+                    continue
+                vistos.add(pid)
+                if ignorar:
+                    ignorar -= 1
+                    continue
+                if len(itens) == limite:
+                    return itens, True
+                itens.append(self._produtos[pid])
+
+        return itens, False
+
+
+indice_produtos = IndiceProdutos()
+
+
+# ================================
+# Sincronização com o banco
+# ================================
+@event.listens_for(Session, "after_flush")
+def _recolher_alteracoes(session, contexto):
+    pendentes = session.info.setdefault("indice_produtos", {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Produto):
+            pendentes[obj.id] = dados_produto(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Produto):
+            pendentes[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_alteracoes(session):
+    for produto_id, dados in session.info.pop("indice_produtos", {}).items():
+        if dados is None:
+            indice_produtos.remover(produto_id)
+        else:
+            indice_produtos.gravar(dados)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_alteracoes(session, transacao):
+    session.info.pop("indice_produtos", None)
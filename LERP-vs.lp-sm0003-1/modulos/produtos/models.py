@@ -1,5 +1,10 @@
 from modulos.extensions import db
 from datetime import datetime
+from sqlalchemy.ext.hybrid import hybrid_property
+
+# Limite de alerta por omissão (cada produto pode ter o seu stock_minimo)
+LIMITE_ALERTA = 10
+
 
 class Produto(db.Model):
     __tablename__ = "produtos"
@@ -11,15 +16,76 @@ class Produto(db.Model):
     preco_unitario = db.Column(db.Float, nullable=False)
     preco_venda = db.Column(db.Float)
     stock = db.Column(db.Integer, nullable=False, default=0)
-    estado = db.Column(db.String(20), default="Normal")  # Normal ou Alerta
+    # Abaixo deste stock o produto passa a "Alerta"
+    stock_minimo = db.Column(db.Integer, nullable=False, default=LIMITE_ALERTA,
+                             server_default=str(LIMITE_ALERTA))
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
-   
-    def atualizar_estado(self):
-        """Atualiza automaticamente o estado do produto conforme o stock"""
-        if self.stock < 10:
-            self.estado = "Alerta"
-        else:
-            self.estado = "Normal"
+    # Incrementada a cada alteração de stock (ver produtos/stock.py)
+    versao = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Unidades que já entraram / saíram desde sempre (ver produtos/custos.py);
+    # stock = entradas_acumuladas - saidas_acumuladas
+    entradas_acumuladas = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    saidas_acumuladas = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # O estado não é gravado: deriva-se do stock, no Python e no SQL.
+    # (Bancos antigos ainda têm a coluna ``estado``; deixou de ser usada.)
+    @hybrid_property
+    def em_alerta(self):
+        minimo = LIMITE_ALERTA if self.stock_minimo is None else self.stock_minimo
+        return (self.stock or 0) < minimo
+
+    @em_alerta.inplace.expression
+    @classmethod
+    def _em_alerta(cls):
+        return cls.stock < cls.stock_minimo
+
+    @hybrid_property
+    def estado(self):
+        """"Alerta" ou "Normal", como a antiga coluna."""
+        return "Alerta" if self.em_alerta else "Normal"
+
+    @estado.inplace.expression
+    @classmethod
+    def _estado(cls):
+        return db.case((cls.stock < cls.stock_minimo, "Alerta"), else_="Normal")
+
+
+# Índice parcial: só os produtos em alerta, para as listas de alerta
+# (a consulta tem de filtrar por ``Produto.em_alerta`` para o usar)
+db.Index(
+    "ix_produtos_em_alerta", Produto.id,
+    sqlite_where=Produto.stock < Produto.stock_minimo,
+    postgresql_where=Produto.stock < Produto.stock_minimo,
+)
+
 
+# =========================================================
+# 📒 MOVIMENTOS DE STOCK (só acrescentados, nunca alterados)
+# =========================================================
+class MovimentoStock(db.Model):
+    __tablename__ = "movimentos_stock"
+
+    id = db.Column(db.Integer, primary_key=True)
+    produto_id = db.Column(db.Integer, nullable=False)
+    # Com sinal: positivo entra, negativo sai
+    quantidade = db.Column(db.Integer, nullable=False)
+    # "abertura", "compra", "venda", "ajuste" ou "acerto" (ver produtos/movimentos.py)
+    tipo = db.Column(db.String(20), nullable=False)
+    referencia = db.Column(db.String(50))
+    data = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+db.Index("ix_movimentos_stock_produto_data", MovimentoStock.produto_id, MovimentoStock.data)
+
+
+# Stock de cada produto que se movimentou, à meia-noite (Maputo) de cada dia
+class SnapshotStock(db.Model):
+    __tablename__ = "snapshots_stock"
+
+    id = db.Column(db.Integer, primary_key=True)
+    produto_id = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.DateTime, nullable=False, index=True)  # UTC
+    stock = db.Column(db.Integer, nullable=False)
 
 
+db.Index("ix_snapshots_stock_produto_data", SnapshotStock.produto_id, SnapshotStock.data, unique=True)
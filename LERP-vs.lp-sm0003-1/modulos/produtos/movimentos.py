@@ -0,0 +1,218 @@
+# modulos/produtos/movimentos.py
+"""Razão de stock: cada alteração de ``Produto.stock`` fica registada.
+
+``movimentos_stock`` só recebe linhas novas: abertura (stock inicial),
+compra, venda, ajuste e acerto (diferença encontrada pela conciliação),
+com a quantidade com sinal e a data em UTC. Escrevem-no, na mesma
+transação que altera o stock, ``movimentar_stock``, ``baixar_stock``, a
+importação de facturas e o cadastro/importação de produtos.
+
+Para saber o stock num instante sem somar o histórico todo, há
+snapshots diários (``snapshots_stock``): à meia-noite de Maputo de cada
+dia, o stock de cada produto que se movimentou na véspera. O stock em t
+é o do último snapshot até t mais os movimentos de [snapshot, t) — no
+máximo um dia de movimentos, lidos pelo índice (produto_id, data).
+
+``gerar_snapshots`` cria os que faltam (``flask produtos snapshots``,
+para o cron, e antes da conciliação). As consultas por data só lêem:
+sem os snapshots mais recentes, somam os movimentos desde o último que
+houver. Cada snapshot parte do anterior, por isso nunca se repete o
+histórico.
+``conciliar_stock`` compara o razão com ``Produto.stock`` em lotes de
+produtos e, se pedido, grava os acertos.
+"""
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+
+from modulos.extensions import db
+from modulos.periodos import dia_local, hoje_local, para_utc
+from .models import MovimentoStock, Produto, SnapshotStock
+
+TIPOS = ("abertura", "compra", "venda", "ajuste", "acerto")
+LOTE = 1000  # produtos por lote na conciliação e nos snapshots
+MARGEM = timedelta(minutes=5)  # espera após a meia-noite antes do snapshot
+
+
+def registrar_movimentos(movimentos, tipo, referencia=None, data=None):
+    """Acrescenta ao razão [(produto_id, quantidade com sinal)]. Não faz commit."""
+    data = data or datetime.utcnow()
+    linhas = [
+        {"produto_id": pid, "quantidade": int(q), "tipo": tipo, "referencia": referencia, "data": data}
+        for pid, q in movimentos if q
+    ]
+    if linhas:
+        db.session.execute(insert(MovimentoStock), linhas)
+
+
+def garantir_movimentos():
+    """Na primeira execução, abre o razão com o stock actual de cada produto.
+
+    Devolve o número de movimentos de abertura criados.
+    """
+    with db.engine.begin() as con:
+        if con.execute(select(MovimentoStock.id).limit(1)).first() is not None:
+            return 0
+        tabela = Produto.__table__
+        return con.execute(
+            insert(MovimentoStock.__table__).from_select(
+                ["produto_id", "quantidade", "tipo", "data"],
+                select(tabela.c.id, tabela.c.stock, literal("abertura"), literal(datetime.utcnow()))
+                .where(tabela.c.stock != 0),
+            )
+        ).rowcount
+
+
+# -------------------------------
+# 🔹 Snapshots diários
+# -------------------------------
+def meia_noite(dia):
+    """Meia-noite de Maputo do dia, em UTC (como ficam gravadas as datas)."""
+    return para_utc(datetime.combine(dia, time.min))
+
+
+def gerar_snapshots():
+    """Cria os snapshots das meias-noites ainda sem snapshot. Faz commit.
+
+    Cada meia-noite T parte do snapshot anterior de cada produto e soma
+    os movimentos do dia que acaba em T. Devolve o número de linhas.
+    """
+    hoje = hoje_local()
+    if datetime.utcnow() - meia_noite(hoje) < MARGEM:
+        hoje -= timedelta(days=1)  # transações da véspera ainda a fechar
+
+    ultimo = db.session.query(func.max(SnapshotStock.data)).scalar()
+    if ultimo is not None:
+        dia = dia_local(ultimo, utc=True) + timedelta(days=1)
+    else:
+        primeiro = db.session.query(func.min(MovimentoStock.data)).scalar()
+        if primeiro is None:
+            return 0
+        dia = dia_local(primeiro, utc=True) + timedelta(days=1)
+
+    criados = 0
+    while dia <= hoje:
+        fim = meia_noite(dia)
+        inicio = meia_noite(dia - timedelta(days=1))
+        try:
+            criados += _snapshot(inicio, fim)
+            db.session.commit()
+        except IntegrityError:
+            # Outro processo gerou o mesmo snapshot ao mesmo tempo
+            db.session.rollback()
+            return criados
+        dia += timedelta(days=1)
+    return criados
+
+
+def _snapshot(inicio, fim):
+    deltas = db.session.execute(
+        select(MovimentoStock.produto_id, func.sum(MovimentoStock.quantidade))
+        .where(MovimentoStock.data >= inicio, MovimentoStock.data < fim)
+        .group_by(MovimentoStock.produto_id)
+    ).all()
+
+    linhas = []
+    for i in range(0, len(deltas), LOTE):
+        parte = dict(deltas[i:i + LOTE])
+        anteriores = _ultimos_snapshots(inicio, list(parte))
+        linhas += [
+            {"produto_id": pid, "data": fim, "stock": anteriores.get(pid, 0) + delta}
+            for pid, delta in parte.items()
+        ]
+    if linhas:
+        db.session.execute(insert(SnapshotStock), linhas)
+    return len(linhas)
+
+
+def _ultimos_snapshots(ate, produtos=None):
+    """{produto_id: stock} do último snapshot de cada produto com data <= ``ate``.
+
+    Uma procura no índice (produto_id, data) por produto.
+    """
+    recente = (
+        select(SnapshotStock.stock)
+        .where(SnapshotStock.produto_id == Produto.id, SnapshotStock.data <= ate)
+        .order_by(SnapshotStock.data.desc())
+        .limit(1)
+        .correlate(Produto)
+        .scalar_subquery()
+    )
+    consulta = select(Produto.id, recente)
+    if produtos is not None:
+        consulta = consulta.where(Produto.id.in_(produtos))
+    return {pid: stock for pid, stock in db.session.execute(consulta) if stock is not None}
+
+
+# -------------------------------
+# 🔹 Stock num instante
+# -------------------------------
+def stock_em(instante=None, produtos=None):
+    """{produto_id: stock} depois dos movimentos anteriores a ``instante`` (UTC).
+
+    Sem ``instante``, conta todos os movimentos (stock actual segundo o
+    razão). ``produtos`` limita a uma lista de ids. Produtos sem
+    movimentos até ao instante não aparecem (stock 0).
+    """
+    ultimo = select(func.max(SnapshotStock.data))
+    if instante is not None:
+        ultimo = ultimo.where(SnapshotStock.data <= instante)
+    checkpoint = db.session.execute(ultimo).scalar()
+
+    stock = _ultimos_snapshots(checkpoint, produtos) if checkpoint is not None else {}
+
+    delta = select(MovimentoStock.produto_id, func.sum(MovimentoStock.quantidade))
+    if checkpoint is not None:
+        delta = delta.where(MovimentoStock.data >= checkpoint)
+    if instante is not None:
+        delta = delta.where(MovimentoStock.data < instante)
+    if produtos is not None:
+        delta = delta.where(MovimentoStock.produto_id.in_(produtos))
+    for pid, quantidade in db.session.execute(delta.group_by(MovimentoStock.produto_id)):
+        stock[pid] = stock.get(pid, 0) + quantidade
+    return stock
+
+
+def stock_no_fim_do_dia(dia, produtos=None):
+    """Stock à meia-noite que fecha ``dia`` (Maputo). Só lê o banco."""
+    return stock_em(meia_noite(dia + timedelta(days=1)), produtos)
+
+
+# -------------------------------
+# 🔹 Conciliação
+# -------------------------------
+def conciliar_stock(lote=LOTE, corrigir=False):
+    """Compara o razão com ``Produto.stock``, ``lote`` produtos de cada vez.
+
+    Devolve [(produto_id, codigo, stock, stock no razão)] das diferenças.
+    Com ``corrigir``, grava para cada uma um movimento "acerto" que põe o
+    razão igual ao stock. Cada lote é lido numa só transação (o stock e o
+    razão vêem o mesmo estado do banco).
+    """
+    gerar_snapshots()
+    diferencas = []
+    ultimo_id = 0
+    while True:
+        produtos = db.session.execute(
+            select(Produto.id, Produto.codigo, Produto.stock)
+            .where(Produto.id > ultimo_id)
+            .order_by(Produto.id)
+            .limit(lote)
+        ).all()
+        if not produtos:
+            break
+        ultimo_id = produtos[-1].id
+
+        razao = stock_em(produtos=[p.id for p in produtos])
+        lote_diferencas = [
+            (p.id, p.codigo, p.stock, razao.get(p.id, 0))
+            for p in produtos if p.stock != razao.get(p.id, 0)
+        ]
+        if corrigir and lote_diferencas:
+            registrar_movimentos(
+                [(pid, stock - no_razao) for pid, _c, stock, no_razao in lote_diferencas], "acerto"
+            )
+        db.session.commit()
+        diferencas += lote_diferencas
+    return diferencas
@@ -0,0 +1,134 @@
+# modulos/produtos/pesquisa.py
+"""Pesquisa de produtos com SQLite FTS5.
+
+A tabela virtual ``produtos_fts`` espelha ``produtos`` (nome, código,
+categoria) através de triggers e usa o tokenizador ``unicode61`` sem
+diacríticos, pelo que "acucar" encontra "Açúcar". Em bancos sem FTS5
+(ou que não sejam SQLite) as funções devolvem ``None`` e as rotas
+continuam a usar o ``ilike`` antigo.
+"""
+import re
+
+from flask import current_app
+from sqlalchemy import column, func, literal_column, select, table, text
+from sqlalchemy.exc import OperationalError
+
+from modulos.extensions import db
+from .models import Produto
+
+COLUNAS_FTS = ("nome", "codigo", "categoria")
+
+produtos_fts = table("produtos_fts", column("rowid"))
+_MATCH = literal_column("produtos_fts")
+
+_SQL_FTS = [
+    """CREATE VIRTUAL TABLE produtos_fts USING fts5(
+        nome, codigo, categoria,
+        content='produtos', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2"
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS produtos_fts_ai AFTER INSERT ON produtos BEGIN
+        INSERT INTO produtos_fts (rowid, nome, codigo, categoria)
+        VALUES (new.id, new.nome, new.codigo, new.categoria);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS produtos_fts_ad AFTER DELETE ON produtos BEGIN
+        INSERT INTO produtos_fts (produtos_fts, rowid, nome, codigo, categoria)
+        VALUES ('delete', old.id, old.nome, old.codigo, old.categoria);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS produtos_fts_au AFTER UPDATE OF nome, codigo, categoria ON produtos BEGIN
+        INSERT INTO produtos_fts (produtos_fts, rowid, nome, codigo, categoria)
+        VALUES ('delete', old.id, old.nome, old.codigo, old.categoria);
+        INSERT INTO produtos_fts (rowid, nome, codigo, categoria)
+        VALUES (new.id, new.nome, new.codigo, new.categoria);
+    END""",
+]
+
+
+# -------------------------------
+# 🔹 Criação da tabela e triggers
+# -------------------------------
+def garantir_fts():
+    """Cria produtos_fts e os triggers se o banco suportar FTS5.
+
+    Retorna True quando a pesquisa FTS fica disponível.
+    """
+    disponivel = False
+    if db.engine.dialect.name == "sqlite":
+        try:
+            with db.engine.begin() as con:
+                existe = con.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'produtos_fts'"
+                )).first()
+                if not existe:
+                    for sql in _SQL_FTS:
+                        con.execute(text(sql))
+                    con.execute(text("INSERT INTO produtos_fts (produtos_fts) VALUES ('rebuild')"))
+                else:
+                    for sql in _SQL_FTS[1:]:
+                        con.execute(text(sql))
+            disponivel = True
+        except OperationalError as e:
+            # "no such module: fts5" — SQLite compilado sem FTS5
+            print("Pesquisa FTS5 indisponível, a usar LIKE:", str(e))
+
+    current_app.extensions["produtos_fts"] = disponivel
+    return disponivel
+
+
+def fts_disponivel():
+    return current_app.extensions.get("produtos_fts", False)
+
+
+# -------------------------------
+# 🔹 Consultas
+# -------------------------------
+def consulta_fts(termo, coluna=None):
+    """Converte o texto do utilizador numa expressão MATCH segura.
+
+    Cada palavra vira um prefixo entre aspas ("arr"*), todas obrigatórias;
+    ``coluna`` restringe a pesquisa a nome, codigo ou categoria.
+    """
+    palavras = re.findall(r"\w+", termo or "")
+    if not palavras:
+        return None
+
+    expressao = " ".join(f'"{p}"*' for p in palavras)
+    if coluna in COLUNAS_FTS:
+        expressao = f"{coluna} : ({expressao})"
+    return expressao
+
+
+def filtro_produtos(termo, coluna=None):
+    """Condição ``Produto.id IN (ids do FTS)``, ou None para usar o caminho antigo."""
+    if not fts_disponivel():
+        return None
+    expressao = consulta_fts(termo, coluna)
+    if expressao is None:
+        return None
+    return Produto.id.in_(select(produtos_fts.c.rowid).where(_MATCH.op("MATCH")(expressao)))
+
+
+def codigos_produtos(termo, coluna=None):
+    """Subconsulta com os códigos dos produtos encontrados, ou None."""
+    condicao = filtro_produtos(termo, coluna)
+    if condicao is None:
+        return None
+    return select(Produto.codigo).where(condicao)
+
+
+def buscar_ranqueado(termo, limite=20):
+    """Produtos ordenados por relevância (bm25), ou None para usar o caminho antigo."""
+    if not fts_disponivel():
+        return None
+    expressao = consulta_fts(termo)
+    if expressao is None:
+        return []
+
+    return (
+        Produto.query
+        .join(produtos_fts, Produto.id == produtos_fts.c.rowid)
+        .filter(_MATCH.op("MATCH")(expressao))
+        .order_by(func.bm25(_MATCH))
+        .limit(limite)
+        .all()
+    )
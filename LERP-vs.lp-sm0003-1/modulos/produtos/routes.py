@@ -1,56 +1,31 @@
-from flask import render_template, request, redirect, url_for, flash, send_file
-from io import BytesIO
-import os
-import pandas as pd
-from reportlab.pdfgen import canvas
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, Image
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
-from datetime import datetime
+from flask import render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_babel import _
+from sqlalchemy import or_
 
 from . import produtos_bp
-from .models import Produto
+from .models import LIMITE_ALERTA, Produto
+from .indice import indice_produtos
+from .codigos import categoria_canonica, gerar_codigo
+from .custos import registrar_entradas
+from .movimentos import registrar_movimentos, stock_no_fim_do_dia
+from .importacao import ErroImportacao, importar_catalogo
+from .etiquetas import MAXIMO, MODELO_PADRAO, modelos_etiquetas, selecionar_etiquetas
+from .pesquisa import filtro_produtos
+from .stock import ConflitoVersao, StockInsuficiente, com_retentativas, movimentar_stock
 from modulos.extensions import db
-
-# Para gerar código de barras
-import barcode
-from barcode.writer import ImageWriter
-from reportlab.lib.utils import ImageReader
+from modulos.periodos import ler_dia
+from modulos.exportacao import Coluna, Documento
+from modulos.tarefas.utils import exportacao, pedir_exportacao
+from modulos.renderizacao import resposta_renderizada
+from modulos.renderizacao.documentos import barcode_pdf, etiquetas_pdf
 
 
 # ===========================================================
-# 🔹 GERADOR AUTOMÁTICO DE CÓDIGO
+# 🔹 LISTA DE PRODUTOS
 # ===========================================================
-def gerar_codigo(nome, categoria):
-    prefixos = {
-        "ferragem": "gf",
-        "loja": "gl",
-        "botle store": "gbs",
-        "mercearia": "gm",
-        "supermercado": "gs",
-        "farmacia": "gfm",
-        "restaurantes": "grs",
-        "bar": "gbr",
-        "acessorios": "gac",
-        "servicos": "gsv"
-    }
-
-    categoria_limpa = (categoria or "").strip().lower()
-    prefixo = prefixos.get(categoria_limpa, "gen")
+LIMITE_IDS = 1000  # acima disto o stock por dia é lido para todos os produtos
 
-    # Conta produtos da mesma categoria para gerar código sequencial
-    ultimo_num = Produto.query.filter(
-        Produto.categoria.ilike(categoria)
-    ).count() + 1
 
-    return f"{prefixo}{str(ultimo_num).zfill(3)}"
-
-
-# ===========================================================
-# 🔹 LISTA DE PRODUTOS
-# ===========================================================
 @produtos_bp.route("/produtos")
 def lista_produtos():
     filtro = request.args.get("filtro", "")
@@ -62,20 +37,44 @@ def lista_produtos():
         filtro_like = f"%{filtro}%"
         if campo == "codigo":
             query = query.filter(Produto.codigo.ilike(filtro_like))
-        elif campo == "categoria":
-            query = query.filter(Produto.categoria.ilike(filtro_like))
         else:
-            query = query.filter(Produto.nome.ilike(filtro_like))
+            coluna = Produto.categoria if campo == "categoria" else Produto.nome
+            condicao = coluna.ilike(filtro_like)
+            # O FTS junta o que o LIKE não apanha ("acucar" → "Açúcar")
+            condicao_fts = filtro_produtos(filtro, "categoria" if campo == "categoria" else "nome")
+            if condicao_fts is not None:
+                condicao = or_(condicao, condicao_fts)
+            query = query.filter(condicao)
+
+    # Só os produtos abaixo do stock mínimo (usa o índice parcial)
+    if request.args.get("alerta"):
+        query = query.filter(Produto.em_alerta)
 
     produtos = query.order_by(Produto.id.desc()).all()
 
-    # Atualizar estado automaticamente
-    for p in produtos:
-        p.atualizar_estado()
+    # Stock no fim de um dia passado (razão de stock + snapshots)
+    dia = ler_dia(request.args.get("dia"))
+    stock_dia = None
+    if dia:
+        ids = [p.id for p in produtos]
+        stock_dia = stock_no_fim_do_dia(dia, ids if len(ids) <= LIMITE_IDS else None)
+
+    return render_template("produtos/lista_produtos.html", produtos=produtos, dia=dia, stock_dia=stock_dia)
+
+
+
+# ===========================================================
+# 🔹 AUTOCOMPLETE (JSON, PAGINADO)
+# ===========================================================
+@produtos_bp.route("/produtos/api/buscar")
+def api_buscar_produtos():
+    termo = request.args.get("q", "")
+    pagina = max(request.args.get("pagina", 1, type=int), 1)
+    limite = min(max(request.args.get("limite", 20, type=int), 1), 100)
 
-    db.session.commit()
+    itens, tem_mais = indice_produtos.buscar(termo, pagina, limite)
 
-    return render_template("produtos/lista_produtos.html", produtos=produtos)
+    return jsonify({"itens": itens, "pagina": pagina, "tem_mais": tem_mais})
 
 
 
@@ -86,9 +85,10 @@ def lista_produtos():
 def novo_produto():
     if request.method == "POST":
         nome = request.form["nome"]
-        categoria = request.form["categoria"]
+        categoria = categoria_canonica(request.form["categoria"])
         preco = float(request.form["preco_unitario"])
         stock = int(request.form["stock"])
+        stock_minimo = request.form.get("stock_minimo", LIMITE_ALERTA, type=int)
 
         codigo = gerar_codigo(nome, categoria)
 
@@ -97,11 +97,15 @@ def novo_produto():
             nome=nome,
             categoria=categoria,
             preco_unitario=preco,
-            stock=stock
+            stock=stock,
+            stock_minimo=stock_minimo
         )
 
-        novo_produto.atualizar_estado()
         db.session.add(novo_produto)
+        db.session.flush()
+        # Stock inicial = primeira camada de custo
+        registrar_entradas([(novo_produto.id, stock, preco)], "abertura")
+        registrar_movimentos([(novo_produto.id, stock)], "abertura")
         db.session.commit()
 
         flash(_("Produto cadastrado com sucesso!"), "success")
@@ -112,99 +116,85 @@ def novo_produto():
 
 
 # ===========================================================
-# 🔹 EXPORTAR PARA EXCEL
+# 🔹 IMPORTAR CATÁLOGO (CSV / XLSX)
 # ===========================================================
-@produtos_bp.route("/produtos/exportar/excel")
-def exportar_excel():
-    produtos = Produto.query.all()
+ERROS_MOSTRADOS = 500
 
-    data = [{
-        _("Código"): p.codigo,
-        _("Produto"): p.nome,
-        _("Categoria"): p.categoria,
-        _("Preço Unitário"): p.preco_unitario,
-        _("Stock"): p.stock,
-        _("Estado"): p.estado
-    } for p in produtos]
 
-    df = pd.DataFrame(data)
-    buffer = BytesIO()
+@produtos_bp.route("/produtos/importar", methods=["GET", "POST"])
+def importar_produtos():
+    if request.method == "POST":
+        ficheiro = request.files.get("ficheiro")
+        if not ficheiro or not ficheiro.filename:
+            flash(_("Escolha um ficheiro CSV ou XLSX."), "danger")
+            return redirect(url_for("produtos.importar_produtos"))
+
+        try:
+            resultado = importar_catalogo(ficheiro.stream, ficheiro.filename)
+        except ErroImportacao as e:
+            flash(str(e), "danger")
+            return redirect(url_for("produtos.importar_produtos"))
 
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name=str(_("Produtos")))
+        flash(_("Importação concluída: %(novos)s novos, %(atualizados)s actualizados, %(erros)s com erro.",
+                novos=resultado.inseridos, atualizados=resultado.atualizados,
+                erros=len(resultado.erros)),
+              "warning" if resultado.erros else "success")
+        return render_template("produtos/importar.html", resultado=resultado,
+                               erros=resultado.erros[:ERROS_MOSTRADOS])
 
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name="produtos.xlsx")
+    return render_template("produtos/importar.html", resultado=None, erros=[])
 
 
 
 # ===========================================================
-# 🔹 EXPORTAR PARA PDF (TABELA COMPLETA)
+# 🔹 EXPORTAR PARA EXCEL
 # ===========================================================
-@produtos_bp.route("/produtos/exportar/pdf")
-def exportar_pdf():
-    produtos = Produto.query.all()
-    buffer = BytesIO()
-
-    pdf = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        topMargin=40,
-        bottomMargin=40,
-        leftMargin=40,
-        rightMargin=40,
-    )
+def colunas_excel():
+    return [
+        Coluna(_("Código"), "codigo"),
+        Coluna(_("Produto"), "nome", largura=30),
+        Coluna(_("Categoria"), "categoria"),
+        Coluna(_("Preço Unitário"), "preco_unitario", "dinheiro"),
+        Coluna(_("Stock"), "stock", "numero"),
+        Coluna(_("Estado"), "estado"),
+    ]
 
-    elementos = []
-    estilos = getSampleStyleSheet()
 
-    # Cabeçalho / Título
-    elementos.append(Paragraph("<b>LERP MANAGEMENT SYSTEM</b>", estilos["Title"]))
-    elementos.append(Spacer(1, 12))
+@exportacao("produtos.excel")
+def documento_excel(parametros):
+    produtos = Produto.query.order_by(Produto.id)
+    return Documento("excel", "produtos.xlsx", _("Produtos"), colunas_excel(), produtos)
 
-    data_emissao = datetime.now().strftime("%d/%m/%Y %H:%M")
-    elementos.append(Paragraph(f"<b>{_('Emitido em')}:</b> {data_emissao}", estilos["Normal"]))
-    elementos.append(Spacer(1, 12))
 
-    elementos.append(Paragraph(f"<b>{_('Lista de Produtos')}</b>", estilos["Heading2"]))
-    elementos.append(Spacer(1, 15))
-
-    tabela_dados = [[
-        _("Código"),
-        _("Nome"),
-        _("Categoria"),
-        _("Preço Unitário (MT)"),
-        _("Stock"),
-        _("Estado")
-    ]]
+@produtos_bp.route("/produtos/exportar/excel")
+def exportar_excel():
+    return pedir_exportacao("produtos.excel")
 
-    for p in produtos:
-        tabela_dados.append([
-            p.codigo,
-            p.nome,
-            p.categoria,
-            f"{p.preco_unitario:,.2f}",
-            str(p.stock),
-            p.estado
-        ])
 
-    tabela = Table(tabela_dados, colWidths=[60, 120, 90, 110, 50, 70])
 
-    tabela.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#0050A0")),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-        ("FONTSIZE", (0, 0), (-1, -1), 9),
-        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey]),
-    ]))
+# ===========================================================
+# 🔹 EXPORTAR PARA PDF (TABELA COMPLETA)
+# ===========================================================
+@exportacao("produtos.pdf")
+def documento_pdf(parametros):
+    produtos = Produto.query.order_by(Produto.id)
+    colunas = [
+        Coluna(_("Código"), "codigo", largura=10),
+        Coluna(_("Nome"), "nome", largura=24),
+        Coluna(_("Categoria"), "categoria"),
+        Coluna(_("Preço Unitário (MT)"), "preco_unitario", "dinheiro", largura=18),
+        Coluna(_("Stock"), "stock", "numero", largura=9),
+        Coluna(_("Estado"), "estado", largura=11),
+    ]
+    return Documento(
+        "pdf", "produtos.pdf", _("Lista de Produtos"), colunas, produtos,
+        subtitulo="LERP MANAGEMENT SYSTEM"
+    )
 
-    elementos.append(tabela)
-    pdf.build(elementos)
 
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name="produtos.pdf", mimetype="application/pdf")
+@produtos_bp.route("/produtos/exportar/pdf")
+def exportar_pdf():
+    return pedir_exportacao("produtos.pdf")
 
 
 
@@ -230,41 +220,91 @@ def deletar_produto(id):
 
 
 # ===========================================================
-# 🔹 GERAR BARCODE DO PRODUTO (PDF)
+# 🔹 AJUSTAR STOCK (INVENTÁRIO, QUEBRAS)
 # ===========================================================
-@produtos_bp.route("/produtos/barcode/<int:id>")
-def gerar_barcode(id):
+@produtos_bp.route("/produtos/ajustar_stock/<int:id>", methods=["POST"])
+def ajustar_stock(id):
     produto = Produto.query.get_or_404(id)
+    quantidade = request.form.get("quantidade", type=int)
+    if not quantidade:
+        flash(_("Indique a quantidade a ajustar (negativa para retirar)."), "danger")
+        return redirect(url_for("produtos.lista_produtos"))
 
-    codigo = produto.codigo
+    def gravar_ajuste():
+        stock, _custo = movimentar_stock(produto.id, quantidade)
+        db.session.commit()
+        return stock
 
-    # Gerar imagem do código de barras
-    buffer_img = BytesIO()
-    barcode_class = barcode.get_barcode_class("code128")
-    barcode_obj = barcode_class(codigo, writer=ImageWriter())
-    barcode_obj.write(buffer_img)
-    buffer_img.seek(0)
+    try:
+        stock = com_retentativas(gravar_ajuste)
+        flash(_("Stock de '%(nome)s' ajustado para %(stock)s.", nome=produto.nome, stock=stock), "success")
+    except StockInsuficiente:
+        flash(_("O ajuste deixaria o stock de '%(nome)s' negativo.", nome=produto.nome), "danger")
+    except ConflitoVersao:
+        flash(_("O stock está a ser alterado noutro posto. Tente novamente."), "warning")
+
+    return redirect(url_for("produtos.lista_produtos"))
 
-    # Criar PDF
-    pdf_buffer = BytesIO()
-    c = canvas.Canvas(pdf_buffer, pagesize=A4)
 
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(80, 800, f"{produto.nome} - {produto.codigo}")
 
-    barcode_image = ImageReader(buffer_img)
-    c.drawImage(barcode_image, 80, 680, width=300, height=100)
+# ===========================================================
+# 🔹 GERAR BARCODE DO PRODUTO (PDF)
+# ===========================================================
+@produtos_bp.route("/produtos/barcode/<int:id>")
+def gerar_barcode(id):
+    produto = Produto.query.get_or_404(id)
 
-    c.setFont("Helvetica", 11)
     link_url = url_for("produtos.lista_produtos", _external=True) + f"?codigo={produto.codigo}"
-    c.drawString(80, 660, _("Scaneie para abrir o produto: ") + link_url)
+    espec = {
+        "codigo": produto.codigo,
+        "titulo": f"{produto.nome} - {produto.codigo}",
+        "texto": _("Scaneie para abrir o produto: ") + link_url,
+    }
+    return resposta_renderizada(barcode_pdf, espec, f"barcode_{produto.codigo}.pdf")
 
-    c.showPage()
-    c.save()
 
-    pdf_buffer.seek(0)
-    return send_file(pdf_buffer,
-        as_attachment=True,
-        download_name=f"barcode_{produto.codigo}.pdf",
-        mimetype="application/pdf"
-    )
+
+# ===========================================================
+# 🔹 FOLHA DE ETIQUETAS (VÁRIOS PRODUTOS)
+# ===========================================================
+@produtos_bp.route("/produtos/etiquetas")
+def etiquetas():
+    modelos = modelos_etiquetas()
+    produtos = request.args.getlist("produto", type=int)
+    compras = request.args.getlist("compra", type=int)
+    categoria = request.args.get("categoria", "").strip()
+
+    if not (produtos or compras or categoria):
+        categorias = [c for (c,) in db.session.query(Produto.categoria).distinct().order_by(Produto.categoria)]
+        return render_template(
+            "produtos/etiquetas.html",
+            modelos=modelos,
+            modelo_padrao=current_app.config.get("ETIQUETAS_MODELO", MODELO_PADRAO),
+            categorias=categorias,
+        )
+
+    nome_modelo = request.args.get("modelo") or current_app.config.get("ETIQUETAS_MODELO", MODELO_PADRAO)
+    modelo = modelos.get(nome_modelo)
+    if modelo is None:
+        flash(_("Modelo de etiquetas desconhecido."), "danger")
+        return redirect(url_for("produtos.etiquetas"))
+    copias = min(max(request.args.get("copias", 1, type=int), 1), 100)
+    saltar = max(request.args.get("saltar", 0, type=int), 0)
+
+    lista = selecionar_etiquetas(produtos, categoria, compras, copias)
+    total = sum(n for *_dados, n in lista)
+    maximo = current_app.config.get("ETIQUETAS_MAXIMO", MAXIMO)
+    if not total:
+        flash(_("Nenhum produto para etiquetar."), "warning")
+        return redirect(url_for("produtos.etiquetas"))
+    if total > maximo:
+        flash(_("Demasiadas etiquetas (%(total)s); o máximo é %(maximo)s.", total=total, maximo=maximo), "danger")
+        return redirect(url_for("produtos.etiquetas"))
+
+    espec = {
+        "titulo": _("Etiquetas"),
+        "modelo": {k: v for k, v in modelo.items() if k != "nome"},
+        "saltar": saltar,
+        "etiquetas": lista,
+    }
+    return resposta_renderizada(etiquetas_pdf, espec, "etiquetas.pdf")
@@ -0,0 +1,143 @@
+# modulos/produtos/stock.py
+"""Alterações de stock seguras com vários postos de venda em simultâneo.
+
+Cada ``Produto`` tem uma coluna ``versao``. Quem precisa de ler antes de
+escrever (ex.: a média ponderada das compras) faz compare-and-swap:
+
+    UPDATE produtos SET stock = :novo, ..., versao = versao + 1
+    WHERE id = :id AND versao = :versao_lida
+
+Se outro posto alterou o produto entretanto, nenhuma linha é afectada e
+levanta-se ``ConflitoVersao``. ``com_retentativas`` desfaz a transação e
+repete a operação inteira com espera exponencial limitada — sem bloquear
+a tabela para os outros postos.
+
+As baixas em massa das vendas (vendas/finalizacao.py) não precisam de
+ler primeiro: usam ``stock = stock - qtd`` com a guarda ``stock >= qtd``
+e também incrementam ``versao``.
+"""
+import random
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+
+from modulos.extensions import db
+from .custos import consumir, registrar_entradas
+from .models import Produto
+from .movimentos import registrar_movimentos
+
+TENTATIVAS = 6
+ESPERA_BASE = 0.01  # segundos
+ESPERA_MAX = 0.25
+
+
+class ConflitoVersao(Exception):
+    """O produto foi alterado por outra transação entre a leitura e a escrita."""
+
+
+class StockInsuficiente(Exception):
+    """Uma ou mais linhas pedem mais do que o stock disponível."""
+
+    def __init__(self, produtos):
+        self.produtos = produtos  # [(nome, stock disponível, quantidade pedida)]
+        super().__init__(", ".join(nome for nome, _, _ in produtos))
+
+
+# -------------------------------
+# 🔹 Compare-and-swap
+# -------------------------------
+def ler_stock(produto_id):
+    """Lê stock, custo e versão directamente do banco (ignora a sessão)."""
+    return db.session.execute(
+        select(Produto.id, Produto.nome, Produto.stock, Produto.preco_unitario, Produto.versao)
+        .where(Produto.id == produto_id)
+    ).one()
+
+
+def trocar_stock(produto_id, versao, stock, preco_unitario=None):
+    """Grava o novo stock só se a versão no banco ainda for ``versao``."""
+    valores = {
+        "stock": stock,
+        "versao": Produto.versao + 1,
+    }
+    if preco_unitario is not None:
+        valores["preco_unitario"] = preco_unitario
+
+    resultado = db.session.execute(
+        update(Produto)
+        .where(Produto.id == produto_id, Produto.versao == versao)
+        .values(**valores)
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount != 1:
+        raise ConflitoVersao(produto_id)
+
+
+def movimentar_stock(produto_id, quantidade, custo=None):
+    """Soma ``quantidade`` (negativa para saídas) ao stock do produto.
+
+    Com ``custo``, recalcula o preço unitário pela média ponderada, como
+    nas compras. Entradas criam uma camada de custo (ao ``custo`` ou, sem
+    ele, ao custo médio actual); saídas consomem camadas (produtos/custos.py).
+    O movimento fica no razão de stock (produtos/movimentos.py).
+    Não faz commit; deve correr dentro de ``com_retentativas``.
+    Devolve (stock, preco_unitario) gravados.
+    """
+    atual = ler_stock(produto_id)
+    stock = atual.stock + quantidade
+    if stock < 0:
+        raise StockInsuficiente([(atual.nome, atual.stock, -quantidade)])
+
+    preco_unitario = None
+    if custo is not None:
+        if stock > 0:
+            preco_unitario = round(
+                ((atual.preco_unitario or 0) * atual.stock + custo * quantidade) / stock, 2
+            )
+        else:
+            preco_unitario = custo
+
+    trocar_stock(produto_id, atual.versao, stock, preco_unitario)
+    registrar_movimentos([(produto_id, quantidade)], "compra" if custo is not None else "ajuste")
+    if quantidade > 0:
+        registrar_entradas(
+            [(produto_id, quantidade, custo if custo is not None else atual.preco_unitario)],
+            "compra" if custo is not None else "ajuste",
+        )
+    elif quantidade < 0:
+        consumir({produto_id: -quantidade})
+    return stock, preco_unitario if preco_unitario is not None else atual.preco_unitario
+
+
+# -------------------------------
+# 🔹 Retentativas
+# -------------------------------
+def _bloqueado(erro):
+    """SQLite devolve "database is locked" quando duas escritas se cruzam."""
+    mensagem = str(erro.orig).lower()
+    return "locked" in mensagem or "busy" in mensagem
+
+
+def com_retentativas(operacao, tentativas=TENTATIVAS):
+    """Executa ``operacao()`` (que faz o seu próprio commit) repetindo-a em conflito.
+
+    Entre tentativas a sessão é desfeita e espera-se ESPERA_BASE * 2^n
+    (com jitter, até ESPERA_MAX). Esgotadas as tentativas levanta
+    ConflitoVersao.
+    """
+    for tentativa in range(tentativas):
+        try:
+            return operacao()
+        except ConflitoVersao:
+            db.session.rollback()
+        except OperationalError as e:
+            db.session.rollback()
+            if not _bloqueado(e):
+                raise
+
+        if tentativa < tentativas - 1:
+            espera = min(ESPERA_MAX, ESPERA_BASE * 2 ** tentativa)
+            time.sleep(espera * random.uniform(0.5, 1.0))
+
+    raise ConflitoVersao("tentativas esgotadas")
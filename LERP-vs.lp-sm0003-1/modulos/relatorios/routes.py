@@ -1,11 +1,11 @@
 from flask import render_template
 from flask_babel import gettext as _
 from modulos.produtos.models import Produto
-from modulos.vendas.models import Venda
+from modulos.vendas.models import Venda, VendaItem
 from modulos.compras.models import Compra
-from modulos.caixa.models import Caixa
-from modulos.pagamentos.models import Pagamento
 from modulos.extensions import db
+from modulos.resumo.utils import totais_resumo
+from modulos.produtos.custos import metodo_custeio, valor_stock
 from sqlalchemy import func
 from . import relatorios_bp
 
@@ -41,16 +41,17 @@ def dashboard():
     # --- Stock remanescente ---
     produtos = Produto.query.all()
 
-    # --- Entradas e saídas ---
-    total_entradas = db.session.query(func.sum(Pagamento.valor)).scalar() or 0.0
-    total_saidas = (
-        db.session.query(func.sum(Caixa.valor))
-        .filter(Caixa.tipo == "saida")
-        .scalar()
-        or 0.0
-    )
+    # --- Entradas e saídas (resumo diário) ---
+    total_entradas = totais_resumo("pagamentos")["entradas"]
+    total_saidas = totais_resumo("caixa")["saidas"]
     saldo = total_entradas - total_saidas
 
+    # --- Valor do stock e margem real (custo das unidades vendidas) ---
+    vendido, custo_vendido = db.session.query(
+        func.coalesce(func.sum(VendaItem.valor_total), 0.0),
+        func.coalesce(func.sum(VendaItem.custo_total), 0.0),
+    ).filter(VendaItem.custo_total.isnot(None)).one()
+
     return render_template(
         "relatorios/dashboard.html",
         top_vendidos=top_vendidos,
@@ -59,6 +60,11 @@ def dashboard():
         total_entradas=total_entradas,
         total_saidas=total_saidas,
         saldo=saldo,
+        valor_stock_fifo=valor_stock("fifo"),
+        valor_stock_media=valor_stock("media"),
+        metodo_custeio=metodo_custeio(),
+        margem_real=vendido - custo_vendido,
+        custo_vendido=custo_vendido,
         titulo_pagina=_("Relatórios e Estatísticas"),
         titulo_top_vendidos=_("Top 5 Produtos Mais Vendidos"),
         titulo_top_comprados=_("Top 5 Produtos Mais Comprados"),
@@ -0,0 +1,2 @@
+# Renderização de documentos (PDF, códigos de barras) em processos separados
+from .servico import executor_renderizacao, renderizar, resposta_renderizada
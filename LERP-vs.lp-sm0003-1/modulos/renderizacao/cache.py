@@ -0,0 +1,120 @@
+# modulos/renderizacao/cache.py
+"""Cache em disco dos documentos renderizados.
+
+A chave é o sha256 da função de desenho, da sua versão (``VERSOES`` em
+documentos.py) e da especificação completa. Como a especificação traz
+todos os campos impressos, qualquer alteração na linha de origem (ou no
+modelo do documento) dá outra chave: a entrada antiga deixa de ser
+pedida e sai pela limpeza LRU. Não há invalidação explícita.
+
+Os ficheiros ficam em ``RENDERIZACAO_CACHE_PASTA`` (padrão:
+instance/renderizacao). Cada acerto renova o mtime do ficheiro; quando a
+pasta passa de ``RENDERIZACAO_CACHE_MB``, apagam-se os ficheiros menos
+usados até ficar em 90% do limite. ``RENDERIZACAO_CACHE_MB = 0`` desliga
+a cache.
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from flask import current_app
+
+LIMITE_MB = 100
+FOLGA = 0.9  # a limpeza deixa a pasta em 90% do limite
+
+_lock = threading.Lock()
+
+
+def chave_documento(funcao, espec, versao=1):
+    bruto = json.dumps(
+        [funcao.__module__, funcao.__qualname__, versao, espec],
+        sort_keys=True, default=str, ensure_ascii=False,
+    )
+    return hashlib.sha256(bruto.encode()).hexdigest()
+
+
+def _estado():
+    """Pasta, limite e tamanho ocupado (estimado) desta aplicação."""
+    app = current_app._get_current_object()
+    with _lock:
+        estado = app.extensions.get("renderizacao_cache")
+        if estado is None:
+            pasta = app.config.get("RENDERIZACAO_CACHE_PASTA") or os.path.join(
+                app.instance_path, "renderizacao"
+            )
+            limite = app.config.get("RENDERIZACAO_CACHE_MB", LIMITE_MB) * 1024 * 1024
+            if limite:
+                os.makedirs(pasta, exist_ok=True)
+            estado = app.extensions["renderizacao_cache"] = {
+                "pasta": pasta,
+                "limite": limite,
+                "ocupado": _ocupado(pasta) if limite else 0,
+            }
+    return estado
+
+
+def _ocupado(pasta):
+    return sum(e.stat().st_size for e in os.scandir(pasta) if e.is_file())
+
+
+def cache_ativa():
+    return bool(_estado()["limite"])
+
+
+def caminho_em_cache(chave):
+    """Caminho do documento se já estiver em cache (e marca-o como usado)."""
+    caminho = os.path.join(_estado()["pasta"], chave + ".bin")
+    try:
+        os.utime(caminho)
+    except FileNotFoundError:
+        return None
+    return caminho
+
+
+def guardar(chave, conteudo):
+    """Grava o documento e devolve o caminho; apaga os menos usados se preciso."""
+    estado = _estado()
+    caminho = os.path.join(estado["pasta"], chave + ".bin")
+    temporario = f"{caminho}.{uuid.uuid4().hex}.parcial"
+    with open(temporario, "wb") as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
+
+    with _lock:
+        estado["ocupado"] += len(conteudo)
+        cheia = estado["ocupado"] > estado["limite"]
+    if cheia:
+        limpar(estado)
+    return caminho
+
+
+def limpar(estado=None):
+    """Apaga os ficheiros com mtime mais antigo até caber em 90% do limite.
+
+    Recalcula o tamanho real da pasta: outros processos também lá escrevem.
+    Devolve quantos ficheiros foram apagados.
+    """
+    estado = estado or _estado()
+    with _lock:
+        entradas = sorted(
+            (e for e in os.scandir(estado["pasta"])
+             if e.is_file() and not e.name.endswith(".parcial")),
+            key=lambda e: e.stat().st_mtime,
+        )
+        ocupado = sum(e.stat().st_size for e in entradas)
+        alvo = estado["limite"] * FOLGA
+        apagados = 0
+        for entrada in entradas:
+            if ocupado <= alvo:
+                break
+            try:
+                tamanho = entrada.stat().st_size
+                os.remove(entrada.path)
+            except FileNotFoundError:
+                continue
+            ocupado -= tamanho
+            apagados += 1
+        estado["ocupado"] = ocupado
+    return apagados
@@ -0,0 +1,235 @@
+# modulos/renderizacao/documentos.py
+"""Documentos avulsos desenhados no pool de renderização.
+
+Cada função recebe um dict simples, montado pela rota (textos já
+traduzidos), e devolve os bytes do PDF. Não usam o Flask nem os
+modelos: correm num processo do pool, sem contexto de aplicação.
+
+Ao mudar o desenho de um documento, suba a sua versão em ``VERSOES``:
+os PDFs já guardados na cache (cache.py) deixam de ser servidos.
+"""
+from io import BytesIO
+
+from reportlab import rl_config
+from reportlab.graphics.barcode.code128 import Code128
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+# Streams só com Flate: sem o acelerador C, o ASCII85 do reportlab é Python
+# puro e custava tanto como o desenho das folhas de etiquetas
+rl_config.useA85 = 0
+
+
+# -------------------------------
+# 🔹 Recibo de pagamento (talão 80 mm)
+# -------------------------------
+def recibo_pdf(espec):
+    """``espec``: empresa (4 linhas), titulo, linhas ["Rótulo: valor"], rodape (3 linhas)."""
+    buffer = BytesIO()
+    largura, altura = 80*mm, 200*mm
+    pdf = canvas.Canvas(buffer, pagesize=(largura, altura))
+
+    nome, nuit, morada, telefone = espec["empresa"]
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawCentredString(largura/2, altura-10*mm, nome)
+    pdf.setFont("Helvetica", 9)
+    pdf.drawCentredString(largura/2, altura-15*mm, nuit)
+    pdf.drawCentredString(largura/2, altura-20*mm, morada)
+    pdf.drawCentredString(largura/2, altura-25*mm, telefone)
+    pdf.line(5*mm, altura-28*mm, largura-5*mm, altura-28*mm)
+
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawCentredString(largura/2, altura-35*mm, espec["titulo"])
+
+    y = altura - 50*mm
+    pdf.setFont("Helvetica", 9)
+    for linha in espec["linhas"]:
+        pdf.drawString(5*mm, y, linha)
+        y -= 6*mm
+
+    pdf.line(5*mm, 25*mm, largura-5*mm, 25*mm)
+    pdf.setFont("Helvetica-Oblique", 8)
+    for y, linha in zip((18*mm, 12*mm, 6*mm), espec["rodape"]):
+        pdf.drawCentredString(largura/2, y, linha)
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+# -------------------------------
+# 🔹 Cotação
+# -------------------------------
+def cotacao_pdf(espec):
+    """``espec``: titulo, cabecalho (linhas), itens (linhas de texto), total."""
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    y = 800
+
+    pdf.setFont("Helvetica-Bold", 14)
+    pdf.drawString(50, y, espec["titulo"])
+    y -= 30
+
+    pdf.setFont("Helvetica", 11)
+    for linha in espec["cabecalho"]:
+        pdf.drawString(50, y, linha)
+        y -= 20
+    y -= 10
+
+    for linha in espec["itens"]:
+        # Cotações longas continuam na página seguinte
+        if y < 60:
+            pdf.showPage()
+            pdf.setFont("Helvetica", 11)
+            y = 800
+        pdf.drawString(50, y, linha)
+        y -= 15
+
+    y -= 20
+    if y < 40:
+        pdf.showPage()
+        y = 800
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawString(50, y, espec["total"])
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+# -------------------------------
+# 🔹 Código de barras de um produto
+# -------------------------------
+def barcode_pdf(espec):
+    """``espec``: codigo, titulo, texto (linha por baixo do código)."""
+    import barcode
+    from barcode.writer import ImageWriter
+
+    buffer_img = BytesIO()
+    barcode_class = barcode.get_barcode_class("code128")
+    barcode_class(espec["codigo"], writer=ImageWriter()).write(buffer_img)
+    buffer_img.seek(0)
+
+    pdf_buffer = BytesIO()
+    c = canvas.Canvas(pdf_buffer, pagesize=A4)
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(80, 800, espec["titulo"])
+    c.drawImage(ImageReader(buffer_img), 80, 680, width=300, height=100)
+
+    c.setFont("Helvetica", 11)
+    c.drawString(80, 660, espec["texto"])
+
+    c.showPage()
+    c.save()
+    return pdf_buffer.getvalue()
+
+
+# -------------------------------
+# 🔹 Folhas de etiquetas (códigos de barras vectoriais)
+# -------------------------------
+def _cortar_texto(texto, fonte, tamanho, largura):
+    if stringWidth(texto, fonte, tamanho) <= largura:
+        return texto
+    while texto and stringWidth(texto + "…", fonte, tamanho) > largura:
+        texto = texto[:-1]
+    return texto + "…"
+
+
+def _barras_code128(codigo):
+    """Barras do Code128 de ``codigo``: [(início, largura)] em módulos, e o total."""
+    barras = Code128(codigo, quiet=False)
+    barras.validate()
+    barras.encode()
+    barras.decompose()
+    posicao, lista = 0, []
+    for c in barras.decomposed:
+        # Maiúsculas são barras, minúsculas espaços; a letra dá a largura
+        if c.isupper():
+            lista.append((posicao, ord(c) - ord("A") + 1))
+            posicao += ord(c) - ord("A") + 1
+        else:
+            posicao += ord(c) - ord("a") + 1
+    return lista, posicao
+
+
+def _desenhar_etiqueta(pdf, largura, altura, nome, codigo, preco):
+    """Uma etiqueta em (0, 0): nome em cima, Code128 ao centro, código e preço em baixo."""
+    folga = 2*mm
+    util = largura - 2*folga
+    texto = max(5.0, min(8.0, altura / mm * 0.28))
+
+    pdf.setFont("Helvetica-Bold", texto)
+    pdf.drawString(folga, altura - folga - texto, _cortar_texto(nome, "Helvetica-Bold", texto, util))
+
+    # Um só caminho com todas as barras (operadores "re" + "f"), em vez de
+    # um rect() do reportlab por barra
+    barras, modulos = _barras_code128(codigo)
+    modulo = min(0.33*mm, util / modulos)
+    x0 = folga + (util - modulo*modulos) / 2
+    y0 = folga + texto + 1
+    alto = altura - 2*folga - 2*texto - 3
+    pdf.addLiteral(" ".join(
+        f"{x0 + inicio*modulo:.3f} {y0:.2f} {n*modulo:.3f} {alto:.2f} re" for inicio, n in barras
+    ) + " f")
+
+    pdf.setFont("Helvetica", texto)
+    pdf.drawString(folga, folga, codigo)
+    if preco:
+        pdf.setFont("Helvetica-Bold", texto)
+        pdf.drawRightString(largura - folga, folga, preco)
+
+
+def etiquetas_pdf(espec):
+    """``espec``: modelo (geometria em mm), saltar, etiquetas [[nome, codigo, preco, copias]].
+
+    Cada produto é desenhado uma vez como Form XObject e repetido com
+    ``doForm`` em todas as cópias: o PDF cresce pouco com o número de
+    etiquetas e o código de barras fica em vectores, sem imagens.
+    """
+    modelo = espec["modelo"]
+    largura, altura = modelo["largura"]*mm, modelo["altura"]*mm
+    colunas, linhas = modelo["colunas"], modelo["linhas"]
+    esquerda, topo = modelo["margem_esquerda"]*mm, modelo["margem_topo"]*mm
+    passo_x = largura + modelo.get("espaco_h", 0)*mm
+    passo_y = altura + modelo.get("espaco_v", 0)*mm
+    por_folha = colunas * linhas
+    _largura_folha, altura_folha = A4
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setTitle(espec.get("titulo", ""))
+
+    posicao = espec.get("saltar", 0) % por_folha
+    for n, (nome, codigo, preco, copias) in enumerate(espec["etiquetas"]):
+        forma = f"e{n}"
+        pdf.beginForm(forma, lowerx=0, lowery=0, upperx=largura, uppery=altura)
+        _desenhar_etiqueta(pdf, largura, altura, nome, codigo, preco)
+        pdf.endForm()
+
+        for _ in range(copias):
+            if posicao == por_folha:
+                pdf.showPage()
+                posicao = 0
+            linha, coluna = divmod(posicao, colunas)
+            pdf.saveState()
+            pdf.translate(esquerda + coluna*passo_x, altura_folha - topo - (linha + 1)*passo_y + (passo_y - altura))
+            pdf.doForm(forma)
+            pdf.restoreState()
+            posicao += 1
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+# Versão do modelo de cada documento (entra na chave da cache)
+VERSOES = {
+    recibo_pdf: 1,
+    cotacao_pdf: 1,
+    barcode_pdf: 1,
+    etiquetas_pdf: 1,
+}
@@ -0,0 +1,93 @@
+# modulos/renderizacao/servico.py
+"""Pool de processos para desenhar documentos fora do processo web.
+
+Gerar PDFs com o reportlab e códigos de barras com o python-barcode/PIL
+é Python puro: numa thread do servidor segura o GIL e atrasa todos os
+outros pedidos. Aqui esse trabalho corre num ProcessPoolExecutor com
+``RENDERIZACAO_PROCESSOS`` processos (por omissão, um por núcleo), com
+prioridade baixa (``RENDERIZACAO_NICE``) para o sistema dar a vez aos
+pedidos interactivos.
+
+As funções enviadas recebem só especificações simples (dicts, listas,
+texto, números, datas) — nunca objectos ORM — e devolvem bytes. Os
+textos vêm já traduzidos: os processos do pool não têm contexto Flask.
+
+Com ``RENDERIZACAO_PROCESSOS = 0`` tudo corre no próprio processo.
+
+Os documentos avulsos ficam numa cache em disco (cache.py): um reenvio
+do mesmo recibo sai do ficheiro, e o browser recebe um ETag para pedir
+só a confirmação (304).
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import multiprocessing
+
+from flask import current_app, send_file
+
+from .cache import caminho_em_cache, cache_ativa, chave_documento, guardar
+from .documentos import VERSOES
+
+NICE = 10
+TEMPO_MAXIMO = 120  # segundos à espera de um documento
+
+_lock = threading.Lock()
+
+
+def _iniciar_processo(nice):
+    if nice:
+        try:
+            os.nice(nice)
+        except OSError:
+            pass
+
+
+def executor_renderizacao():
+    """ProcessPoolExecutor desta aplicação, ou None se estiver desligado."""
+    app = current_app._get_current_object()
+    with _lock:
+        if "renderizacao" not in app.extensions:
+            processos = app.config.get("RENDERIZACAO_PROCESSOS")
+            if processos is None:
+                processos = os.cpu_count() or 1
+            executor = None
+            if processos > 0:
+                # "spawn": o servidor tem threads e não é seguro fazer fork com elas
+                executor = ProcessPoolExecutor(
+                    max_workers=processos,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_iniciar_processo,
+                    initargs=(app.config.get("RENDERIZACAO_NICE", NICE),),
+                )
+            app.extensions["renderizacao"] = executor
+        return app.extensions["renderizacao"]
+
+
+def renderizar(funcao, *args):
+    """Executa ``funcao(*args)`` no pool e devolve o resultado (bytes)."""
+    executor = executor_renderizacao()
+    if executor is None:
+        return funcao(*args)
+    tempo = current_app.config.get("RENDERIZACAO_TEMPO_MAXIMO", TEMPO_MAXIMO)
+    return executor.submit(funcao, *args).result(timeout=tempo)
+
+
+def resposta_renderizada(funcao, espec, nome_ficheiro, mimetype="application/pdf"):
+    """Devolve o download de ``funcao(espec)``, da cache ou renderizado no pool.
+
+    O ETag é a chave da cache; com ``If-None-Match`` igual a resposta é 304.
+    """
+    chave = chave_documento(funcao, espec, VERSOES.get(funcao, 1))
+    if cache_ativa():
+        ficheiro = caminho_em_cache(chave) or guardar(chave, renderizar(funcao, espec))
+    else:
+        ficheiro = BytesIO(renderizar(funcao, espec))
+    return send_file(
+        ficheiro,
+        as_attachment=True,
+        download_name=nome_ficheiro,
+        mimetype=mimetype,
+        etag=chave,
+        conditional=True,
+    )
@@ -0,0 +1,6 @@
+from flask import Blueprint
+
+# Sem rotas: o blueprint existe para expor os comandos "flask resumo ..."
+resumo_bp = Blueprint("resumo", __name__, cli_group="resumo")
+
+from . import comandos
@@ -0,0 +1,15 @@
+import click
+
+from . import resumo_bp
+from .utils import reconstruir_resumo
+
+
+# -------------------------------
+# 🔹 flask resumo reconstruir
+# -------------------------------
+@resumo_bp.cli.command("reconstruir")
+@click.option("--lote", default=1000, show_default=True, help="Linhas lidas/gravadas por lote.")
+def reconstruir(lote):
+    """Recalcula a tabela resumo_diario a partir do histórico."""
+    total = reconstruir_resumo(lote=lote)
+    click.echo(f"✔ Resumo diário reconstruído: {total} linhas.")
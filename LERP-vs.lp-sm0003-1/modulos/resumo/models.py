@@ -0,0 +1,31 @@
+from modulos.extensions import db
+from datetime import datetime
+
+# ================================
+# 📊 Resumo Diário (tabela de factos)
+# ================================
+class ResumoDiario(db.Model):
+    """Uma linha por dia e módulo com os totais já agregados.
+
+    Os dashboards lêem desta tabela com uma única consulta por intervalo
+    em vez de somar vendas, compras e pagamentos dia a dia.
+    """
+    __tablename__ = "resumo_diario"
+    __table_args__ = (
+        db.UniqueConstraint("dia", "modulo", name="uq_resumo_diario_dia_modulo"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    dia = db.Column(db.Date, nullable=False, index=True)
+    modulo = db.Column(db.String(20), nullable=False)  # vendas, compras, pagamentos, caixa
+
+    vendas = db.Column(db.Float, nullable=False, default=0.0)
+    lucro = db.Column(db.Float, nullable=False, default=0.0)
+    compras = db.Column(db.Float, nullable=False, default=0.0)
+    entradas = db.Column(db.Float, nullable=False, default=0.0)
+    saidas = db.Column(db.Float, nullable=False, default=0.0)
+
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ResumoDiario {self.dia} {self.modulo}>"
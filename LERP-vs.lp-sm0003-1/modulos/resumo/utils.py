@@ -0,0 +1,145 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func
+
+from modulos.extensions import db
+from modulos.periodos import dia_local, hoje_local
+from .models import ResumoDiario
+
+# Colunas acumuláveis do resumo
+CAMPOS = ("vendas", "lucro", "compras", "entradas", "saidas")
+
+# Módulos cujas datas são gravadas em UTC (as vendas usam a hora local)
+MODULOS_UTC = {"compras", "pagamentos", "caixa"}
+
+
+def dia_do_registo(modulo, data):
+    """Dia de Maputo a que pertence um registo do módulo com a data indicada."""
+    if data is None:
+        return hoje_local()
+    return dia_local(data, utc=modulo in MODULOS_UTC)
+
+
+# -------------------------------
+# 🔹 Atualização incremental
+# -------------------------------
+def registrar_no_resumo(modulo, data=None, **valores):
+    """Soma os valores à linha (dia, módulo) na transação corrente.
+
+    Não faz commit: deve ser chamada antes do commit da operação que
+    originou o movimento, para que ambos fiquem na mesma transação.
+    """
+    linha = {campo: float(valores.get(campo) or 0) for campo in CAMPOS}
+    dia = dia_do_registo(modulo, data)
+
+    dialeto = db.session.get_bind().dialect.name
+    if dialeto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialeto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        insert = None
+
+    if insert is not None:
+        tabela = ResumoDiario.__table__
+        stmt = insert(tabela).values(
+            dia=dia, modulo=modulo, atualizado_em=datetime.utcnow(), **linha
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["dia", "modulo"],
+            set_={
+                **{campo: tabela.c[campo] + stmt.excluded[campo] for campo in CAMPOS},
+                "atualizado_em": stmt.excluded.atualizado_em,
+            },
+        )
+        db.session.execute(stmt)
+        return
+
+    # Outros bancos: leitura + escrita dentro da mesma transação
+    resumo = ResumoDiario.query.filter_by(dia=dia, modulo=modulo).with_for_update().first()
+    if resumo is None:
+        resumo = ResumoDiario(dia=dia, modulo=modulo, **linha)
+        db.session.add(resumo)
+    else:
+        for campo in CAMPOS:
+            setattr(resumo, campo, (getattr(resumo, campo) or 0) + linha[campo])
+
+
+# -------------------------------
+# 🔹 Leitura
+# -------------------------------
+def serie_diaria(modulo, inicio, fim):
+    """Devolve {dia: ResumoDiario} para os dias em [inicio, fim]."""
+    linhas = ResumoDiario.query.filter(
+        ResumoDiario.modulo == modulo,
+        ResumoDiario.dia >= inicio,
+        ResumoDiario.dia <= fim,
+    ).all()
+    return {r.dia: r for r in linhas}
+
+
+def totais_resumo(modulo, inicio=None, fim=None):
+    """Soma as colunas do resumo de um módulo (opcionalmente num intervalo de dias)."""
+    query = db.session.query(
+        *[func.coalesce(func.sum(getattr(ResumoDiario, campo)), 0.0).label(campo) for campo in CAMPOS]
+    ).filter(ResumoDiario.modulo == modulo)
+
+    if inicio is not None:
+        query = query.filter(ResumoDiario.dia >= inicio)
+    if fim is not None:
+        query = query.filter(ResumoDiario.dia <= fim)
+
+    return query.one()._asdict()
+
+
+# -------------------------------
+# 🔹 Reconstrução a partir do histórico
+# -------------------------------
+def reconstruir_resumo(lote=1000):
+    """Apaga e recalcula todo o resumo a partir das tabelas de origem.
+
+    Retorna o número de linhas (dia, módulo) gravadas.
+    """
+    # Imports locais: os módulos de origem importam este ficheiro nas rotas
+    from modulos.vendas.models import Venda
+    from modulos.compras.models import Compra
+    from modulos.pagamentos.models import Pagamento
+    from modulos.caixa.models import Caixa
+
+    acumulado = defaultdict(lambda: dict.fromkeys(CAMPOS, 0.0))
+
+    def somar(modulo, consulta, *campos):
+        for data, *valores in consulta.yield_per(lote):
+            linha = acumulado[(dia_do_registo(modulo, data), modulo)]
+            for campo, valor in zip(campos, valores):
+                linha[campo] += float(valor or 0)
+
+    somar("vendas",
+          db.session.query(Venda.data_venda, Venda.total_valor, Venda.total_lucro),
+          "vendas", "lucro")
+    somar("compras",
+          db.session.query(Compra.data_compra, Compra.valor_total, Compra.lucro_total),
+          "compras", "lucro")
+    somar("pagamentos",
+          db.session.query(Pagamento.data_pagamento, Pagamento.valor),
+          "entradas")
+    somar("caixa",
+          db.session.query(Caixa.data, Caixa.valor).filter(Caixa.tipo == "entrada"),
+          "entradas")
+    somar("caixa",
+          db.session.query(Caixa.data, Caixa.valor).filter(Caixa.tipo == "saida"),
+          "saidas")
+
+    agora = datetime.utcnow()
+    linhas = [
+        {"dia": dia, "modulo": modulo, "atualizado_em": agora, **valores}
+        for (dia, modulo), valores in acumulado.items()
+    ]
+
+    ResumoDiario.query.delete()
+    for i in range(0, len(linhas), lote):
+        db.session.execute(ResumoDiario.__table__.insert(), linhas[i:i + lote])
+    db.session.commit()
+
+    return len(linhas)
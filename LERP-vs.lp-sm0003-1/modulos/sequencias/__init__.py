@@ -0,0 +1 @@
+# Numeração de documentos (vendas, pagamentos, códigos de produto)
@@ -0,0 +1,18 @@
+from datetime import datetime
+from modulos.extensions import db
+
+
+# ================================
+# 🔢 Sequência de numeração
+# ================================
+class Sequencia(db.Model):
+    __tablename__ = "sequencias"
+
+    # Ex.: "vendas:V", "pagamentos:pgag", "produtos:gm"
+    nome = db.Column(db.String(60), primary_key=True)
+    # Primeiro número ainda não reservado por nenhum processo
+    proximo = db.Column(db.Integer, nullable=False, default=1)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Sequencia {self.nome} → {self.proximo}>"
@@ -0,0 +1,161 @@
+# modulos/sequencias/utils.py
+"""Números de documento únicos entre processos, reservados em blocos (hi-lo).
+
+Cada série ("vendas:V", "pagamentos:pgag", "produtos:gm", ...) tem uma
+linha em ``sequencias``. Um processo reserva ``SEQUENCIAS_BLOCO``
+números de uma vez, numa transação curta e separada, e depois entrega-os
+da memória sem tocar no banco. Dois processos nunca recebem o mesmo
+bloco; os números que sobram de um bloco quando o processo termina
+ficam por usar (a numeração pode ter saltos, mas nunca repete).
+
+A reserva usa a sua própria ligação, por isso deve ser pedida antes de
+a operação escrever no banco (senão, em SQLite, espera pelo próprio
+bloqueio de escrita).
+"""
+import re
+import threading
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from modulos.extensions import db
+from .models import Sequencia
+
+BLOCO_PADRAO = 20
+
+_lock = threading.Lock()
+
+
+def _blocos():
+    """{série: [próximo, limite]} deste processo, guardado por aplicação."""
+    return current_app.extensions.setdefault("sequencias", {})
+
+
+def _maior_existente(con, coluna, prefixo):
+    """Maior número já usado com o prefixo (só na criação da série)."""
+    padrao = re.compile(rf"^{re.escape(prefixo)}(\d+)$")
+    maior = 0
+    consulta = select(coluna).where(coluna.like(f"{prefixo}%"))
+    for (codigo,) in con.execute(consulta):
+        encontrado = padrao.match(codigo or "")
+        if encontrado:
+            maior = max(maior, int(encontrado.group(1)))
+    return maior
+
+
+def _criar_serie(con, nome, inicio):
+    dialeto = con.dialect.name
+    if dialeto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialeto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        insert = None
+
+    if insert is not None:
+        # Outro processo pode ter criado a série entretanto
+        con.execute(insert(Sequencia.__table__).values(nome=nome, proximo=inicio).on_conflict_do_nothing())
+    else:
+        con.execute(Sequencia.__table__.insert().values(nome=nome, proximo=inicio))
+
+
+def reservar_bloco(nome, tamanho, inicio=1, minimo=None):
+    """Reserva ``tamanho`` números da série e devolve o primeiro.
+
+    ``inicio`` é o primeiro número da série se ela ainda não existir;
+    pode ser um callable que recebe a ligação, chamado só nesse caso.
+    Com ``minimo``, o bloco nunca começa abaixo desse número.
+    """
+    tabela = Sequencia.__table__
+    with db.engine.begin() as con:
+        if con.execute(select(tabela.c.nome).where(tabela.c.nome == nome)).first() is None:
+            _criar_serie(con, nome, inicio(con) if callable(inicio) else inicio)
+        if minimo is not None:
+            con.execute(
+                update(tabela)
+                .where(tabela.c.nome == nome, tabela.c.proximo < minimo)
+                .values(proximo=minimo)
+            )
+        con.execute(
+            update(tabela)
+            .where(tabela.c.nome == nome)
+            .values(proximo=tabela.c.proximo + tamanho)
+        )
+        limite = con.execute(select(tabela.c.proximo).where(tabela.c.nome == nome)).scalar_one()
+    return limite - tamanho
+
+
+def proximo_numero(nome, inicio=1):
+    """Próximo número da série; só vai ao banco quando o bloco acaba."""
+    with _lock:
+        blocos = _blocos()
+        bloco = blocos.get(nome)
+        if bloco is None or bloco[0] >= bloco[1]:
+            tamanho = current_app.config.get("SEQUENCIAS_BLOCO", BLOCO_PADRAO)
+            numero = reservar_bloco(nome, tamanho, inicio)
+            bloco = blocos[nome] = [numero, numero + tamanho]
+
+        numero = bloco[0]
+        bloco[0] += 1
+        return numero
+
+
+def proximo_codigo(coluna, prefixo, largura):
+    """Código "<prefixo><número>" único para a coluna indicada.
+
+    A série chama-se "<tabela>:<prefixo>" e, na primeira utilização,
+    continua a partir do maior código já gravado com esse prefixo.
+    """
+    nome = f"{coluna.table.name}:{prefixo}"
+    numero = proximo_numero(nome, inicio=lambda con: _maior_existente(con, coluna, prefixo) + 1)
+    return f"{prefixo}{numero:0{largura}d}"
+
+
+def reservar_codigos(coluna, prefixo, quantidade, acima=0):
+    """Reserva ``quantidade`` números seguidos da série de ``proximo_codigo``.
+
+    Para importações em massa: uma só ida ao banco por série. Devolve o
+    primeiro número, maior do que ``acima``; o chamador monta os códigos
+    "<prefixo><número>".
+    """
+    nome = f"{coluna.table.name}:{prefixo}"
+    return reservar_bloco(
+        nome, quantidade, inicio=lambda con: _maior_existente(con, coluna, prefixo) + 1, minimo=acima + 1
+    )
+
+
+# -------------------------------
+# 🔹 Códigos gravados à mão
+# -------------------------------
+def maiores_numeros(codigos, prefixos):
+    """{prefixo: maior número} dos códigos "<prefixo><número>" da lista."""
+    padroes = {p: re.compile(rf"^{re.escape(p)}(\d+)$") for p in prefixos}
+    maiores = {}
+    for codigo in codigos:
+        for prefixo, padrao in padroes.items():
+            encontrado = padrao.match(codigo)
+            if encontrado:
+                maiores[prefixo] = max(maiores.get(prefixo, 0), int(encontrado.group(1)))
+                break
+    return maiores
+
+
+def avancar_series(con, coluna, maiores):
+    """Põe as séries de ``proximo_codigo`` depois dos números já gravados.
+
+    ``maiores`` é {prefixo: maior número gravado à mão} (importações com
+    código). Corre na transação ``con`` de quem grava os códigos; uma
+    série ainda por criar já começa depois deles. O bloco em memória
+    deste processo é descartado; outros processos só reservam depois do
+    número gravado quando acabarem o bloco que têm.
+    """
+    tabela = Sequencia.__table__
+    for prefixo, maior in maiores.items():
+        nome = f"{coluna.table.name}:{prefixo}"
+        con.execute(
+            update(tabela)
+            .where(tabela.c.nome == nome, tabela.c.proximo <= maior)
+            .values(proximo=maior + 1)
+        )
+        with _lock:
+            _blocos().pop(nome, None)
@@ -0,0 +1,6 @@
+from flask import Blueprint
+
+# Exportações pesadas executadas em segundo plano
+tarefas_bp = Blueprint("tarefas", __name__, template_folder="templates")
+
+from . import routes, comandos
@@ -0,0 +1,14 @@
+import click
+
+from . import tarefas_bp
+from .utils import limpar_expiradas
+
+
+# -------------------------------
+# 🔹 flask tarefas limpar
+# -------------------------------
+@tarefas_bp.cli.command("limpar")
+def limpar():
+    """Apaga exportações expiradas e marca como falhadas as tarefas perdidas."""
+    apagadas, perdidas, orfaos = limpar_expiradas()
+    click.echo(f"✔ {apagadas} tarefas expiradas apagadas, {perdidas} perdidas, {orfaos} ficheiros órfãos.")
@@ -0,0 +1,63 @@
+from datetime import datetime
+from modulos.extensions import db
+
+
+# ================================
+# ⏳ Tarefa de exportação
+# ================================
+class Tarefa(db.Model):
+    __tablename__ = "tarefas"
+
+    PENDENTE = "pendente"
+    EM_EXECUCAO = "em_execucao"
+    CONCLUIDA = "concluida"
+    FALHOU = "falhou"
+    ATIVAS = (PENDENTE, EM_EXECUCAO)
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    # Hash do tipo + parâmetros + idioma: pedidos iguais em curso partilham a tarefa
+    chave = db.Column(db.String(64), nullable=False, index=True)
+    tipo = db.Column(db.String(60), nullable=False)  # ex.: "vendas.pdf"
+    parametros = db.Column(db.Text, nullable=False, default="{}")  # JSON
+    idioma = db.Column(db.String(10), nullable=True)
+    usuario = db.Column(db.String(120), nullable=True)
+
+    estado = db.Column(db.String(20), nullable=False, default=PENDENTE, index=True)
+    progresso = db.Column(db.Integer, nullable=False, default=0)  # linhas escritas
+    total = db.Column(db.Integer, nullable=True)  # linhas previstas
+    erro = db.Column(db.Text, nullable=True)
+
+    ficheiro = db.Column(db.String(255), nullable=True)  # caminho na pasta de resultados
+    nome_ficheiro = db.Column(db.String(120), nullable=True)  # nome do download
+    mimetype = db.Column(db.String(120), nullable=True)
+
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Também serve de sinal de vida enquanto a tarefa corre
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    concluido_em = db.Column(db.DateTime, nullable=True)
+    expira_em = db.Column(db.DateTime, nullable=True, index=True)
+
+    @property
+    def percentagem(self):
+        if self.estado == self.CONCLUIDA:
+            return 100
+        if not self.total:
+            return 0
+        return min(99, int(self.progresso * 100 / self.total))
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "estado": self.estado,
+            "progresso": self.progresso,
+            "total": self.total,
+            "percentagem": self.percentagem,
+            "erro": self.erro,
+            "nome_ficheiro": self.nome_ficheiro,
+            "criado_em": self.criado_em.isoformat() if self.criado_em else None,
+            "concluido_em": self.concluido_em.isoformat() if self.concluido_em else None,
+        }
+
+    def __repr__(self):
+        return f"<Tarefa {self.tipo} {self.id} {self.estado}>"
@@ -0,0 +1,53 @@
+import os
+
+from flask import abort, jsonify, redirect, render_template, send_file, url_for
+
+from modulos.extensions import db
+from . import tarefas_bp
+from .models import Tarefa
+
+
+def _tarefa(tarefa_id):
+    tarefa = db.session.get(Tarefa, tarefa_id)
+    if tarefa is None:
+        abort(404)
+    return tarefa
+
+
+# -------------------------------
+# 🔹 Página de espera
+# -------------------------------
+@tarefas_bp.route("/tarefas/<tarefa_id>")
+def ver_tarefa(tarefa_id):
+    return render_template("tarefas/tarefa.html", tarefa=_tarefa(tarefa_id))
+
+
+# -------------------------------
+# 🔹 Estado (JSON)
+# -------------------------------
+@tarefas_bp.route("/tarefas/<tarefa_id>/estado")
+def estado_tarefa(tarefa_id):
+    tarefa = _tarefa(tarefa_id)
+    dados = tarefa.to_dict()
+    if tarefa.estado == Tarefa.CONCLUIDA:
+        dados["download_url"] = url_for("tarefas.baixar_tarefa", tarefa_id=tarefa.id)
+    return jsonify(dados)
+
+
+# -------------------------------
+# 🔹 Download
+# -------------------------------
+@tarefas_bp.route("/tarefas/<tarefa_id>/download")
+def baixar_tarefa(tarefa_id):
+    tarefa = _tarefa(tarefa_id)
+    if tarefa.estado != Tarefa.CONCLUIDA:
+        return redirect(url_for("tarefas.ver_tarefa", tarefa_id=tarefa.id))
+    if not tarefa.ficheiro or not os.path.exists(tarefa.ficheiro):
+        abort(410)
+
+    return send_file(
+        tarefa.ficheiro,
+        as_attachment=True,
+        download_name=tarefa.nome_ficheiro,
+        mimetype=tarefa.mimetype,
+    )
@@ -0,0 +1,280 @@
+# modulos/tarefas/utils.py
+"""Fila de exportações em segundo plano.
+
+Cada exportação regista uma função parâmetros → Documento:
+
+    @exportacao("vendas.pdf")
+    def documento_vendas_pdf(parametros):
+        return Documento("pdf", "vendas.pdf", _("Relatório de Vendas"), COLUNAS, query)
+
+e a rota só pede a tarefa:
+
+    return pedir_exportacao("vendas.pdf")
+
+O pedido grava uma linha em ``tarefas`` (pendente → em_execucao →
+concluida/falhou) e entrega-a a um ThreadPoolExecutor do processo
+(``EXPORTACAO_TRABALHADORES``). O trabalhador escreve o ficheiro em
+``EXPORTACAO_PASTA`` e vai gravando o progresso (linhas escritas) numa
+ligação própria, por isso qualquer processo consegue responder ao
+estado. Um pedido igual (mesmo tipo, parâmetros e idioma) a uma tarefa
+ainda em curso recebe essa tarefa em vez de criar outra.
+
+Os ficheiros ficam disponíveis ``EXPORTACAO_TTL`` segundos; a limpeza
+corre no máximo uma vez por minuto, quando entra um pedido, ou com
+``flask tarefas limpar``. Tarefas activas sem sinal de vida há mais de
+``EXPORTACAO_PRAZO`` segundos (processo que morreu) passam a falhadas.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app, jsonify, redirect, request, url_for
+from flask_babel import force_locale, get_locale
+from flask_login import current_user
+from sqlalchemy import update
+
+from modulos.extensions import db
+from .models import Tarefa
+
+TRABALHADORES = 2
+TTL = 3600  # segundos
+PRAZO = 600  # segundos sem sinal de vida até uma tarefa activa ser dada como perdida
+INTERVALO_PROGRESSO = 1.0  # segundos entre gravações do progresso
+INTERVALO_LIMPEZA = 60
+
+EXTENSOES = {"excel": ".xlsx", "pdf": ".pdf"}
+
+EXPORTACOES = {}
+
+_lock = threading.Lock()
+
+
+def exportacao(tipo):
+    """Regista a função ``parametros -> Documento`` de uma exportação."""
+    def registar(funcao):
+        EXPORTACOES[tipo] = funcao
+        return funcao
+    return registar
+
+
+# -------------------------------
+# 🔹 Estado do processo
+# -------------------------------
+def _estado():
+    """Executor e hora da última limpeza, guardados por aplicação."""
+    app = current_app._get_current_object()
+    with _lock:
+        estado = app.extensions.get("tarefas")
+        if estado is None:
+            trabalhadores = app.config.get("EXPORTACAO_TRABALHADORES", TRABALHADORES)
+            estado = app.extensions["tarefas"] = {
+                "executor": ThreadPoolExecutor(trabalhadores, thread_name_prefix="exportacao"),
+                "limpeza": 0.0,
+            }
+    return estado
+
+
+def pasta_resultados():
+    pasta = current_app.config.get("EXPORTACAO_PASTA") or os.path.join(
+        current_app.instance_path, "exportacoes"
+    )
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def _atualizar(tarefa_id, **valores):
+    """Grava na tarefa numa transação própria.
+
+    Não passa pela sessão: o trabalhador tem uma leitura aberta (o cursor
+    da exportação) e o estado tem de ficar visível de imediato.
+    """
+    valores["atualizado_em"] = datetime.utcnow()
+    with db.engine.begin() as con:
+        con.execute(update(Tarefa.__table__).where(Tarefa.__table__.c.id == tarefa_id).values(**valores))
+
+
+# -------------------------------
+# 🔹 Pedido
+# -------------------------------
+def _chave(tipo, parametros, idioma):
+    bruto = json.dumps([tipo, parametros, idioma], sort_keys=True, default=str)
+    return hashlib.sha256(bruto.encode()).hexdigest()
+
+
+def enfileirar(tipo, parametros=None, usuario=None):
+    """Devolve a tarefa em curso igual a este pedido, ou cria e agenda uma nova."""
+    if tipo not in EXPORTACOES:
+        raise KeyError(f"Exportação desconhecida: {tipo}")
+    parametros = parametros or {}
+    idioma = str(get_locale() or current_app.config.get("BABEL_DEFAULT_LOCALE", "pt"))
+    chave = _chave(tipo, parametros, idioma)
+    prazo = current_app.config.get("EXPORTACAO_PRAZO", PRAZO)
+
+    limpar_expiradas(forcar=False)
+
+    with _lock:
+        existente = Tarefa.query.filter(
+            Tarefa.chave == chave,
+            Tarefa.estado.in_(Tarefa.ATIVAS),
+            Tarefa.atualizado_em >= datetime.utcnow() - timedelta(seconds=prazo),
+        ).order_by(Tarefa.criado_em.desc()).first()
+        if existente is not None:
+            return existente
+
+        tarefa = Tarefa(
+            id=uuid.uuid4().hex,
+            chave=chave,
+            tipo=tipo,
+            parametros=json.dumps(parametros, default=str),
+            idioma=idioma,
+            usuario=usuario,
+        )
+        db.session.add(tarefa)
+        db.session.commit()
+
+    app = current_app._get_current_object()
+    _estado()["executor"].submit(_executar, app, tarefa.id)
+    return tarefa
+
+
+def _quer_json():
+    melhor = request.accept_mimetypes.best_match(["text/html", "application/json"])
+    return melhor == "application/json" or request.headers.get("X-Requested-With") == "XMLHttpRequest"
+
+
+def pedir_exportacao(tipo, **parametros):
+    """Resposta das rotas de exportação.
+
+    Pedidos JSON recebem 202 com o id da tarefa; o browser é levado para
+    a página de espera, que descarrega o ficheiro quando estiver pronto.
+    """
+    tarefa = enfileirar(tipo, parametros, usuario=getattr(current_user, "email", None))
+    if _quer_json():
+        resposta = jsonify({
+            **tarefa.to_dict(),
+            "estado_url": url_for("tarefas.estado_tarefa", tarefa_id=tarefa.id),
+            "download_url": url_for("tarefas.baixar_tarefa", tarefa_id=tarefa.id),
+        })
+        return resposta, 202
+    return redirect(url_for("tarefas.ver_tarefa", tarefa_id=tarefa.id))
+
+
+# -------------------------------
+# 🔹 Execução
+# -------------------------------
+def _com_progresso(linhas, tarefa_id):
+    """Passa as linhas adiante e grava o progresso no máximo uma vez por segundo."""
+    feitas = 0
+    ultima = time.monotonic()
+    for linha in linhas:
+        yield linha
+        feitas += 1
+        if feitas % 256 == 0 and time.monotonic() - ultima >= INTERVALO_PROGRESSO:
+            _atualizar(tarefa_id, progresso=feitas)
+            ultima = time.monotonic()
+
+
+def _executar(app, tarefa_id):
+    with app.app_context():
+        tarefa = db.session.get(Tarefa, tarefa_id)
+        if tarefa is None or tarefa.estado != Tarefa.PENDENTE:
+            return
+        tipo, parametros, idioma = tarefa.tipo, json.loads(tarefa.parametros), tarefa.idioma
+        db.session.rollback()
+
+        caminho = None
+        try:
+            with force_locale(idioma or app.config.get("BABEL_DEFAULT_LOCALE", "pt")):
+                _atualizar(tarefa_id, estado=Tarefa.EM_EXECUCAO)
+                documento = EXPORTACOES[tipo](parametros)
+                _atualizar(tarefa_id, total=documento.contar())
+
+                caminho = os.path.join(pasta_resultados(), tarefa_id + EXTENSOES[documento.formato])
+                with open(caminho + ".parcial", "wb") as destino:
+                    escritas = documento.escrever(destino, lambda l: _com_progresso(l, tarefa_id))
+                os.replace(caminho + ".parcial", caminho)
+
+            agora = datetime.utcnow()
+            ttl = app.config.get("EXPORTACAO_TTL", TTL)
+            _atualizar(
+                tarefa_id,
+                estado=Tarefa.CONCLUIDA,
+                progresso=escritas,
+                ficheiro=caminho,
+                nome_ficheiro=documento.nome_ficheiro,
+                mimetype=documento.mimetype,
+                concluido_em=agora,
+                expira_em=agora + timedelta(seconds=ttl),
+            )
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception("Exportação %s (%s) falhou", tipo, tarefa_id)
+            if caminho and os.path.exists(caminho + ".parcial"):
+                os.remove(caminho + ".parcial")
+            _atualizar(tarefa_id, estado=Tarefa.FALHOU, erro=str(e)[:1000], concluido_em=datetime.utcnow())
+        finally:
+            db.session.remove()
+
+
+# -------------------------------
+# 🔹 Limpeza
+# -------------------------------
+def _apagar(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+
+def limpar_expiradas(forcar=True):
+    """Apaga tarefas e ficheiros expirados e dá como falhadas as tarefas perdidas.
+
+    Sem ``forcar``, corre no máximo uma vez por minuto neste processo.
+    Devolve (tarefas apagadas, tarefas perdidas, ficheiros órfãos apagados).
+    """
+    estado = _estado()
+    agora_m = time.monotonic()
+    with _lock:
+        if not forcar and agora_m - estado["limpeza"] < INTERVALO_LIMPEZA:
+            return 0, 0, 0
+        estado["limpeza"] = agora_m
+
+    agora = datetime.utcnow()
+    ttl = current_app.config.get("EXPORTACAO_TTL", TTL)
+    prazo = current_app.config.get("EXPORTACAO_PRAZO", PRAZO)
+    tabela = Tarefa.__table__
+
+    with db.engine.begin() as con:
+        perdidas = con.execute(
+            update(tabela)
+            .where(tabela.c.estado.in_(Tarefa.ATIVAS),
+                   tabela.c.atualizado_em < agora - timedelta(seconds=prazo))
+            .values(estado=Tarefa.FALHOU, erro="Interrompida (sem sinal do trabalhador).",
+                    concluido_em=agora, expira_em=agora + timedelta(seconds=ttl))
+        ).rowcount
+
+        expiradas = con.execute(
+            db.select(tabela.c.id, tabela.c.ficheiro).where(tabela.c.expira_em < agora)
+        ).all()
+        for _, ficheiro in expiradas:
+            if ficheiro:
+                _apagar(ficheiro)
+        if expiradas:
+            con.execute(tabela.delete().where(tabela.c.id.in_([t for t, _ in expiradas])))
+
+    # Ficheiros sem tarefa (ex.: processo que morreu a meio da escrita)
+    orfaos = 0
+    pasta = pasta_resultados()
+    limite = time.time() - ttl - prazo
+    for nome in os.listdir(pasta):
+        caminho = os.path.join(pasta, nome)
+        if os.path.isfile(caminho) and os.path.getmtime(caminho) < limite:
+            _apagar(caminho)
+            orfaos += 1
+
+    return len(expiradas), perdidas, orfaos
@@ -0,0 +1,326 @@
+# modulos/vendas/carrinho.py
+"""Carrinhos de venda guardados no servidor.
+
+A sessão só guarda os ids dos carrinhos abertos neste posto de venda
+(``session["carrinhos"]``) e o id do carrinho activo
+(``session["carrinho_id"]``). As linhas ficam num store configurável:
+
+- "memoria": dicionário no processo, com TTL e despejo LRU
+  (``CARRINHO_MAX`` carrinhos); serve para um único worker.
+- "sqlite": tabela num ficheiro SQLite partilhado pelos workers
+  (``CARRINHO_SQLITE_PATH``).
+
+Cada carrinho é um mapa produto_id → quantidade, pelo que adicionar uma
+linha custa O(1) independentemente do tamanho do carrinho.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing
+
+from flask import current_app, session
+
+from modulos.produtos.carregador import carregador_produtos
+
+
+# ================================
+# Backends
+# ================================
+class CarrinhoStore(ABC):
+    """Interface comum dos backends de carrinho."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    @abstractmethod
+    def itens(self, carrinho_id):
+        """Devolve {produto_id: quantidade} pela ordem de inserção."""
+
+    @abstractmethod
+    def adicionar(self, carrinho_id, produto_id, quantidade):
+        """Soma a quantidade à linha do produto e devolve o novo total."""
+
+    @abstractmethod
+    def definir(self, carrinho_id, produto_id, quantidade):
+        """Fixa a quantidade da linha do produto."""
+
+    @abstractmethod
+    def remover(self, carrinho_id, produto_id):
+        """Tira a linha do produto, se existir."""
+
+    @abstractmethod
+    def substituir(self, carrinho_id, itens):
+        """Troca todas as linhas do carrinho por ``itens``."""
+
+    @abstractmethod
+    def apagar(self, carrinho_id):
+        """Apaga o carrinho e as suas linhas."""
+
+
+class MemoriaCarrinhoStore(CarrinhoStore):
+    def __init__(self, ttl, max_carrinhos=500):
+        super().__init__(ttl)
+        self.max_carrinhos = max_carrinhos
+        self._carrinhos = OrderedDict()  # id -> [expira_em, {produto_id: qtd}]
+        self._lock = threading.Lock()
+
+    def _obter(self, carrinho_id, criar=False):
+        agora = time.monotonic()
+        entrada = self._carrinhos.get(carrinho_id)
+
+        if entrada is not None and entrada[0] < agora:
+            del self._carrinhos[carrinho_id]
+            entrada = None
+
+        if entrada is None:
+            if not criar:
+                return None
+            entrada = [0, {}]
+            self._carrinhos[carrinho_id] = entrada
+            while len(self._carrinhos) > self.max_carrinhos:
+                self._carrinhos.popitem(last=False)
+
+        entrada[0] = agora + self.ttl
+        self._carrinhos.move_to_end(carrinho_id)
+        return entrada[1]
+
+    def itens(self, carrinho_id):
+        with self._lock:
+            return dict(self._obter(carrinho_id) or {})
+
+    def adicionar(self, carrinho_id, produto_id, quantidade):
+        with self._lock:
+            linhas = self._obter(carrinho_id, criar=True)
+            linhas[produto_id] = linhas.get(produto_id, 0) + quantidade
+            return linhas[produto_id]
+
+    def definir(self, carrinho_id, produto_id, quantidade):
+        with self._lock:
+            self._obter(carrinho_id, criar=True)[produto_id] = quantidade
+
+    def remover(self, carrinho_id, produto_id):
+        with self._lock:
+            linhas = self._obter(carrinho_id)
+            if linhas is not None:
+                linhas.pop(produto_id, None)
+
+    def substituir(self, carrinho_id, itens):
+        with self._lock:
+            linhas = self._obter(carrinho_id, criar=True)
+            linhas.clear()
+            linhas.update(itens)
+
+    def apagar(self, carrinho_id):
+        with self._lock:
+            self._carrinhos.pop(carrinho_id, None)
+
+
+class SQLiteCarrinhoStore(CarrinhoStore):
+    def __init__(self, ttl, caminho):
+        super().__init__(ttl)
+        self.caminho = caminho
+        with self._conexao() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS carrinhos (
+                    id TEXT PRIMARY KEY,
+                    expira_em REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_carrinhos_expira_em ON carrinhos (expira_em);
+                CREATE TABLE IF NOT EXISTS carrinho_itens (
+                    carrinho_id TEXT NOT NULL,
+                    produto_id INTEGER NOT NULL,
+                    quantidade INTEGER NOT NULL,
+                    PRIMARY KEY (carrinho_id, produto_id)
+                );
+            """)
+
+    def _conexao(self):
+        return closing(sqlite3.connect(self.caminho, timeout=10, isolation_level=None))
+
+    def _tocar(self, con, carrinho_id):
+        agora = time.time()
+        con.execute(
+            "INSERT INTO carrinhos (id, expira_em) VALUES (?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET expira_em = excluded.expira_em",
+            (carrinho_id, agora + self.ttl),
+        )
+
+    def limpar_expirados(self):
+        with self._conexao() as con:
+            con.execute("BEGIN IMMEDIATE")
+            con.execute(
+                "DELETE FROM carrinho_itens WHERE carrinho_id IN "
+                "(SELECT id FROM carrinhos WHERE expira_em < ?)", (time.time(),)
+            )
+            con.execute("DELETE FROM carrinhos WHERE expira_em < ?", (time.time(),))
+            con.execute("COMMIT")
+
+    def itens(self, carrinho_id):
+        with self._conexao() as con:
+            vivo = con.execute(
+                "SELECT 1 FROM carrinhos WHERE id = ? AND expira_em >= ?",
+                (carrinho_id, time.time()),
+            ).fetchone()
+            if not vivo:
+                return {}
+            self._tocar(con, carrinho_id)
+            linhas = con.execute(
+                "SELECT produto_id, quantidade FROM carrinho_itens "
+                "WHERE carrinho_id = ? ORDER BY rowid", (carrinho_id,)
+            )
+            return dict(linhas.fetchall())
+
+    def adicionar(self, carrinho_id, produto_id, quantidade):
+        with self._conexao() as con:
+            con.execute("BEGIN IMMEDIATE")
+            self._tocar(con, carrinho_id)
+            con.execute(
+                "INSERT INTO carrinho_itens (carrinho_id, produto_id, quantidade) VALUES (?, ?, ?) "
+                "ON CONFLICT(carrinho_id, produto_id) DO UPDATE "
+                "SET quantidade = quantidade + excluded.quantidade",
+                (carrinho_id, produto_id, quantidade),
+            )
+            novo = con.execute(
+                "SELECT quantidade FROM carrinho_itens WHERE carrinho_id = ? AND produto_id = ?",
+                (carrinho_id, produto_id),
+            ).fetchone()[0]
+            con.execute("COMMIT")
+            return novo
+
+    def definir(self, carrinho_id, produto_id, quantidade):
+        with self._conexao() as con:
+            con.execute("BEGIN IMMEDIATE")
+            self._tocar(con, carrinho_id)
+            con.execute(
+                "INSERT INTO carrinho_itens (carrinho_id, produto_id, quantidade) VALUES (?, ?, ?) "
+                "ON CONFLICT(carrinho_id, produto_id) DO UPDATE SET quantidade = excluded.quantidade",
+                (carrinho_id, produto_id, quantidade),
+            )
+            con.execute("COMMIT")
+
+    def remover(self, carrinho_id, produto_id):
+        with self._conexao() as con:
+            con.execute(
+                "DELETE FROM carrinho_itens WHERE carrinho_id = ? AND produto_id = ?",
+                (carrinho_id, produto_id),
+            )
+
+    def substituir(self, carrinho_id, itens):
+        with self._conexao() as con:
+            con.execute("BEGIN IMMEDIATE")
+            self._tocar(con, carrinho_id)
+            con.execute("DELETE FROM carrinho_itens WHERE carrinho_id = ?", (carrinho_id,))
+            con.executemany(
+                "INSERT INTO carrinho_itens (carrinho_id, produto_id, quantidade) VALUES (?, ?, ?)",
+                [(carrinho_id, pid, qtd) for pid, qtd in itens.items()],
+            )
+            con.execute("COMMIT")
+
+    def apagar(self, carrinho_id):
+        with self._conexao() as con:
+            con.execute("BEGIN IMMEDIATE")
+            con.execute("DELETE FROM carrinho_itens WHERE carrinho_id = ?", (carrinho_id,))
+            con.execute("DELETE FROM carrinhos WHERE id = ?", (carrinho_id,))
+            con.execute("COMMIT")
+
+
+# ================================
+# Store da aplicação
+# ================================
+_lock_store = threading.Lock()
+
+
+def criar_store(app):
+    ttl = app.config.get("CARRINHO_TTL", 8 * 3600)
+    backend = app.config.get("CARRINHO_BACKEND", "sqlite")
+
+    if backend == "memoria":
+        return MemoriaCarrinhoStore(ttl, app.config.get("CARRINHO_MAX", 500))
+
+    if backend == "sqlite":
+        caminho = app.config.get("CARRINHO_SQLITE_PATH") or os.path.join(app.instance_path, "carrinhos.db")
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        store = SQLiteCarrinhoStore(ttl, caminho)
+        store.limpar_expirados()
+        return store
+
+    raise ValueError(f"CARRINHO_BACKEND desconhecido: {backend}")
+
+
+def obter_store():
+    store = current_app.extensions.get("carrinho_store")
+    if store is None:
+        with _lock_store:
+            store = current_app.extensions.get("carrinho_store")
+            if store is None:
+                store = criar_store(current_app)
+                current_app.extensions["carrinho_store"] = store
+    return store
+
+
+# ================================
+# Carrinhos do posto (sessão)
+# ================================
+def carrinhos_abertos():
+    return session.get("carrinhos", [])
+
+
+def abrir_carrinho():
+    """Abre um carrinho novo neste posto e torna-o o activo."""
+    carrinho_id = uuid.uuid4().hex
+    session["carrinhos"] = carrinhos_abertos() + [carrinho_id]
+    session["carrinho_id"] = carrinho_id
+    return carrinho_id
+
+
+def carrinho_atual():
+    """Id do carrinho activo, abrindo um se ainda não houver."""
+    carrinho_id = session.get("carrinho_id")
+    if carrinho_id not in carrinhos_abertos():
+        carrinho_id = abrir_carrinho()
+    return carrinho_id
+
+
+def selecionar_carrinho(carrinho_id):
+    if carrinho_id not in carrinhos_abertos():
+        return False
+    session["carrinho_id"] = carrinho_id
+    return True
+
+
+def fechar_carrinho(carrinho_id):
+    """Apaga o carrinho e activa o último que ainda estiver aberto."""
+    obter_store().apagar(carrinho_id)
+    abertos = [c for c in carrinhos_abertos() if c != carrinho_id]
+    session["carrinhos"] = abertos
+    if abertos:
+        session["carrinho_id"] = abertos[-1]
+    else:
+        session.pop("carrinho_id", None)
+
+
+def carregar_no_carrinho(itens):
+    """Abre um carrinho com as linhas indicadas (ex.: vindas de uma cotação).
+
+    ``itens`` é uma lista de dicts com "produto_id" e "quantidade"; linhas
+    de produtos que já não existem ou sem quantidade positiva são
+    ignoradas.
+    """
+    produtos = carregador_produtos().carregar(item["produto_id"] for item in itens)
+
+    linhas = {}
+    for item in itens:
+        produto_id = int(item["produto_id"])
+        if produto_id in produtos:
+            linhas[produto_id] = linhas.get(produto_id, 0) + int(item["quantidade"])
+
+    linhas = {pid: qtd for pid, qtd in linhas.items() if qtd >= 1}
+
+    carrinho_id = abrir_carrinho()
+    obter_store().substituir(carrinho_id, linhas)
+    return carrinho_id
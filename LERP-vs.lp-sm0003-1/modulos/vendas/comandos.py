@@ -0,0 +1,117 @@
+import os
+import tempfile
+
+import click
+from sqlalchemy import event
+
+from modulos.extensions import db
+from . import vendas_bp
+
+TAMANHOS = (1, 50, 500)
+
+
+# -------------------------------
+# 🔹 flask vendas contar-consultas
+# -------------------------------
+def _contador(engine):
+    """Lista que recebe cada instrução SQL executada pelo engine."""
+    instrucoes = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        instrucoes.append(statement)
+
+    return instrucoes
+
+
+def _medir(app, cliente, instrucoes, linhas):
+    """Consultas de cada passo com um carrinho de ``linhas`` produtos distintos."""
+    # Import local: cotações importa o carrinho de vendas
+    from modulos.cotacoes.models import Cotacao
+    from modulos.produtos.models import Produto
+
+    with app.app_context():
+        ids = [pid for (pid,) in db.session.query(Produto.id).order_by(Produto.id).limit(linhas)]
+        cotacao = Cotacao(cliente="Verificação", status="rascunho")
+        cotacao.itens = [{"produto_id": pid, "quantidade": 1} for pid in ids]
+        db.session.add(cotacao)
+        db.session.commit()
+        cotacao_id = cotacao.id
+
+    passos = (
+        ("cotação → carrinho", lambda: cliente.get(f"/cotacoes/abrir-venda/{cotacao_id}")),
+        ("nova_venda", lambda: cliente.get("/nova")),
+        ("finalizar_venda", lambda: cliente.post("/finalizar_venda")),
+    )
+    consultas = {}
+    for nome, pedido in passos:
+        del instrucoes[:]
+        resposta = pedido()
+        if resposta.status_code >= 400:
+            raise click.ClickException(f"{nome} com {linhas} linhas: HTTP {resposta.status_code}")
+        consultas[nome] = len(instrucoes)
+
+    # A venda tem de ter sido gravada (e não devolvida ao carrinho com um aviso)
+    if not resposta.location.endswith("/vendas"):
+        raise click.ClickException(f"finalizar_venda com {linhas} linhas não gravou a venda")
+    return consultas
+
+
+def _medir_tamanhos(app, linhas):
+    """{linhas: consultas por passo} para cada tamanho, num banco novo."""
+    from modulos.produtos.models import Produto
+
+    with app.app_context():
+        db.session.add_all([
+            Produto(codigo=f"cc{i:04d}", nome=f"Produto {i}", categoria="Loja",
+                    preco_unitario=50, preco_venda=70, stock=100)
+            for i in range(max(linhas))
+        ])
+        db.session.commit()
+        instrucoes = _contador(db.engine)
+
+    cliente = app.test_client()
+    # Aquecimento: reservas de numeração e caches do primeiro pedido
+    _medir(app, cliente, instrucoes, 1)
+
+    return {n: _medir(app, cliente, instrucoes, n) for n in linhas}
+
+
+@vendas_bp.cli.command("contar-consultas")
+@click.option("--linhas", "-n", multiple=True, type=int, default=TAMANHOS, show_default=True,
+              help="Linhas do carrinho a testar.")
+def contar_consultas(linhas):
+    """Confirma que o carrinho faz as mesmas consultas com qualquer número de linhas.
+
+    Abre uma cotação no carrinho, mostra a venda e finaliza-a com cada
+    tamanho de carrinho, contando as instruções SQL de cada pedido. Falha
+    se algum passo variar com o tamanho. Não toca no banco da aplicação.
+    """
+    # Import local: app importa os blueprints
+    from app import create_app
+
+    with tempfile.TemporaryDirectory() as pasta:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(pasta, 'consultas.db')}",
+            "CARRINHO_BACKEND": "memoria",
+            "WTF_CSRF_ENABLED": False,
+            "TESTING": True,
+        })
+        try:
+            resultados = _medir_tamanhos(app, linhas)
+        finally:
+            # Fecha as ligações ao ficheiro antes de a pasta ser apagada
+            with app.app_context():
+                db.engine.dispose()
+
+    for n, consultas in resultados.items():
+        click.echo(f"== {n:4} linhas  " + "  ".join(f"{passo}: {q}" for passo, q in consultas.items()))
+
+    variaveis = [
+        passo for passo in resultados[linhas[0]]
+        if len({consultas[passo] for consultas in resultados.values()}) > 1
+    ]
+    if variaveis:
+        raise click.ClickException(f"consultas variam com o tamanho do carrinho: {', '.join(variaveis)}")
+    click.echo("✔ Número de consultas constante em todos os passos.")
+
@@ -0,0 +1,137 @@
+# modulos/vendas/finalizacao.py
+"""Finalização de uma venda numa única transação.
+
+O número de idas ao banco não depende do tamanho do carrinho:
+
+1. um ``UPDATE ... CASE`` baixa o stock de todas as linhas, só onde
+   ``stock >= quantidade``;
+2. um ``UPDATE ... RETURNING`` avança as saídas acumuladas e, em FIFO,
+   uma consulta às camadas dá o custo das unidades vendidas
+   (produtos/custos.py), que fixa o ``custo_total`` e o lucro de cada
+   linha;
+3. um ``INSERT`` da venda;
+4. um ``INSERT`` em lote (executemany) de todos os ``VendaItem``;
+5. o upsert do resumo diário e o commit.
+
+Se alguma linha não tiver stock, o UPDATE afecta menos linhas do que o
+carrinho e a transação inteira é desfeita. A baixa incrementa a
+``versao`` dos produtos, para que as alterações com compare-and-swap
+(produtos/stock.py) de outros postos detectem a venda.
+"""
+from datetime import datetime
+
+from flask_babel import gettext as _
+from sqlalchemy import case, insert, update
+
+from modulos.extensions import db
+from modulos.produtos.models import Produto
+from modulos.produtos.custos import consumir
+from modulos.produtos.movimentos import registrar_movimentos
+from modulos.produtos.stock import StockInsuficiente
+from modulos.resumo.utils import registrar_no_resumo
+from modulos.sequencias.utils import proximo_codigo
+from .models import Venda, VendaItem
+
+
+def calcular_linhas(carrinho, produtos):
+    """Linhas da venda com preço, subtotal e lucro já calculados.
+
+    O lucro usa o custo médio ponderado (``preco_unitario``) mantido
+    pelas compras; ao finalizar, é substituído pelo custo das unidades
+    vendidas segundo o método de custeio (ver baixar_stock).
+    """
+    linhas = []
+    for produto_id, quantidade in carrinho.items():
+        produto = produtos[produto_id]
+        preco = float(produto.preco_venda or 0)
+        custo = float(produto.preco_unitario or 0)
+        linhas.append({
+            "produto_id": produto.id,
+            "codigo_produto": produto.codigo,
+            "produto": produto.nome,
+            "quantidade": quantidade,
+            "preco_unitario": preco,
+            "valor_total": round(preco * quantidade, 2),
+            "lucro_total": round((preco - custo) * quantidade, 2),
+        })
+    return linhas
+
+
+def baixar_stock(quantidades, referencia=None):
+    """Baixa o stock de todos os produtos com um único UPDATE.
+
+    ``quantidades`` é {produto_id: quantidade}. Levanta ValueError se
+    alguma quantidade for menor que 1 (a baixa aumentaria o stock) e
+    StockInsuficiente se algum produto não tiver stock (nada é alterado
+    nesse caso, desde que o chamador faça rollback). Regista as saídas no razão de stock
+    com a ``referencia`` (o código da venda). Devolve {produto_id: custo
+    das unidades}.
+    """
+    if any(q < 1 for q in quantidades.values()):
+        raise ValueError(_("Quantidade inválida no carrinho: todas as linhas têm de ter pelo menos 1 unidade."))
+
+    pedido = case(quantidades, value=Produto.id, else_=0)
+    resultado = db.session.execute(
+        update(Produto)
+        .where(Produto.id.in_(list(quantidades)), Produto.stock >= pedido)
+        .values(
+            stock=Produto.stock - pedido,
+            versao=Produto.versao + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    if resultado.rowcount != len(quantidades):
+        faltam = db.session.execute(
+            db.select(Produto.nome, Produto.stock, Produto.id)
+            .where(Produto.id.in_(list(quantidades)), Produto.stock < pedido)
+        ).all()
+        raise StockInsuficiente([(nome, stock, quantidades[pid]) for nome, stock, pid in faltam])
+
+    registrar_movimentos([(pid, -q) for pid, q in quantidades.items()], "venda", referencia)
+    return consumir(quantidades)
+
+
+def finalizar_carrinho(carrinho, produtos):
+    """Grava a venda do carrinho {produto_id: quantidade} e faz commit.
+
+    ``produtos`` é o mapa id → Produto já carregado para o carrinho.
+    Devolve a Venda criada; em caso de StockInsuficiente a sessão fica
+    desfeita.
+    """
+    linhas = calcular_linhas(carrinho, produtos)
+    # Reservado antes de qualquer escrita (ver sequencias/utils.py)
+    codigo_venda = proximo_codigo(Venda.codigo_venda, "V", 6)
+
+    try:
+        custos = baixar_stock(carrinho, codigo_venda)
+        for linha in linhas:
+            linha["custo_total"] = custos[linha["produto_id"]]
+            linha["lucro_total"] = round(linha["valor_total"] - linha["custo_total"], 2)
+
+        venda = Venda(
+            codigo_venda=codigo_venda,
+            data_venda=datetime.now(),
+            total_valor=round(sum(l["valor_total"] for l in linhas), 2),
+            total_lucro=round(sum(l["lucro_total"] for l in linhas), 2),
+            produto=", ".join(l["produto"] for l in linhas)[:200],
+            quantidade=sum(l["quantidade"] for l in linhas),
+        )
+        venda.saldo = venda.total_valor  # por receber até entrar o pagamento
+        db.session.add(venda)
+        db.session.flush()
+
+        for linha in linhas:
+            linha["venda_id"] = venda.id
+        db.session.execute(insert(VendaItem), linhas)
+
+        registrar_no_resumo(
+            "vendas", venda.data_venda,
+            vendas=venda.total_valor, lucro=venda.total_lucro
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return venda
@@ -1,6 +1,9 @@
 class Item:
     def __init__(self, produto, quantidade):
         self.produto = produto
-        self.preco = produto.preco
+        self.produto_id = produto.id
+        self.codigo = produto.codigo
+        self.nome = produto.nome
+        self.preco = float(produto.preco_venda or 0)
         self.quantidade = quantidade
         self.subtotal = self.preco * self.quantidade
@@ -9,11 +9,14 @@ class Venda(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     codigo_venda = db.Column(db.String(50), unique=True, nullable=False)
-    data_venda = db.Column(db.DateTime, default=datetime.now)
+    data_venda = db.Column(db.DateTime, default=datetime.now, index=True)
     total_valor = db.Column(db.Float, default=0.0)
     total_lucro = db.Column(db.Float, default=0.0)
     produto = db.Column(db.String(200), nullable=False)
     quantidade = db.Column(db.Float, nullable=False)
+    # Recebimento: somado a cada Pagamento ligado à venda (ver vendas/recebimentos.py)
+    valor_pago = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+    saldo = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
    
     # Relacionamento com itens da venda
     itens = db.relationship("VendaItem", backref="venda", cascade="all, delete-orphan")
@@ -22,6 +25,16 @@ class Venda(db.Model):
         return f"<Venda {self.codigo_venda} - Total: {self.total_valor:.2f}>"
 
 
+# Vendas por receber, pela ordem das listagens (só as linhas com saldo)
+db.Index(
+    "ix_vendas_em_aberto",
+    Venda.data_venda,
+    Venda.id,
+    sqlite_where=Venda.saldo > 0,
+    postgresql_where=Venda.saldo > 0,
+)
+
+
 # ================================
 # 🛒 Item da Venda
 # ================================
@@ -29,14 +42,16 @@ class VendaItem(db.Model):
     __tablename__ = "venda_itens"
 
     id = db.Column(db.Integer, primary_key=True)
-    venda_id = db.Column(db.Integer, db.ForeignKey("vendas.id"), nullable=False)
-    produto_id = db.Column(db.Integer, nullable=False)
+    venda_id = db.Column(db.Integer, db.ForeignKey("vendas.id"), nullable=False, index=True)
+    produto_id = db.Column(db.Integer, nullable=False, index=True)
     codigo_produto = db.Column(db.String(50), nullable=False)
     produto = db.Column(db.String(200), nullable=False)
     quantidade = db.Column(db.Integer, default=1)
     preco_unitario = db.Column(db.Float, default=0.0)
     valor_total = db.Column(db.Float, default=0.0)
     lucro_total = db.Column(db.Float, default=0.0)
+    # Custo das unidades vendidas, pelo método de custeio em vigor na venda
+    custo_total = db.Column(db.Float)
 
     def __repr__(self):
         return f"<VendaItem {self.produto} x {self.quantidade} - Total: {self.valor_total:.2f}>"
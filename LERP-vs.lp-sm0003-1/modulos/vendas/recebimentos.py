@@ -0,0 +1,71 @@
+# modulos/vendas/recebimentos.py
+"""Quanto de cada venda já foi recebido.
+
+Cada ``Pagamento`` pode apontar para a sua venda (``venda_id``), e a
+venda guarda ``valor_pago`` e ``saldo`` (total − pago). Os dois são
+actualizados na transação do pagamento por um único UPDATE, que só
+passa se o valor não exceder o saldo, por isso dois postos a receber a
+mesma venda nunca a pagam a mais.
+
+As vendas por receber são ``saldo > 0``: um filtro servido pelo índice
+parcial ``ix_vendas_em_aberto`` (data_venda, id), que só contém essas
+vendas, em vez de cruzar códigos entre vendas e pagamentos.
+"""
+from flask_babel import gettext as _
+from sqlalchemy import func, update
+
+from modulos.extensions import db
+from .models import Venda
+
+TOLERANCIA = 0.005  # arredondamento ao centavo
+
+
+class PagamentoExcedeSaldo(Exception):
+    """Pagamento maior do que o saldo em dívida da venda."""
+
+    def __init__(self, saldo):
+        super().__init__(saldo)
+        self.saldo = saldo
+
+
+def registrar_pagamento_venda(venda_id, valor):
+    """Soma o pagamento à venda e devolve o novo saldo. Não faz commit.
+
+    Levanta ``ValueError`` se o valor não for positivo e
+    ``PagamentoExcedeSaldo`` se passar do saldo.
+    """
+    if not valor or valor < 0.01:
+        raise ValueError(_("O valor do pagamento tem de ser positivo."))
+    linha = db.session.execute(
+        update(Venda)
+        .where(Venda.id == venda_id, Venda.saldo >= valor - TOLERANCIA)
+        .values(
+            valor_pago=func.round(Venda.valor_pago + valor, 2),
+            saldo=func.round(Venda.saldo - valor, 2),
+        )
+        .returning(Venda.saldo)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if linha is None:
+        raise PagamentoExcedeSaldo(db.session.query(Venda.saldo).filter(Venda.id == venda_id).scalar())
+    return linha.saldo
+
+
+def vendas_em_aberto():
+    """Query das vendas com saldo por receber."""
+    return Venda.query.filter(Venda.saldo > 0)
+
+
+def garantir_saldos_vendas():
+    """Dá como pagas as vendas anteriores ao registo de recebimentos.
+
+    Antes, nada ligava os pagamentos às vendas; essas vendas ficam com
+    ``valor_pago`` igual ao total e saldo 0. Devolve quantas acertou.
+    """
+    tabela = Venda.__table__
+    with db.engine.begin() as con:
+        return con.execute(
+            update(tabela)
+            .where(tabela.c.valor_pago == 0, tabela.c.saldo == 0, tabela.c.total_valor > 0)
+            .values(valor_pago=tabela.c.total_valor)
+        ).rowcount
@@ -1,17 +1,28 @@
-from flask import render_template, redirect, url_for, flash, request, send_file, session, jsonify
-from io import BytesIO
-import pandas as pd
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from datetime import datetime, timedelta
+from flask import render_template, redirect, url_for, flash, request, jsonify
+from datetime import timedelta
 from flask_babel import _
 from modulos.extensions import db
 from . import vendas_bp
 from .models import Venda, VendaItem        # ✅ apenas os modelos de vendas
 from modulos.produtos.models import Produto  # ✅ import do Produto
+from modulos.produtos.carregador import carregador_produtos
+from modulos.produtos.pesquisa import buscar_ranqueado, filtro_produtos
 from .forms import VendaForm
+from .helper import Item
+from .finalizacao import finalizar_carrinho
+from .recebimentos import vendas_em_aberto as query_em_aberto
+from modulos.produtos.stock import StockInsuficiente, ConflitoVersao, com_retentativas
+from .carrinho import (
+    obter_store, carrinho_atual, carrinhos_abertos, abrir_carrinho,
+    selecionar_carrinho, fechar_carrinho, carregar_no_carrinho
+)
 from sqlalchemy import func, or_
 from modulos.cotacoes.models import Cotacao  # import local
+from modulos.resumo.utils import serie_diaria, totais_resumo
+from modulos.periodos import hoje_local
+from modulos.paginacao import paginar, totais
+from modulos.exportacao import Coluna, Documento
+from modulos.tarefas.utils import exportacao, pedir_exportacao
 
 
 
@@ -25,20 +36,18 @@ except Exception:
     def registrar_acao(acao, modulo="vendas", detalhes=""):
         return
 
-# ================================
-# Classe Item para carrinho
-
-
 @vendas_bp.route("/vendas/buscar_produtos")
 def buscar_produtos():
     termo = request.args.get("q", "").strip()
     if not termo:
         return jsonify([])
 
-    # Busca por nome ou código
-    produtos = Produto.query.filter(
-        or_(Produto.nome.ilike(f"%{termo}%"), Produto.codigo.ilike(f"%{termo}%"))
-    ).all()
+    # Busca por nome ou código (FTS5 ordenado por relevância; LIKE se indisponível)
+    produtos = buscar_ranqueado(termo, limite=20)
+    if produtos is None:
+        produtos = Produto.query.filter(
+            or_(Produto.nome.ilike(f"%{termo}%"), Produto.codigo.ilike(f"%{termo}%"))
+        ).limit(20).all()
 
     resultado = []
     for p in produtos:
@@ -46,7 +55,7 @@ def buscar_produtos():
             "id": p.id,
             "nome": p.nome,
             "codigo": p.codigo,
-            "preco": float(p.preco)
+            "preco": float(p.preco_venda or 0)
         })
 
     return jsonify(resultado)
@@ -63,49 +72,18 @@ def criar_venda_a_partir_cotacao(cotacao_id):
         flash("Cotação não encontrada.", "danger")
         return redirect(url_for("cotacoes.listar_cotacoes"))
 
-    carrinho_venda = []
-    for item in cotacao.itens:
-        carrinho_venda.append({
-            "produto_id": item["produto_id"],
-            "quantidade": item["quantidade"]
-        })
-
-    session["carrinho_venda"] = carrinho_venda
+    carregar_no_carrinho(cotacao.itens)
     flash("Cotação carregada no carrinho de venda.", "success")
     return redirect(url_for("vendas.nova_venda"))
 
 # ================================
 # Nova venda
 # ================================
-
-def init_carrinho():
-    if "carrinho_venda" not in session:
-        session["carrinho_venda"] = []
-
 @vendas_bp.route("/nova", methods=["GET", "POST"])
 def nova_venda():
     form = VendaForm()
-    init_carrinho()
-    carrinho = session["carrinho_venda"]
-
-    # Converter carrinho em objetos Item para o template
-    itens_obj = []
-    for item_dict in carrinho:
-        produto = Produto.query.get(item_dict["produto_id"])
-        if produto:
-            itens_obj.append(Item(produto, item_dict["quantidade"]))
-
-    # Preparar lista de produtos para autocomplete
-    produtos = Produto.query.all()
-    produtos_data = []
-    for p in produtos:
-        produtos_data.append({
-            "id": p.id,
-            "codigo": p.codigo,
-            "nome": p.nome,
-            "preco_venda": float(p.preco_venda or 0),
-            "categoria": p.categoria or ""
-        })
+    carrinho_id = carrinho_atual()
+    store = obter_store()
 
     # Adicionar produto via formulário
     if form.validate_on_submit():
@@ -114,67 +92,91 @@ def nova_venda():
             flash("Produto não encontrado.", "danger")
             return redirect(url_for("vendas.nova_venda"))
 
-        # Verificar se produto já existe no carrinho
-        encontrado = False
-        for item in carrinho:
-            if item["produto_id"] == produto.id:
-                item["quantidade"] += form.quantidade.data
-                encontrado = True
-                break
-        if not encontrado:
-            carrinho.append({
-                "produto_id": produto.id,
-                "quantidade": form.quantidade.data
-            })
-
-        session["carrinho_venda"] = carrinho
+        store.adicionar(carrinho_id, produto.id, form.quantidade.data)
         flash(f"{produto.nome} adicionado ao carrinho.", "success")
         return redirect(url_for("vendas.nova_venda"))
 
+    # Converter carrinho em objetos Item para o template (uma consulta IN)
+    linhas = store.itens(carrinho_id)
+    produtos_carrinho = carregador_produtos().carregar(linhas)
+    itens_obj = [
+        Item(produtos_carrinho[produto_id], quantidade)
+        for produto_id, quantidade in linhas.items()
+        if produto_id in produtos_carrinho
+    ]
+
+    # O autocomplete consulta /produtos/api/buscar; o catálogo não vai na página
     return render_template(
         "vendas/nova_venda.html",
         form=form,
         itens=itens_obj,
-        produtos=produtos_data
+        carrinhos=carrinhos_abertos(),
+        carrinho_id=carrinho_id
     )
 
 
+# ================================
+# Carrinhos abertos no posto
+# ================================
+@vendas_bp.route("/vendas/carrinhos/novo")
+def novo_carrinho():
+    abrir_carrinho()
+    return redirect(url_for("vendas.nova_venda"))
+
+
+@vendas_bp.route("/vendas/carrinhos/<carrinho_id>")
+def selecionar_carrinho_venda(carrinho_id):
+    if not selecionar_carrinho(carrinho_id):
+        flash("Carrinho não encontrado ou expirado.", "warning")
+    return redirect(url_for("vendas.nova_venda"))
+
+
 # ================================
 # Adicionar item via Ajax
 # ================================
 @vendas_bp.route("/vendas/adicionar_item", methods=["POST"])
 def adicionar_item():
-    init_carrinho()
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     codigo = data.get("codigo")
-    quantidade = int(data.get("quantidade", 1))
+    try:
+        quantidade = int(data.get("quantidade", 1))
+    except (TypeError, ValueError):
+        quantidade = 0
+    if quantidade < 1:
+        return jsonify({"error": _("Quantidade inválida")})
 
     produto = Produto.query.filter_by(codigo=codigo).first()
     if not produto:
         return jsonify({"error": _("Produto não encontrado")})
 
-    carrinho = session["carrinho_venda"]
+    total_linha = obter_store().adicionar(carrinho_atual(), produto.id, quantidade)
+    return jsonify({"produto_id": produto.id, "quantidade": total_linha})
 
-    # Se já existe, soma a quantidade
-    for item in carrinho:
-        if item["produto_id"] == produto.id:
-            item["quantidade"] += quantidade
-            break
-    else:
-        carrinho.append({"produto_id": produto.id, "quantidade": quantidade})
 
-    session["carrinho_venda"] = carrinho
-    return jsonify({"carrinho": carrinho})
+# ================================
+# Alterar quantidade via Ajax
+# ================================
+@vendas_bp.route("/vendas/atualizar_item/<int:produto_id>", methods=["POST"])
+def atualizar_item(produto_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        quantidade = int(data.get("quantidade", 1))
+    except (TypeError, ValueError):
+        quantidade = 0
+    if quantidade < 1:
+        return jsonify({"error": _("Quantidade inválida")})
+
+    obter_store().definir(carrinho_atual(), produto_id, quantidade)
+    return jsonify({"produto_id": produto_id, "quantidade": quantidade})
 
 # ================================
 # Remover item do carrinho
 # ================================
 @vendas_bp.route("/vendas/remover_item/<int:produto_id>")
 def remover_item(produto_id):
-    init_carrinho()
-    carrinho = session["carrinho_venda"]
-    carrinho = [item for item in carrinho if item["produto_id"] != produto_id]
-    session["carrinho_venda"] = carrinho
+    obter_store().remover(carrinho_atual(), produto_id)
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return jsonify({"produto_id": produto_id})
     flash("Item removido do carrinho.", "success")
     return redirect(url_for("vendas.nova_venda"))
 
@@ -183,42 +185,35 @@ def remover_item(produto_id):
 # ================================
 @vendas_bp.route("/finalizar_venda", methods=["POST"])
 def finalizar_venda():
-    init_carrinho()
-    carrinho = session.get("carrinho_venda", [])
+    carrinho_id = carrinho_atual()
+    carrinho = obter_store().itens(carrinho_id)
     if not carrinho:
         flash("O carrinho está vazio. Adicione pelo menos um produto.", "danger")
         return redirect(url_for("vendas.nova_venda"))
 
-    nova_venda = Venda(
-        codigo_venda=f"V{int(datetime.now().timestamp())}",
-        data_venda=datetime.now(),
-        total_valor=0.0
-    )
-    db.session.add(nova_venda)
-    db.session.flush()
+    produtos = carregador_produtos().carregar(carrinho)
+    carrinho = {pid: qtd for pid, qtd in carrinho.items() if pid in produtos}
+    if not carrinho:
+        flash("Os produtos do carrinho já não existem.", "danger")
+        return redirect(url_for("vendas.nova_venda"))
 
-    total = 0.0
-    for item in carrinho:
-        produto = Produto.query.get(item['produto_id'])
-        quantidade = item['quantidade']
-        if not produto:
-            continue
-        subtotal = produto.preco * quantidade
-        total += subtotal
-
-        item_venda = ItemVenda(
-            venda_id=nova_venda.id,
-            produto_id=produto.id,
-            quantidade=quantidade,
-            preco_unitario=produto.preco,
-            subtotal=subtotal
+    try:
+        nova_venda = com_retentativas(lambda: finalizar_carrinho(carrinho, produtos))
+    except ConflitoVersao:
+        flash(_("O stock está a ser alterado noutro posto. Tente finalizar novamente."), "warning")
+        return redirect(url_for("vendas.nova_venda"))
+    except StockInsuficiente as e:
+        detalhes = "; ".join(
+            f"{nome} (disponível: {stock}, pedido: {pedido})" for nome, stock, pedido in e.produtos
         )
-        db.session.add(item_venda)
+        flash(_("Stock insuficiente: %(detalhes)s", detalhes=detalhes), "danger")
+        return redirect(url_for("vendas.nova_venda"))
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("vendas.nova_venda"))
 
-    nova_venda.total_valor = total
-    db.session.commit()
-    session.pop("carrinho_venda", None)
-    flash(f"Venda {nova_venda.codigo_venda} finalizada com sucesso! Total: {total:.2f} MZN", "success")
+    fechar_carrinho(carrinho_id)
+    flash(f"Venda {nova_venda.codigo_venda} finalizada com sucesso! Total: {nova_venda.total_valor:.2f} MZN", "success")
     return redirect(url_for("vendas.lista_vendas"))
 
 # ================================
@@ -229,18 +224,55 @@ def lista_vendas():
     filtro = request.args.get("filtro", "").strip()
     query = Venda.query
     if filtro:
-        query = query.filter(Venda.codigo_venda.ilike(f"%{filtro}%"))
-
-    vendas = query.order_by(Venda.data_venda.desc()).all()
-    total_vendas = sum(v.total_valor for v in vendas)
-    total_lucro = sum(getattr(v, 'total_lucro', 0) for v in vendas)
+        condicao_produto = filtro_produtos(filtro)
+        if condicao_produto is not None:
+            # Parte do código (como antes) ou vendas que contêm o produto (FTS)
+            query = query.filter(or_(
+                Venda.codigo_venda.ilike(f"%{filtro}%"),
+                Venda.id.in_(
+                    db.session.query(VendaItem.venda_id)
+                    .join(Produto, Produto.id == VendaItem.produto_id)
+                    .filter(condicao_produto)
+                )
+            ))
+        else:
+            query = query.filter(Venda.codigo_venda.ilike(f"%{filtro}%"))
+
+    pagina = paginar(query, Venda.data_venda, Venda.id)
+    resumo = totais(query, ("vendas", filtro), Venda.id,
+                    vendas=Venda.total_valor, lucro=Venda.total_lucro)
 
     registrar_acao("Acessou lista de vendas", "vendas", detalhes=f"Filtro: {filtro}")
 
     return render_template("vendas/lista_vendas.html",
-                           vendas=vendas,
+                           vendas=pagina.itens,
+                           pagina=pagina,
+                           total_registos=resumo["registos"],
+                           total_vendas=resumo["vendas"],
+                           total_lucro=resumo["lucro"])
+
+
+# ================================
+# Vendas por receber
+# ================================
+@vendas_bp.route("/vendas/em_aberto")
+def vendas_em_aberto():
+    query = query_em_aberto()
+    pagina = paginar(query, Venda.data_venda, Venda.id)
+    # Sem cache (paginacao.totais): o saldo muda a cada pagamento sem nova venda.
+    # Só lê as vendas em aberto, pelo índice parcial.
+    registos, total_vendas, total_saldo = query.order_by(None).with_entities(
+        func.count(Venda.id),
+        func.coalesce(func.sum(Venda.total_valor), 0.0),
+        func.coalesce(func.sum(Venda.saldo), 0.0),
+    ).one()
+
+    return render_template("vendas/em_aberto.html",
+                           vendas=pagina.itens,
+                           pagina=pagina,
+                           total_registos=registos,
                            total_vendas=total_vendas,
-                           total_lucro=total_lucro)
+                           total_saldo=total_saldo)
 
 
 
@@ -250,34 +282,27 @@ def lista_vendas():
 
 @vendas_bp.route("/dashboard")
 def dashboard_vendas():
-    hoje = datetime.today().date()
-
-    # Totais gerais
-    total_vendas = db.session.query(func.sum(Venda.total_valor)).scalar() or 0
-    total_lucro = db.session.query(func.sum(Venda.total_lucro)).scalar() or 0
+    hoje = hoje_local()
 
-    # Vendas do dia
-    vendas_hoje = db.session.query(func.sum(Venda.total_valor))\
-        .filter(func.date(Venda.data_venda) == hoje).scalar() or 0
-    lucro_hoje = db.session.query(func.sum(Venda.total_lucro))\
-        .filter(func.date(Venda.data_venda) == hoje).scalar() or 0
+    # Totais gerais (resumo diário)
+    totais = totais_resumo("vendas")
+    total_vendas = totais["vendas"]
+    total_lucro = totais["lucro"]
 
     # Últimas 5 vendas
     ultimas_vendas = Venda.query.order_by(Venda.data_venda.desc()).limit(5).all()
 
-    # ======= Gráfico últimos 30 dias =======
+    # ======= Gráfico últimos 30 dias (uma leitura por intervalo) =======
     dias = [hoje - timedelta(days=i) for i in reversed(range(30))]
+    resumo = serie_diaria("vendas", dias[0], hoje)
+
     chart_labels = [d.strftime("%d/%m") for d in dias]
-    chart_vendas = []
-    chart_lucro = []
+    chart_vendas = [round(resumo[d].vendas, 2) if d in resumo else 0 for d in dias]
+    chart_lucro = [round(resumo[d].lucro, 2) if d in resumo else 0 for d in dias]
 
-    for d in dias:
-        soma_vendas = db.session.query(func.sum(Venda.total_valor))\
-            .filter(func.date(Venda.data_venda) == d).scalar() or 0
-        soma_lucro = db.session.query(func.sum(Venda.total_lucro))\
-            .filter(func.date(Venda.data_venda) == d).scalar() or 0
-        chart_vendas.append(round(soma_vendas, 2))
-        chart_lucro.append(round(soma_lucro, 2))
+    # Vendas do dia
+    vendas_hoje = chart_vendas[-1]
+    lucro_hoje = chart_lucro[-1]
 
     registrar_acao("Acessou dashboard de vendas", "vendas")
 
@@ -303,84 +328,42 @@ def dashboard_vendas():
 
 
 
+@exportacao("vendas.pdf")
+def documento_pdf(parametros):
+    vendas = Venda.query.order_by(Venda.data_venda.desc(), Venda.id.desc())
+    colunas = [
+        Coluna(_("Código"), "codigo_venda"),
+        Coluna(_("Data"), "data_venda", "dia"),
+        Coluna(_("Total (MT)"), "total_valor", "dinheiro", total=True),
+        Coluna(_("Lucro (MT)"), "total_lucro", "dinheiro", total=True),
+    ]
+    return Documento("pdf", "vendas.pdf", _("Relatório de Vendas - LERP Management"), colunas, vendas)
+
+
 @vendas_bp.route("/vendas/exportar/pdf")
 def exportar_pdf():
-    vendas = Venda.query.order_by(Venda.data_venda.desc()).all()
-
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    largura, altura = A4
-
-    y = altura - 50
-    pdf.setFont("Helvetica-Bold", 16)
-    pdf.drawCentredString(largura / 2, y, _("Relatório de Vendas - LERP Management"))
-    y -= 30
-
-    pdf.setFont("Helvetica", 9)
-    pdf.drawString(40, y, _("Gerado em: ") + datetime.now().strftime("%d/%m/%Y %H:%M"))
-    y -= 25
-
-    pdf.setFont("Helvetica-Bold", 9)
-    pdf.drawString(40, y, _("Código"))
-    pdf.drawString(120, y, _("Data"))
-    pdf.drawString(220, y, _("Total (MT)"))
-    pdf.drawString(300, y, _("Lucro (MT)"))
-    y -= 15
-
-    pdf.setFont("Helvetica", 9)
-    total_geral = 0
-    total_lucro = 0
-
-    for v in vendas:
-        pdf.drawString(40, y, v.codigo_venda)
-        pdf.drawString(120, y, v.data_venda.strftime("%d/%m/%Y"))
-        pdf.drawString(220, y, f"{v.total_valor:.2f}")
-        pdf.drawString(300, y, f"{getattr(v, 'lucro_total', 0):.2f}")  # caso não tenha lucro
-        total_geral += v.total_valor
-        total_lucro += getattr(v, 'lucro_total', 0)
-        y -= 14
-        if y < 60:
-            pdf.showPage()
-            pdf.setFont("Helvetica", 9)
-            y = altura - 50
-
-    y -= 10
-    pdf.setFont("Helvetica-Bold", 11)
-    pdf.drawString(40, y, _("Total Vendas: ") + f"{total_geral:.2f} MT")
-    y -= 15
-    pdf.drawString(40, y, _("Total Lucro: ") + f"{total_lucro:.2f} MT")
-
-    pdf.save()
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name="vendas.pdf", mimetype="application/pdf")
+    return pedir_exportacao("vendas.pdf")
+
 
 
+def colunas_excel():
+    return [
+        Coluna("Código", "codigo_venda"),
+        Coluna("Data", "data_venda", "data"),
+        Coluna("Total", "total_valor", "dinheiro"),
+        Coluna("Lucro", "total_lucro", "dinheiro"),
+    ]
+
+
+@exportacao("vendas.excel")
+def documento_excel(parametros):
+    vendas = Venda.query.order_by(Venda.data_venda.desc(), Venda.id.desc())
+    return Documento("excel", "vendas.xlsx", "Vendas", colunas_excel(), vendas)
+
 
 @vendas_bp.route("/vendas/exportar/excel")
 def exportar_excel():
-    vendas = Venda.query.order_by(Venda.data_venda.desc()).all()
-
-    data = []
-    for v in vendas:
-        data.append({
-            "Código": v.codigo_venda,
-            "Data": v.data_venda.strftime("%d/%m/%Y %H:%M"),
-            "Total": v.total_valor,
-            "Lucro": getattr(v, 'total_lucro', 0)  # caso não tenha lucro
-        })
-
-    df = pd.DataFrame(data)
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Vendas")
-    output.seek(0)
-
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name="vendas.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    return pedir_exportacao("vendas.excel")
 
 
 